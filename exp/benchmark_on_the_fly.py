@@ -0,0 +1,58 @@
+"""
+File: benchmark_on_the_fly.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Compares stop-and-stare and on-the-fly frame times on the simulated mount, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import glob
+import os
+import re
+import subprocess as sp
+import sys
+import tempfile
+import numpy as np
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+# One 8x8 frame of the April 8 2024 eclipse at Queen's, with 1 s integrations
+ARGS = ["--simulate", "1", "--sim_start", "2024-04-08T18:00:00", "--duration", "0:06", "--plot_figure", "0",
+        "--verbose", "LOW", "--elevation_offset", "24", "--azimuth_offset", "70", "--force_calibration", "1"]
+MODES = [("stop-and-stare", ["--otf", "0"]),
+         ("on the fly, 1 deg/s", ["--otf", "1"]),
+         ("on the fly, 2 deg/s", ["--otf", "1", "--scan_speed", "2", "--integration_interval", "0.5s"])]
+
+images = {}
+for name, mode_args in MODES:
+    run_dir = tempfile.mkdtemp()
+    rst = sp.run([sys.executable, os.path.join(SRC_DIR, "eclipseImaging.py")] + ARGS + mode_args, cwd=run_dir,
+                 capture_output=True, text=True)
+    if rst.returncode != 0:
+        print(rst.stderr)
+        raise SystemExit("eclipseImaging.py failed")
+    log_dir = glob.glob(os.path.join(run_dir, "Log", "*"))[0]
+    with open(glob.glob(os.path.join(log_dir, "LOG*.txt"))[0]) as f:
+        frame_time = float(re.search(r"Image completed in ([0-9.]+)s", f.read()).group(1))
+    images[name] = np.loadtxt(glob.glob(os.path.join(log_dir, "ImageDataPowerOnly*.csv"))[0], delimiter=",")
+    print(f"{name:22s} frame {frame_time:6.1f} s, peak {np.nanmax(images[name]):5.2f} dB at pixel "
+          f"{tuple(int(x) for x in np.unravel_index(np.nanargmax(images[name]), images[name].shape))}")
+
+reference = images[MODES[0][0]]
+for name, image in images.items():
+    print(f"{name:22s} rms difference from stop-and-stare {np.sqrt(np.nanmean((image - reference) ** 2)):.3f} dB")
@@ -0,0 +1,65 @@
+"""
+File: benchmark_rfi_mask.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Timing and accuracy check of RFI masking on synthetic spectra for the Solar Eclipse Viewer
+project for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from powerStream import Integration
+from rfiMask import RfiMask
+
+N_REPEAT = 2000
+N_INTEGRATIONS = 50
+
+
+def makeIntegration(rng, n_bins, rfi_bins):
+    """
+    Synthesize one integration of Gaussian noise around -32 dB with strong narrowband interferers.
+
+    :param rfi_bins: Bin indexes to put interferers in.
+    :return: Integration
+    """
+    freqs = np.linspace(980e6, 1020e6, n_bins, endpoint=False)
+    spectrum = rng.normal(-32, 0.5, n_bins)
+    spectrum[rfi_bins] += 15
+    return Integration(0, 1, float(spectrum.mean()), freqs, spectrum)
+
+
+rng = np.random.default_rng(0)
+for n_bins in (312, 4096):
+    rfi_bins = rng.choice(n_bins, 3, replace=False)
+    rfi_mask = RfiMask()
+    for _ in range(N_INTEGRATIONS):
+        clean = rfi_mask.apply(makeIntegration(rng, n_bins, rfi_bins))
+    raw = makeIntegration(rng, n_bins, rfi_bins)
+    clean = rfi_mask.apply(raw)
+    assert set(rfi_bins) <= set(np.flatnonzero(rfi_mask.badChannels())), "interferers not masked persistently"
+    assert abs(clean.power + 32) < 0.1, clean.power
+    assert clean.spectrum is raw.spectrum and set(rfi_bins) <= set(np.flatnonzero(clean.mask)), "spectrum was masked"
+
+    t = timeit.timeit(lambda: rfi_mask.apply(raw), number=N_REPEAT) / N_REPEAT
+    print(f"{n_bins} bins: {1000 * t:.3f} ms per integration, {100 * clean.masked:.2f}% masked, "
+          f"power {raw.power:.3f} dB -> {clean.power:.3f} dB")
+    print(rfi_mask.summary())
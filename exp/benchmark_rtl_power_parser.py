@@ -0,0 +1,102 @@
+"""
+File: benchmark_rtl_power_parser.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Benchmark of the rtl_power parser against the old pandas/temp file path for the Solar Eclipse Viewer
+project for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import time
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from powerStream import _sweepIntegration
+from rtlPowerParser import parseBuffer, parseLine, meanPower, sweepSpectrum
+
+N_REPEAT = 200
+TMP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tmp", "rtl_power_bench.csv")
+
+
+def makeOutput(n_sweeps=1, freq_min=980e6, freq_max=1020e6, hop_width=2.4e6, bin_size=128e3):
+    """
+    Synthesize rtl_power output for the default 980M:1020M:128k measurement.
+
+    :param n_sweeps: Number of sweeps (integrations) to generate.
+    :return: CSV output as rtl_power would print it. (bytes)
+    """
+    rng = np.random.default_rng(0)
+    bins_per_hop = int(hop_width / bin_size)
+    lines = []
+    for sweep in range(n_sweeps):
+        stamp = time.strftime("%Y-%m-%d, %H:%M:%S", time.localtime(1712599740 + sweep))
+        for low in np.arange(freq_min, freq_max, hop_width):
+            bins = ", ".join("%.2f" % b for b in rng.normal(-32, 0.5, bins_per_hop))
+            lines.append("%s, %d, %d, %.2f, 16, %s" % (stamp, low, low + hop_width, bin_size, bins))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def pandasPath(buf):
+    """
+    The old measPower path: write the output to disk, read it back with pandas and average.
+    header=None is used so every hop is counted (the old code lost the first hop to the header row).
+    """
+    import pandas as pd
+    with open(TMP_PATH, "wb") as f:
+        f.write(buf)
+    raw = pd.read_csv(TMP_PATH, header=None)
+    proc = raw.iloc[:, 0:4]
+    proc[len(proc.columns)] = raw.iloc[:, 6:-1].mean(axis=1)
+    return proc.iloc[:, 4].mean()
+
+
+def parserPath(buf):
+    return meanPower(parseBuffer(buf))
+
+
+# A sweep whose last hop is shorter (as when the range is not a whole number of hops) drops the last real bin of
+# every hop, the same as the power stream
+lines = makeOutput().splitlines()
+lines[-1] = lines[-1].rsplit(b",", 5)[0]
+ragged = b"\n".join(lines) + b"\n"
+hops = parseBuffer(ragged)
+reference = _sweepIntegration([parseLine(line) for line in lines], 0, 0)
+freqs, spectrum = sweepSpectrum(hops)
+assert abs(meanPower(hops) - reference.power) < 1e-9, (meanPower(hops), reference.power)
+assert np.array_equal(freqs, reference.freqs) and np.array_equal(spectrum, reference.spectrum)
+print(f"ragged sweep: {len(spectrum)} bins, power {reference.power:.4f} dB")
+
+t0 = time.perf_counter()
+import pandas
+print(f"pandas import time: {1000 * (time.perf_counter() - t0):.1f} ms")
+
+for n_sweeps in (1, 10):
+    buf = makeOutput(n_sweeps)
+    p_pandas = pandasPath(buf)
+    p_parser = parserPath(buf)
+    assert abs(p_pandas - p_parser) < 1e-9, (p_pandas, p_parser)
+
+    t_pandas = timeit.timeit(lambda: pandasPath(buf), number=N_REPEAT) / N_REPEAT
+    t_parser = timeit.timeit(lambda: parserPath(buf), number=N_REPEAT) / N_REPEAT
+    print(f"{n_sweeps} sweep(s), {len(buf)} bytes: pandas {1000 * t_pandas:.3f} ms, parser {1000 * t_parser:.3f} ms, "
+          f"speedup {t_pandas / t_parser:.1f}x, power {p_parser:.4f} dB")
+
+os.remove(TMP_PATH)
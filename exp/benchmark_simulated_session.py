@@ -0,0 +1,58 @@
+"""
+File: benchmark_simulated_session.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Replays an eclipse imaging session on the simulated mount and virtual clock, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import glob
+import os
+import subprocess as sp
+import sys
+import tempfile
+import time
+import numpy as np
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+# Three hours of 8x8 imaging through the April 8 2024 eclipse at Queen's. The offsets keep every frame inside the
+# mount's limits for the whole session.
+ARGS = ["--simulate", "1", "--sim_start", "2024-04-08T18:00:00", "--duration", "3:00", "--plot_figure", "0",
+        "--verbose", "LOW", "--elevation_offset", "24", "--azimuth_offset", "70", "--force_calibration", "1"]
+
+run_dir = tempfile.mkdtemp()
+t0 = time.perf_counter()
+rst = sp.run([sys.executable, os.path.join(SRC_DIR, "eclipseImaging.py")] + ARGS, cwd=run_dir, capture_output=True,
+             text=True)
+wall = time.perf_counter() - t0
+if rst.returncode != 0:
+    print(rst.stderr)
+    raise SystemExit("eclipseImaging.py failed")
+
+log_path = glob.glob(os.path.join(run_dir, "Log", "*", "LOG*.txt"))[0]
+with open(log_path) as f:
+    lines = f.read().splitlines()[1:]
+stamps = [line[:19] for line in lines if line[:4].isdigit()]
+assert not [line for line in lines if " ERROR: " in line], [line for line in lines if " ERROR: " in line]
+frames = sorted(glob.glob(os.path.join(os.path.dirname(log_path), "ImageDataPowerOnly*.csv")))
+sim_hours = (np.datetime64(stamps[-1].replace(" ", "T")) - np.datetime64(stamps[0].replace(" ", "T"))) \
+            / np.timedelta64(3600, "s")
+
+print(f"Simulated {sim_hours:.2f} h session, {len(frames)} frames in {wall:.1f} s wall time "
+      f"({3600 * sim_hours / wall:.0f}x real time)")
@@ -0,0 +1,47 @@
+"""
+File: benchmark_solar_position.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Speed of the NumPy (NOAA) sun position against astropy for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import time
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from solarPosition import sunPositionNoaa, sunPositionAstropy
+
+LAT, LON = 44.2247, -76.4978
+
+t0 = time.perf_counter()
+import astropy.coordinates
+print(f"astropy import time: {1000 * (time.perf_counter() - t0):.0f} ms")
+
+now = time.time()
+sunPositionAstropy(now, LAT, LON)  # First call loads astropy's data files
+for n_times, n_repeat in ((1, 200), (10000, 5)):
+    times = now + np.arange(n_times, dtype=np.float64)
+    t_noaa = timeit.timeit(lambda: sunPositionNoaa(times, LAT, LON), number=n_repeat) / n_repeat
+    t_astropy = timeit.timeit(lambda: sunPositionAstropy(times, LAT, LON), number=n_repeat) / n_repeat
+    print(f"{n_times} time(s): noaa {1000 * t_noaa:.3f} ms, astropy {1000 * t_astropy:.3f} ms, "
+          f"speedup {t_astropy / t_noaa:.0f}x")
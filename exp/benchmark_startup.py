@@ -0,0 +1,69 @@
+"""
+File: benchmark_startup.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Startup time and peak memory of each entry point for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import json
+import os
+import subprocess as sp
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+ENTRY_POINTS = ["main.py", "imaging.py", "eclipseImaging.py"]
+HEAVY_MODULES = ["pandas", "matplotlib.pyplot", "astropy", "RPi.GPIO"]
+N_REPEAT = 5
+
+# Runs one entry point with --help in a fresh interpreter. argparse exits after every module level import has run,
+# so this measures the startup cost without touching the hardware.
+CHILD = """
+import contextlib, io, json, resource, runpy, sys, time
+t0 = time.perf_counter()
+sys.argv = [sys.argv[1], "--help"]
+sys.path.insert(0, ".")
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        runpy.run_path(sys.argv[0], run_name="__main__")
+    except SystemExit:
+        pass
+print(json.dumps({"import_s": time.perf_counter() - t0,
+                  "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  "heavy": [m for m in %r if m in sys.modules]}))
+""" % HEAVY_MODULES
+
+for entry_point in ENTRY_POINTS:
+    runs = []
+    for _ in range(N_REPEAT):
+        t0 = time.perf_counter()
+        rst = sp.run([sys.executable, "-c", CHILD, entry_point], cwd=SRC_DIR, capture_output=True, text=True)
+        wall = time.perf_counter() - t0
+        if rst.returncode != 0:
+            print(entry_point + " failed: " + rst.stderr.strip().splitlines()[-1])
+            break
+        result = json.loads(rst.stdout.strip().splitlines()[-1])
+        result["wall_s"] = wall
+        runs.append(result)
+    if not runs:
+        continue
+    best = min(runs, key=lambda r: r["wall_s"])
+    print(f"{entry_point:18s} imports {1000 * best['import_s']:6.0f} ms, process {1000 * best['wall_s']:6.0f} ms, "
+          f"peak RSS {best['peak_rss_mb']:5.1f} MB, heavy modules loaded: {', '.join(best['heavy']) or 'none'}")
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 """
-File: socket_server.py
+File: generate_solar_positions_astropy.py
 Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
-Date: 2024-03-30
-Description: Generate a pickle file containing lists of sun altitude and azimuth throughout
-the period of the April 8th, 2024 eclipse.
+Date: 2026-10-18
+Description: Build the sun position cache used by main.py, imaging.py and eclipseImaging.py for any site and
+time range. Missing 6 hour chunks are computed in parallel worker processes and saved to bin/ephemeris. With
+--output, the range is also written to a single .npy file for eclipseImaging.py --ephemeris.
+
+Ex. python generate_solar_positions_astropy.py --start 2024-04-08T15:00:00 --end 2024-04-08T22:00:00
 
 
 Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
@@ -23,40 +26,57 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-import numpy as np
-from astropy.time import Time
-from astropy.coordinates import get_sun, AltAz, EarthLocation
+import argparse
+import calendar
+import os
+import sys
+import tempfile
 import time
-import datetime
-import pickle
-
-
-t_range = Time(['2024-04-08T15:00:00.000', '2024-04-08T22:00:00.000'])
-dt = t_range[1] - t_range[0]
-
-step = Time(['2024-04-08T15:00:00.000', '2024-04-08T15:00:10.000'])
-step = step[1] - step[0]
-t_lst = t_range[0] + dt * np.linspace(0., 1., int(dt/step))
-
-#print(t)
-sunPos = get_sun(t_lst)
-measurementLoc = EarthLocation(lat=44.227042, lon=-76.498307)  # location of measurement (Tindal field)
-relSunPos = sunPos.transform_to(
-    AltAz(obstime=t_lst, location=measurementLoc))  # sun position relative to measurement location
-
-result = np.array([t_lst.datetime, relSunPos.az.deg, relSunPos.alt.deg])
-
-with open("./sunData/April8Eclipse.pickle", 'wb') as handle:
-    pickle.dump(result, handle)
-
-
-#%% Test
-
-def getSunPickledData():
-    with open("./sunData/April8Eclipse.pickle", 'rb') as handle:
-        sunPos = pickle.load(handle)
-    target_date = datetime.datetime.utcnow()
-    idex = np.argmin(np.abs(sunPos[0] - target_date))
-    return sunPos[2][idex], sunPos[1][idex]
 
-getSunPickledData()
\ No newline at end of file
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from utilities import Log
+from ephemeris import saveEphemeris
+from ephemerisCache import loadCachedEphemeris, CACHE_DIR, DEFAULT_STEP
+
+
+def parseUtc(t):
+    """
+    :param t: UTC time. Ex. 2024-04-08T15:00:00 (string)
+    :return: Unix time. (float)
+    """
+    return float(calendar.timegm(time.strptime(t, "%Y-%m-%dT%H:%M:%S")))
+
+
+parser = argparse.ArgumentParser(description='Precompute sun positions for a site and time range.')
+parser.add_argument('--latitude', type=str, nargs='?', const='44.227042', default='44.227042',
+                    help='Latitude of location. Default = 44.227042 (Tindal field)')
+parser.add_argument('--longitude', type=str, nargs='?', const='-76.498307', default='-76.498307',
+                    help='Longitude of location. Default = -76.498307 (Tindal field)')
+parser.add_argument('--start', type=str, nargs='?', const='2024-04-08T15:00:00', default='2024-04-08T15:00:00',
+                    help='Start time, UTC. Default = 2024-04-08T15:00:00')
+parser.add_argument('--end', type=str, nargs='?', const='2024-04-08T22:00:00', default='2024-04-08T22:00:00',
+                    help='End time, UTC. Default = 2024-04-08T22:00:00')
+parser.add_argument('--step', type=float, nargs='?', const=DEFAULT_STEP, default=DEFAULT_STEP,
+                    help='Seconds between samples. Default = ' + str(DEFAULT_STEP))
+parser.add_argument('--workers', type=int, nargs='?', const=None, default=None,
+                    help='Number of worker processes. Default = one per CPU')
+parser.add_argument('--cache_dir', type=str, nargs='?', const=CACHE_DIR, default=CACHE_DIR,
+                    help='Cache directory. Default = bin/ephemeris')
+parser.add_argument('--sun_source', type=str, choices={"noaa", "astropy"}, nargs='?', const="noaa",
+                    default="noaa", help='Sun position source. Default = noaa')
+parser.add_argument('--output', type=str, nargs='?', const=None, default=None,
+                    help='Also write the range to this .npy file. Default = None')
+args = parser.parse_args()
+
+Log.logFilePath = os.path.join(tempfile.mkdtemp(), "LOG.txt")
+Log.VERBOSE = "HIGH"
+
+start = parseUtc(args.start)
+end = parseUtc(args.end)
+ephemeris = loadCachedEphemeris(args.latitude, args.longitude, start, end, step=args.step, cache_dir=args.cache_dir,
+                                workers=args.workers, source=args.sun_source)
+
+if args.output is not None:
+    keep = (ephemeris.times >= start - args.step) & (ephemeris.times <= end + args.step)
+    saveEphemeris(args.output, ephemeris.times[keep], ephemeris.az[keep], ephemeris.alt[keep])
+    Log.info("Wrote " + str(int(keep.sum())) + " samples to " + args.output)
@@ -0,0 +1,114 @@
+"""
+File: test_coarse_to_fine.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Checks coarse-to-fine imaging against a full raster on a simulated mount and SDR, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import clock
+import tracking
+from adaptiveImaging import coarseToFineFrame, peakPosition, refineScores, regridNearest
+from dataCollection import measSpectrum
+from powerStream import Integration
+from simulatedSdr import SimulatedPowerStream, separation
+from solarPosition import sunPosition
+from utilities import Log, parseAngle
+
+TMP_DIR = tempfile.mkdtemp()
+Log.logFilePath = os.path.join(TMP_DIR, "LOG.txt")
+Log.VERBOSE = "LOW"
+LAT, LON = "+44d13m29s", "-76d29m52s"
+
+# The brightest cell and the cells on the steepest slope score highest, flat background scores nothing
+row, col = np.meshgrid(np.arange(4.0), np.arange(4.0), indexing="ij")
+power = np.where((row == 1) & (col == 2), 10.0, 0.0).ravel()
+score = refineScores(row.ravel(), col.ravel(), np.ones(16), power)
+assert np.argmax(score) == 6 and score[6] == 20 and score[15] == 0, score.reshape(4, 4)
+
+# Regridding takes the nearest sample, the peak fit finds the vertex of a paraboloid
+image = regridNearest([0, 0, 3], [0, 3, 3], [1, 2, 3], 0, 0, 1, 1, 4, 4)
+assert image[0].tolist() == [1, 1, 2, 2] and image[3][3] == 3, image
+alt, az = np.meshgrid(np.linspace(-1, 1, 5), np.linspace(-1, 1, 5), indexing="ij")
+fitAlt, fitAz = peakPosition(alt.ravel(), az.ravel(), (10 - (alt - 0.3) ** 2 - 2 * (az + 0.2) ** 2).ravel())
+assert abs(fitAlt - 0.3) < 1e-9 and abs(fitAz + 0.2) < 1e-9, (fitAlt, fitAz)
+
+clock.useVirtualClock(datetime.datetime(2024, 4, 8, 18, 0, 0).timestamp())
+tracking.MOTOR = None
+tracking.initGpio("sim", state_path=os.path.join(TMP_DIR, "mountState.json"))
+sunAlt, sunAz = [float(x) for x in sunPosition(clock.unixTime(), parseAngle(LAT), parseAngle(LON))]
+offsetAlt, offsetAz = sunAlt - 16, sunAz - 70
+stream = SimulatedPowerStream("980M", "1020M", "1s", LAT, LON,
+                              lambda t: tracking.antennaPosition(offsetAlt, offsetAz, t)).start()
+antAlt, antAz = tracking.resumeOrCalibrate(offsetAlt, offsetAz, force=True)
+
+
+def frame(coarse, min_size, max_pixels):
+    """
+    Image an 8x8 frame of 1 deg pixels around the sun, starting from its first corner.
+
+    :return: Frame time, number of measurements and the peak's error from the sun in degrees.
+    """
+    global antAlt, antAz
+    sunAlt, sunAz = [float(x) for x in sunPosition(clock.unixTime(), parseAngle(LAT), parseAngle(LON))]
+    startAlt, startAz = sunAlt - 3.5, sunAz - 3.5
+    diffAlt, diffAz, antAlt, antAz = tracking.getDifferenceDeg(antAlt, antAz, startAlt, startAz, offsetAlt, offsetAz)
+    tracking.moveStepper(diffAlt, diffAz)
+    start = clock.unixTime()
+    samples, sizes, antAlt, antAz = coarseToFineFrame(
+        lambda: measSpectrum("980M", "1020M", "1s", "0", stream=stream), antAlt, antAz, startAlt, startAz, 8, 8, 1, 1,
+        offsetAlt, offsetAz, 0.2, max_pixels, coarse=coarse, min_size=min_size)
+    frame_time = clock.unixTime() - start
+    peakAlt, peakAz = peakPosition([s.alt for s in samples], [s.az for s in samples],
+                                   [s.integration.power for s in samples])
+    sunAlt, sunAz = [float(x) for x in sunPosition(np.mean([s.time for s in samples]), parseAngle(LAT),
+                                                   parseAngle(LON))]
+    return frame_time, len(samples), separation(peakAlt, peakAz, sunAlt, sunAz)
+
+
+# A frame where every integration failed (flagged or skipped SDR reads) has no peak and is not refined
+assert np.all(np.isnan(peakPosition([1, 2], [3, 4], [np.nan, np.nan]))) and np.all(np.isnan(peakPosition([], [], [])))
+
+
+def failed():
+    clock.sleep(1)
+    return Integration(clock.unixTime() - 1, clock.unixTime(), float("nan"), np.zeros(0), np.zeros(0))
+
+
+samples, sizes, antAlt, antAz = coarseToFineFrame(failed, antAlt, antAz, antAlt, antAz, 8, 8, 1, 1, offsetAlt,
+                                                  offsetAz, 0.2, 32)
+assert len(samples) == 16 and np.all(sizes == 2), (len(samples), sizes)
+
+# A full raster is coarse-to-fine with 1 pixel cells and no refining
+full = [frame(1, 1, 64) for _ in range(3)]
+fine = [frame(2, 0.5, 32) for _ in range(3)]
+for name, runs in (("Full 8x8 raster", full), ("Coarse-to-fine", fine)):
+    print(f"{name:16s} {np.mean([r[1] for r in runs]):4.0f} measurements, {np.mean([r[0] for r in runs]):5.1f} s per "
+          f"frame, peak error {max(r[2] for r in runs):.3f} deg")
+assert all(r[1] == 64 for r in full) and all(r[1] <= 32 for r in fine)
+assert max(r[2] for r in fine) <= max(r[2] for r in full) + 0.05
+assert np.mean([r[0] for r in fine]) < 0.6 * np.mean([r[0] for r in full])
+print("All coarse-to-fine tests passed.")
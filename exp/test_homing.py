@@ -0,0 +1,76 @@
+"""
+File: test_homing.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Times two-phase homing against simulated limit switches, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import tracking
+from utilities import Log
+
+TMP_DIR = tempfile.mkdtemp()
+Log.logFilePath = os.path.join(TMP_DIR, "LOG.txt")
+Log.VERBOSE = "LOW"
+
+OLD_STEP_PERIOD = 0.051  # The old calibration crept one step per moveStepper call, one axis after the other
+
+
+def simulatedMount(alt_deg, az_deg):
+    """
+    Fresh simulated backend with the mount alt_deg and az_deg above its limit switches.
+    """
+    tracking.MOTOR = None
+    tracking.initGpio("sim", state_path=os.path.join(TMP_DIR, "mountState.json"))
+    sim = tracking.MOTOR
+    sim.addSwitch(tracking.LIM_ALT, tracking.STEP_ALT, tracking.DIR_ALT, tracking.CCW,
+                  tracking._degToSteps(alt_deg, tracking.EL_GEAR_RATIO))
+    sim.addSwitch(tracking.LIM_AZ, tracking.STEP_AZ, tracking.DIR_AZ, tracking.CW,
+                  tracking._degToSteps(az_deg, tracking.AZ_GEAR_RATIO))
+    return sim
+
+
+print(f"{'start (alt, az deg)':22s} {'alt steps':>9s} {'az steps':>8s} {'old (s)':>8s} {'new (s)':>8s}")
+for alt_deg, az_deg in ((32, 145), (10, 60), (20, 0.5), (0, 30), (0, 0)):
+    sim = simulatedMount(alt_deg, az_deg)
+    steps_alt = sim.switches[tracking.LIM_ALT][3]
+    steps_az = sim.switches[tracking.LIM_AZ][3]
+    assert tracking.calibrate(1.5, 2.5) == (1.5, 2.5)
+    # Both axes end exactly where their switch trips, on the slow approach
+    assert sim.switches[tracking.LIM_ALT][3] == 0 and sim.switches[tracking.LIM_AZ][3] == 0
+    assert sim.input(tracking.LIM_ALT) == 1 and sim.input(tracking.LIM_AZ) == 1
+    old = (steps_alt + steps_az) * OLD_STEP_PERIOD
+    print(f"{str((alt_deg, az_deg)):22s} {steps_alt:9d} {steps_az:8d} {old:8.1f} {sim.now:8.1f}")
+    assert sim.now < old or steps_alt + steps_az < 50
+
+# A switch that never trips stops homing with an error instead of driving the axis forever
+sim = simulatedMount(10, 10)
+del sim.switches[tracking.LIM_AZ]
+try:
+    tracking.calibrate(0, 0)
+    raise AssertionError("calibrate did not notice the missing switch")
+except RuntimeError as e:
+    print("Missing switch:", e)
+
+print("All homing tests passed.")
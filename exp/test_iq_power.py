@@ -0,0 +1,115 @@
+"""
+File: test_iq_power.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Checks the IQ power backends against IQ files of known power, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from dataCollection import bandPowers, measSpectrum
+from iqPower import IQPowerStream, iqFromBytes, validSampleRate
+from rfiMask import RfiMask, maskedSpectrum
+from utilities import Log
+
+TMP_DIR = tempfile.mkdtemp()
+Log.logFilePath = os.path.join(TMP_DIR, "LOG.txt")
+Log.VERBOSE = "LOW"
+SAMPLE_RATE = 2.4e6
+rng = np.random.default_rng(1)
+
+
+def writeIq(path, iq):
+    """
+    Write complex samples as rtl_sdr does, interleaved unsigned 8-bit I and Q.
+
+    :return: The samples as read back, after quantizing. (np.ndarray)
+    """
+    raw = np.empty(2 * len(iq))
+    raw[0::2], raw[1::2] = iq.real, iq.imag
+    data = np.clip(np.rint(raw * 127.5 + 127.5), 0, 255).astype(np.uint8).tobytes()
+    with open(path, "wb") as f:
+        f.write(data)
+    return iqFromBytes(data)
+
+
+def integrations(mode, path, freq_max="982.4M"):
+    stream = IQPowerStream("980M", freq_max, "0.1s", "0", mode=mode, source=path).start()
+    found = []
+    while True:
+        integration = stream.getIntegrationAfter(0, timeout=2)
+        if integration is None:
+            break
+        found.append(integration)
+    stream.stop()
+    return found
+
+
+# White noise: total mode gives the mean |IQ|^2 of the samples, and the flat psd averages to the same power
+n = int(SAMPLE_RATE)
+noise = writeIq(os.path.join(TMP_DIR, "noise.iq"), 0.2 * (rng.standard_normal(n) + 1j * rng.standard_normal(n)))
+expected = 10 * np.log10(np.mean(np.abs(noise) ** 2))
+total = integrations("total", os.path.join(TMP_DIR, "noise.iq"))
+psd = integrations("psd", os.path.join(TMP_DIR, "noise.iq"))
+assert len(total) >= 8 and len(psd) >= 8, (len(total), len(psd))
+assert all(abs(i.power - expected) < 0.1 for i in total), ([i.power for i in total], expected)
+assert all(len(i.spectrum) == 255 and len(i.freqs) == 255 for i in psd)
+linear = np.mean([np.mean(10 ** (i.spectrum / 10)) for i in psd])
+assert abs(10 * np.log10(linear) - expected) < 0.2, (10 * np.log10(linear), expected)
+assert all(abs(np.mean(i.spectrum) - i.power) < 1e-9 for i in psd)
+
+# A tone 300 kHz above the centre lands in that bin of the psd, well above the rest
+t = np.arange(n) / SAMPLE_RATE
+tone = writeIq(os.path.join(TMP_DIR, "tone.iq"), 0.5 * np.exp(2j * np.pi * 300e3 * t) + 0.01 * rng.standard_normal(n))
+for integration in integrations("psd", os.path.join(TMP_DIR, "tone.iq")):
+    peak = np.argmax(integration.spectrum)
+    assert abs(integration.freqs[peak] - 981.5e6) <= SAMPLE_RATE / 256, integration.freqs[peak]
+    assert integration.spectrum[peak] - np.median(integration.spectrum) > 30
+
+# Bands rtl_sdr cannot sample at are captured at the next rate it accepts, and psd mode keeps only the band's bins
+assert [validSampleRate(r) for r in (1e5, 2.5e5, 5e5, 1e6, 4e6)] == [225001, 2.5e5, 900001, 1e6, 3.2e6]
+narrow = IQPowerStream("980M", "980.5M", "0.1s", "0", source=os.path.join(TMP_DIR, "noise.iq"))
+assert narrow.sample_rate == 900001
+for integration in integrations("psd", os.path.join(TMP_DIR, "noise.iq"), freq_max="980.5M"):
+    assert np.all(np.abs(integration.freqs - 980.25e6) <= 250e3) and 100 < len(integration.freqs) < 255
+# With a reference band the power and the RFI statistics are taken over the main band. The tone is in the reference
+# band, so it neither raises the main band power nor gets masked.
+bands = [("980M", "981M"), ("981.3M", "982.4M")]
+stream = IQPowerStream("980M", "982.4M", "0.1s", "0", source=os.path.join(TMP_DIR, "tone.iq"), bands=bands).start()
+integration = measSpectrum("980M", "982.4M", "0.1s", "0", stream=stream, after=0, rfi_mask=RfiMask(), band=bands[0])
+stream.stop()
+main = (integration.freqs >= 980e6) & (integration.freqs < 981e6)
+assert abs(integration.power - np.nanmean(maskedSpectrum(integration)[main])) < 1e-9, integration.power
+assert integration.mask is None or not integration.mask[~main].any()
+powers = bandPowers(integration, bands)
+assert powers["980M-981M"] == integration.power and powers["981.3M-982.4M"] - integration.power > 1, powers
+
+# Reference bands outside the captured bandwidth, or with total mode, are rejected
+for mode, ref in (("psd", ("990M", "991M")), ("total", ("981.3M", "982.4M"))):
+    try:
+        IQPowerStream("980M", "991M", "0.1s", "0", mode=mode, bands=[("980M", "981M"), ref])
+        assert False, "band outside the capture accepted"
+    except ValueError as e:
+        print(e)
+print("All IQ power tests passed.")
@@ -0,0 +1,93 @@
+"""
+File: test_motion_profile.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Simulated time test of stepper motion profiles for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from motionProfile import AxisLimits, planMove, trapezoidTimes
+from tracking import STEP_SIZE, EL_GEAR_RATIO, AZ_GEAR_RATIO, STEP_HIGH_TIME, ALT_LIMITS, AZ_LIMITS
+
+OLD_STEP_PERIOD = 0.051  # 1 ms high + 50 ms low per step, one axis after the other
+TOLERANCE = 1e-6
+
+
+def checkAxis(times, limits, check_accel=True):
+    """
+    Check one axis' step times against its limits. The mean speed over a step interval (1 / interval) is the speed
+    at the interval's middle time when the acceleration is constant, so the acceleration is the change in mean speed
+    over the time between interval middles.
+    """
+    if len(times) < 2:
+        return
+    intervals = np.diff(times)
+    speed = 1 / intervals
+    assert speed.max() <= limits.max_speed * (1 + TOLERANCE), speed.max()
+    if not check_accel:
+        return
+    accel = np.diff(speed) / ((intervals[:-1] + intervals[1:]) / 2)
+    assert np.all(np.abs(accel) <= limits.accel * (1 + TOLERANCE)), np.abs(accel).max()
+    assert speed[0] <= np.sqrt(limits.start_speed ** 2 + 2 * limits.accel) * (1 + TOLERANCE)
+
+
+# Single axis profiles, checked against the closed form durations
+limits = AxisLimits(max_speed=200, accel=400, start_speed=20)
+for steps in (1, 2, 10, 50, 101, 1000):
+    times = trapezoidTimes(steps, *limits)
+    assert len(times) == steps and times[0] == 0 and np.all(np.diff(times) > 0)
+    checkAxis(times, limits)
+long_times = trapezoidTimes(1000, *limits)
+ramp_steps = (200 ** 2 - 20 ** 2) / (2 * 400)
+expected = 2 * (200 - 20) / 400 + (999 - 2 * ramp_steps) / 200
+assert abs(long_times[-1] - expected) < 1e-9, (long_times[-1], expected)
+
+# Two axis moves, timed in simulated time from the planned profile
+print(f"{'move':28s} {'alt steps':>9s} {'az steps':>8s} {'old (s)':>8s} {'new (s)':>8s}")
+moves = {"1 deg az pixel": (0, 1), "1 deg el pixel": (1, 0), "frame shift 1 el, 2 az": (1, 2),
+         "image start 4 el, 4 az": (4, 4), "slew 30 el, 60 az": (30, 60), "slew 0.1 el, 45 az": (0.1, 45)}
+for name, (alt_deg, az_deg) in moves.items():
+    steps_alt = abs(int(alt_deg / STEP_SIZE * EL_GEAR_RATIO))
+    steps_az = abs(int(az_deg / STEP_SIZE * AZ_GEAR_RATIO))
+    profile = planMove(steps_alt, steps_az, ALT_LIMITS, AZ_LIMITS)
+    assert profile.pulse_alt.sum() == steps_alt and profile.pulse_az.sum() == steps_az
+    # The axis with fewer steps pulses on a subset of ticks, so its intervals jitter by one tick and only its speed
+    # is checked. Its average rate follows the scaled profile.
+    checkAxis(profile.tick_times[profile.pulse_alt == 1], ALT_LIMITS, check_accel=steps_alt >= steps_az)
+    checkAxis(profile.tick_times[profile.pulse_az == 1], AZ_LIMITS, check_accel=steps_az >= steps_alt)
+    # The step pins must be low again before the next pulse
+    assert np.all(np.diff(profile.tick_times) > STEP_HIGH_TIME)
+    old = (steps_alt + steps_az) * OLD_STEP_PERIOD
+    print(f"{name:28s} {steps_alt:9d} {steps_az:8d} {old:8.2f} {profile.duration:8.2f}")
+    assert profile.duration <= old + TOLERANCE
+
+# A slow minor axis slows the whole move so it stays within its own limits
+slow_az = AxisLimits(max_speed=50, accel=100, start_speed=10)
+profile = planMove(400, 200, ALT_LIMITS, slow_az)
+checkAxis(profile.tick_times[profile.pulse_az == 1], slow_az)
+checkAxis(profile.tick_times[profile.pulse_alt == 1], ALT_LIMITS)
+profile = planMove(400, 300, ALT_LIMITS, slow_az)
+checkAxis(profile.tick_times[profile.pulse_az == 1], slow_az, check_accel=False)
+
+print("All motion profile tests passed.")
@@ -0,0 +1,112 @@
+"""
+File: test_mount_state.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Checks the step ledger and resuming from saved mount state on a simulated mount, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import tracking
+from utilities import Log
+
+TMP_DIR = tempfile.mkdtemp()
+Log.logFilePath = os.path.join(TMP_DIR, "LOG.txt")
+Log.VERBOSE = "LOW"
+STATE_PATH = os.path.join(TMP_DIR, "mountState.json")
+K_ALT = tracking.EL_GEAR_RATIO / tracking.STEP_SIZE  # Steps per degree
+K_AZ = tracking.AZ_GEAR_RATIO / tracking.STEP_SIZE
+
+# Simulated mount 10 deg above both switches, no saved state yet
+tracking.MOTOR = None
+tracking.initGpio("sim", state_path=STATE_PATH)
+sim = tracking.MOTOR
+sim.addSwitch(tracking.LIM_ALT, tracking.STEP_ALT, tracking.DIR_ALT, tracking.CCW, round(10 * K_ALT))
+sim.addSwitch(tracking.LIM_AZ, tracking.STEP_AZ, tracking.DIR_AZ, tracking.CW, round(10 * K_AZ))
+
+
+def truePosition():
+    """
+    Steps of each axis from home, as seen by the simulated switches.
+    """
+    return sim.switches[tracking.LIM_ALT][3], sim.switches[tracking.LIM_AZ][3]
+
+
+assert tracking.resumeOrCalibrate(0, 0) == (0, 0)
+assert truePosition() == (0, 0)
+
+# A raster of small moves, as in imaging. The old code truncated every move to whole steps and lost the remainder.
+antAlt, antAz = 0.0, 0.0
+old_steps_alt = old_steps_az = 0
+for row in range(20):
+    az_dir = 1 if row % 2 == 0 else -1
+    for col in range(30):
+        tracking.moveStepper(0, 0.37 * az_dir, cal_flag=True)
+        antAz += 0.37 * az_dir
+        old_steps_az += int(0.37 * az_dir * K_AZ)
+    tracking.moveStepper(0.33, 0, cal_flag=True)
+    antAlt += 0.33
+    old_steps_alt += int(0.33 * K_ALT)
+assert truePosition() == (tracking.STATE.alt_steps, tracking.STATE.az_steps)
+ledgerAlt, ledgerAz = tracking.antennaPosition(0, 0)
+old_error = max(abs(antAlt - old_steps_alt / K_ALT), abs(antAz - old_steps_az / K_AZ))
+new_error = max(abs(antAlt - ledgerAlt), abs(antAz - ledgerAz))
+print(f"Position error after 620 moves: old truncation {old_error:.3f} deg, ledger {new_error:.3f} deg")
+assert abs(antAlt - ledgerAlt) <= 0.5 / K_ALT + 1e-9 and abs(antAz - ledgerAz) <= 0.5 / K_AZ + 1e-9
+
+# Every move is saved, but a session that did not shut down cleanly must home again
+with open(STATE_PATH) as f:
+    state = json.load(f)
+assert (state["alt_steps"], state["az_steps"], state["homed"], state["clean"]) == \
+       (tracking.STATE.alt_steps, tracking.STATE.az_steps, True, False)
+assert not [name for name in os.listdir(TMP_DIR) if ".tmp" in name]
+
+# After a clean shutdown the next start resumes without moving
+tracking.shutdown()
+tracking.initGpio("sim", state_path=STATE_PATH)
+now = sim.now
+antAlt, antAz = tracking.resumeOrCalibrate(0, 0)
+assert sim.now == now and (antAlt, antAz) == (ledgerAlt, ledgerAz)
+with open(STATE_PATH) as f:
+    assert not json.load(f)["clean"]  # Resumed, so a crash from here on forces homing again
+tracking.moveStepper(-2, 3, cal_flag=True)
+assert truePosition() == (tracking.STATE.alt_steps, tracking.STATE.az_steps)
+
+# A crash (no shutdown) forces homing on the next start, as does forcing it
+tracking.initGpio("sim", state_path=STATE_PATH)
+tracking.resumeOrCalibrate(0, 0)
+assert sim.now > now and truePosition() == (0, 0) and tracking.STATE.alt_steps == 0
+tracking.shutdown()
+tracking.initGpio("sim", state_path=STATE_PATH)
+now = sim.now
+tracking.resumeOrCalibrate(0, 0, force=True)
+assert sim.now > now
+
+# An unreadable state file is ignored
+with open(STATE_PATH, "w") as f:
+    f.write("{not json")
+tracking.initGpio("sim", state_path=STATE_PATH)
+assert not tracking.STATE.canResume()
+
+print("All mount state tests passed.")
@@ -0,0 +1,95 @@
+"""
+File: test_multi_dongle.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Checks the multi-dongle stream with several fake rtl_power workers, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+EXP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(EXP_DIR, "..", "src"))
+os.environ["PATH"] = os.path.join(EXP_DIR, "fake_rtl_power") + os.pathsep + os.environ["PATH"]
+os.environ["FAKE_RTL_POWER_MODE"] = "ok"
+
+from dataCollection import measSpectrum
+from multiDongle import MultiPowerStream
+from sdrRecovery import SdrRecovery
+from utilities import Log
+
+TMP_DIR = tempfile.mkdtemp()
+Log.logFilePath = os.path.join(TMP_DIR, "LOG.txt")
+Log.VERBOSE = "LOW"
+DEVICES = ["0", "1", "2"]
+
+
+def merged(stream, n):
+    found = []
+    after = 0
+    while len(found) < n:
+        integration = stream.getIntegrationAfter(after, timeout=5)
+        assert integration is not None, "no merged integration"
+        found.append(integration)
+        after = integration.end_time
+    return found
+
+
+# Split mode: each worker measures a third of the band and the spectra are joined in frequency order
+stream = MultiPowerStream(DEVICES, "980M", "1020M", "0.2s", "0", mode="split").start()
+integrations = merged(stream, 3)
+stream.stop()
+for integration in integrations:
+    assert np.all(np.diff(integration.freqs) > 0), "spectra not joined in frequency order"
+    assert 980e6 <= integration.freqs[0] and integration.freqs[-1] < 1020e6
+    assert abs(integration.power - np.mean(integration.spectrum)) < 1e-9, integration.power
+    assert abs(integration.power + 32) < 0.5 and integration.end_time - integration.start_time < 1
+print(f"split: {len(integrations[0].spectrum)} bins from {len(DEVICES)} workers, power {integrations[0].power:.3f} dB")
+
+# Average mode: every worker measures the whole band, so the merged spectrum has one worker's bins
+stream = MultiPowerStream(DEVICES, "980M", "1020M", "0.2s", "0", mode="average").start()
+integration = merged(stream, 1)[0]
+assert len(integration.freqs) == len(integration.spectrum) == 306 and abs(integration.power + 32) < 0.5
+
+# A worker that dies stops merged integrations instead of passing on partial ones. isAlive reports it, and a restart
+# (as the SDR recovery does) brings every worker back.
+assert stream.isAlive()
+stream._workers[1].terminate()
+stream._workers[1].join(timeout=3)
+time.sleep(0.5)
+stream._clearQueue()
+assert not stream.isAlive()
+assert stream.getIntegrationAfter(time.time(), timeout=1.5) is None, "merged integration without every worker"
+stream.restart()
+assert stream.isAlive()
+integration = merged(stream, 1)[0]
+assert len(integration.spectrum) == 306
+
+# measSpectrum's recovery does the same on its own
+stream._workers[0].terminate()
+recovery = SdrRecovery(base_delay=0.05, reset_command=None)
+integration = measSpectrum("980M", "1020M", "0.2s", "0", stream=stream, recovery=recovery)
+stream.stop()
+assert not np.isnan(integration.power) and recovery.counts["timeout"] >= 1 and recovery.counts["recovered"] == 1
+print("average: a dead worker stops the merged stream until it is restarted. " + recovery.summary())
+print("All multi-dongle tests passed.")
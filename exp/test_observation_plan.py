@@ -0,0 +1,139 @@
+"""
+File: test_observation_plan.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Checks compiling, saving, validating and replaying observation plans, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import clock
+import tracking
+from dataCollection import measSpectrum
+from ephemerisCache import loadCachedEphemeris
+from observationPlan import (VIOLATION_ALT_HIGH, VIOLATION_LATE, compileImagingPlan, compileTrackingPlan, executePlan,
+                             loadPlan, planSummary, savePlan, stepsToDeg, validatePlan)
+from simulatedSdr import SimulatedPowerStream
+from utilities import Log
+
+TMP_DIR = tempfile.mkdtemp()
+Log.logFilePath = os.path.join(TMP_DIR, "LOG.txt")
+Log.VERBOSE = "LOW"
+LAT, LON = "+44d13m29s", "-76d29m52s"
+START = datetime.datetime(2024, 4, 8, 16, 0, 0).timestamp()
+EPHEMERIS = loadCachedEphemeris(LAT, LON, START, START + 4 * 3600, cache_dir=TMP_DIR)
+sunAlt, sunAz = EPHEMERIS.position(START)
+offsetAlt, offsetAz = sunAlt - 16, sunAz - 70
+
+
+def footprint(frame, t):
+    sunAlt, sunAz = EPHEMERIS.position(t)
+    return sunAlt - 4, sunAz - 4
+
+
+# A 3 hour tracking session compiles in one pass, its deltas add up and none of it is late
+tracking_plan = compileTrackingPlan(EPHEMERIS, START, START + 3 * 3600, 60, 1, 0, offsetAlt, offsetAz)
+assert len(tracking_plan.steps) == 180
+assert np.all(np.cumsum(tracking_plan.steps["d_az_steps"]) == tracking_plan.steps["az_steps"])
+assert not np.any(tracking_plan.steps["violation"] & VIOLATION_LATE)
+print(planSummary(tracking_plan))
+
+# A 3 hour imaging session, one 8x8 frame every 5 minutes
+start = time.perf_counter()
+plan = compileImagingPlan(EPHEMERIS, START, START + 3 * 3600, 300, 8, 8, 1, 1, 1, 0.2, offsetAlt, offsetAz, footprint)
+compile_time = time.perf_counter() - start
+print(planSummary(plan) + f", compiled in {compile_time:.2f} s")
+steps = plan.steps
+assert len(steps) == 36 * 64 and np.all(np.bincount(steps["frame"]) == 64)
+assert validatePlan(plan) == []
+# Every frame after the first starts on time, its first pixel reached during the wait before it
+assert np.allclose(steps["time"][np.arange(64, len(steps), 64)], START + 300 * np.arange(1, 36))
+assert np.all(np.diff(steps["time"]) > 0)
+
+# Plans survive a round trip through the text file unchanged
+path = os.path.join(TMP_DIR, "plan.csv")
+savePlan(plan, path)
+loaded = loadPlan(path)
+assert loaded.header == plan.header
+for name in steps.dtype.names:
+    assert np.allclose(loaded.steps[name], steps[name], atol=1e-3), name
+with open(path) as f:
+    assert f.readline().startswith("# {") and f.readline().startswith("time,frame,row,col")
+
+# A session that drifts above the altitude limit is caught before it starts, not part way through
+high = compileImagingPlan(EPHEMERIS, START, START + 3 * 3600, 300, 8, 8, 1, 1, 1, 0.2, offsetAlt - 12, offsetAz,
+                          footprint)
+problems = validatePlan(high)
+assert len(problems) == 1 and "altitude upper limit" in problems[0], problems
+assert np.any(high.steps["violation"] & VIOLATION_ALT_HIGH)
+assert validatePlan(high, allow_clamp=True) == []
+# So is a plan edited by hand into an inconsistent one
+broken = loadPlan(path)
+broken.steps["alt_steps"][10] += 1
+assert any("deltas" in problem for problem in validatePlan(broken))
+
+# Replaying two frames on the simulated mount lands on every planned pointing at its planned time
+clock.useVirtualClock(START - 120)
+tracking.MOTOR = None
+tracking.initGpio("sim", state_path=os.path.join(TMP_DIR, "mountState.json"))
+tracking.calibrate(offsetAlt, offsetAz)
+stream = SimulatedPowerStream("980M", "1020M", "1s", LAT, LON,
+                              lambda t: tracking.antennaPosition(offsetAlt, offsetAz, t)).start()
+record = []
+
+
+def measure(step):
+    assert abs(clock.unixTime() - step["time"]) < 1e-3, (clock.unixTime(), step["time"])
+    alt, az = stepsToDeg((step["alt_steps"], step["az_steps"]), offsetAlt, offsetAz)
+    assert np.allclose(tracking.antennaPosition(offsetAlt, offsetAz), (alt, az))
+    return measSpectrum("980M", "1020M", "1s", "0", stream=stream)
+
+
+start = time.perf_counter()
+executePlan(plan, measure, lambda step, integration: record.append(integration.power), steps=steps[steps["frame"] < 2])
+replay_time = time.perf_counter() - start
+stream.stop()
+assert len(record) == 128
+# The brightest pixel of each frame is the one nearest the sun
+for frame in range(2):
+    rows = steps[steps["frame"] == frame]
+    brightest = rows[np.argmax(np.array(record[64 * frame:64 * (frame + 1)]))]
+    assert abs(brightest["row"] - 4) <= 1 and abs(brightest["col"] - 4) <= 1, brightest
+
+# A plan that is run late skips the pointings the sun has moved on from instead of taking them all at once
+tracking_plan = compileTrackingPlan(EPHEMERIS, clock.unixTime(), clock.unixTime() + 600, 60, 1, 0, offsetAlt, offsetAz,
+                                    start_steps=tracking.ledgerPosition())
+clock.sleep(330)
+taken = []
+assert executePlan(tracking_plan, lambda step: clock.unixTime(), lambda step, t: taken.append(t - step["time"])) == 4
+assert len(taken) == 4 and max(taken) < 30, taken
+# And a plan whose pointings are all past is not run at all
+problems = validatePlan(tracking_plan, now=clock.unixTime() + 60)
+assert len(problems) == 1 and "Plan ended" in problems[0], problems
+assert validatePlan(plan, now=START) == []
+print(f"Replayed {len(record)} pointings ({steps['time'][127] - steps['time'][0] + 1:.0f} s of session) in "
+      f"{replay_time:.2f} s")
+print("All observation plan tests passed.")
@@ -0,0 +1,89 @@
+"""
+File: test_on_the_fly.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Checks on-the-fly scanning and gridding on a simulated mount and SDR, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import clock
+import tracking
+from dataCollection import measSpectrum
+from onTheFly import gridSamples, scanFrame
+from simulatedSdr import SimulatedPowerStream
+from solarPosition import sunPosition
+from utilities import Log, parseAngle
+
+TMP_DIR = tempfile.mkdtemp()
+Log.logFilePath = os.path.join(TMP_DIR, "LOG.txt")
+Log.VERBOSE = "LOW"
+LAT, LON = "+44d13m29s", "-76d29m52s"
+
+# Gridding: samples go to the nearest pixel centre, outside and nan samples are dropped
+mean, err, counts = gridSamples([0, 0.2, 1.4, 5, 0], [0, -0.3, 2.1, 0, 0], [1, 3, 7, 100, np.nan], 0, 0, 1, 1, 2, 3)
+assert counts.tolist() == [[2, 0, 0], [0, 0, 1]], counts
+assert mean[0][0] == 2 and mean[1][2] == 7 and np.isnan(mean[0][1]), mean
+assert np.isclose(err[0][0], 1) and np.isnan(err[1][2]), err
+
+clock.useVirtualClock(datetime.datetime(2024, 4, 8, 18, 0, 0).timestamp())
+tracking.MOTOR = None
+tracking.initGpio("sim", state_path=os.path.join(TMP_DIR, "mountState.json"))
+tracking.calibrate(0, 0)
+
+# A constant speed scan move plays in the background, and the antenna position is known at any time during it
+tracking.moveStepper(5, 10)
+start = clock.unixTime()
+tracking.moveStepper(0, 8, wait=False, speed=1)
+move = tracking.lastMove()
+assert move.start_time == start and clock.unixTime() == start
+assert abs(move.end_time - start - 8) < 0.2, move.end_time - start
+alt, az = tracking.antennaPosition(0, 0, np.array([start, start + 2, start + 4, move.end_time + 1]))
+assert np.allclose(alt, 5, atol=0.05) and np.allclose(az, [10, 12, 14, 18], atol=0.15), (alt, az)
+tracking.waitForMove()
+assert clock.unixTime() == move.end_time
+
+# A frame around the sun. The offsets put the sun in the middle of the mount's range.
+sunAlt, sunAz = [float(x) for x in sunPosition(clock.unixTime(), parseAngle(LAT), parseAngle(LON))]
+offsetAlt, offsetAz = sunAlt - 16, sunAz - 70
+pointing = lambda t: tracking.antennaPosition(offsetAlt, offsetAz, t)
+stream = SimulatedPowerStream("980M", "1020M", "1s", LAT, LON, pointing, bin_noise_db=0.1).start()
+antAlt, antAz = tracking.resumeOrCalibrate(offsetAlt, offsetAz, force=True)
+startAlt, startAz = sunAlt - 3.5, sunAz - 3.5
+
+frame_start = clock.unixTime()
+samples, antAlt, antAz = scanFrame(lambda after: measSpectrum("980M", "1020M", "1s", "0", stream=stream, after=after),
+                                   1, antAlt, antAz, startAlt, startAz, 8, 8, 1, 1, 1, offsetAlt, offsetAz)
+frame_time = clock.unixTime() - frame_start
+power, err, counts = gridSamples([s.alt for s in samples], [s.az for s in samples],
+                                 [s.integration.power for s in samples], startAlt, startAz, 1, 1, 8, 8)
+assert counts.min() >= 1, counts
+assert np.all(np.diff([s.time for s in samples]) > 0)
+peak = tuple(int(x) for x in np.unravel_index(np.nanargmax(power), power.shape))
+assert peak in [(3, 3), (3, 4), (4, 3), (4, 4)], (peak, np.round(power, 1))
+# 8 rows of 8 deg at 1 deg/s, plus the row steps and the slew from home to the frame
+assert 64 < frame_time < 85, frame_time
+print(f"On-the-fly 8x8 frame in {frame_time:.1f} s, {len(samples)} integrations, peak at pixel {peak}")
+print("All on-the-fly tests passed.")
@@ -0,0 +1,82 @@
+"""
+File: test_prepositioning.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Checks that eclipse frames start where the antenna was pre-positioned, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import glob
+import os
+import re
+import subprocess as sp
+import sys
+import tempfile
+import numpy as np
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+# Half an hour of 8x8 frames every 2 minutes through the April 8 2024 eclipse at Queen's
+ARGS = ["--simulate", "1", "--sim_start", "2024-04-08T18:00:00", "--duration", "0:30", "--meas_interval", "2",
+        "--plot_figure", "0", "--verbose", "LOW", "--elevation_offset", "28", "--azimuth_offset", "70",
+        "--force_calibration", "1"]
+POINT = r"alt=([-0-9.]+), az=([-0-9.]+)"
+
+sys.path.insert(0, SRC_DIR)
+from observationPlan import VIOLATION_LATE, loadPlan
+
+# Stop-and-stare sessions are compiled, with each frame's first pixel moved to as soon as the frame before it ends. So
+# every frame after the first starts on its planned time, with no slew left at its start.
+run_dir = tempfile.mkdtemp()
+plan_path = os.path.join(run_dir, "plan.csv")
+rst = sp.run([sys.executable, os.path.join(SRC_DIR, "eclipseImaging.py")] + ARGS + ["--compile_plan", plan_path],
+             cwd=run_dir, capture_output=True, text=True)
+if rst.returncode != 0 or not os.path.exists(plan_path):
+    print(rst.stderr)
+    raise SystemExit("eclipseImaging.py --compile_plan failed")
+steps = loadPlan(plan_path).steps
+firsts = steps[np.flatnonzero(np.diff(steps["frame"], prepend=-1))]
+assert len(firsts) > 10 and not np.any(steps["violation"] & VIOLATION_LATE)
+assert np.allclose(firsts["time"][1:], firsts["time"][1] + 120 * np.arange(len(firsts) - 1)), firsts["time"]
+print(f"--otf 0: {len(firsts)} frames, every frame after the first starts on time")
+
+# On-the-fly frames are still planned one at a time, the next frame's start pre-positioned while waiting for it
+run_dir = tempfile.mkdtemp()
+rst = sp.run([sys.executable, os.path.join(SRC_DIR, "eclipseImaging.py")] + ARGS + ["--otf", "1"], cwd=run_dir,
+             capture_output=True, text=True)
+if rst.returncode != 0:
+    print(rst.stderr)
+    raise SystemExit("eclipseImaging.py failed")
+with open(glob.glob(os.path.join(run_dir, "Log", "*", "LOG*.txt"))[0]) as f:
+    log = f.read()
+assert " ERROR: " not in log
+prepositions = [tuple(map(float, m))
+                for m in re.findall("Pre-positioning to the next frame's start corner: " + POINT, log)]
+frames = log.split(" INFO: Frame ")[1:]
+assert len(prepositions) == len(frames) - 1 and len(frames) > 10, (len(prepositions), len(frames))
+
+# The first move of every frame after the first is to where the antenna was sent while waiting
+slews = []
+for (alt, az), frame in zip(prepositions, frames[1:]):
+    first = tuple(map(float, re.search(r"Degrees to move in altitude: ([-0-9.e]+) Degrees to move in azimuth: "
+                                       r"([-0-9.e]+)", frame).groups()))
+    first = (alt + first[0], az + first[1])
+    slews.append(max(abs(first[0] - alt), abs(first[1] - az)))
+assert max(slews) < 0.05, slews
+print(f"--otf 1: {len(frames)} frames, largest slew left at the start of a frame {max(slews):.3f} deg")
+print("All pre-positioning tests passed.")
@@ -0,0 +1,101 @@
+"""
+File: test_scan_planner.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Checks the scan orders and move time estimates on a simulated mount, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import clock
+import tracking
+from scanPlanner import (SCAN_ORDERS, gridPixels, hilbertOrder, minimumSlewOrder, orderMoveTime, planScan,
+                         serpentineOrder, spiralOrder)
+from utilities import Log
+
+TMP_DIR = tempfile.mkdtemp()
+Log.logFilePath = os.path.join(TMP_DIR, "LOG.txt")
+Log.VERBOSE = "LOW"
+clock.useVirtualClock(0)
+tracking.MOTOR = None
+tracking.initGpio("sim", state_path=os.path.join(TMP_DIR, "mountState.json"))
+tracking.calibrate(0, 0)
+
+# Every order visits every pixel once
+for height, width in [(1, 1), (3, 5), (8, 8), (6, 11)]:
+    n = height * width
+    pixels = gridPixels(height, width)
+    for order in [serpentineOrder(height, width), hilbertOrder(height, width),
+                  spiralOrder(height, width, (height / 3, width / 3)),
+                  minimumSlewOrder(pixels[:, 0], pixels[:, 1], 0, 0)]:
+        assert sorted(order.tolist()) == list(range(n)), (height, width, order)
+
+# Serpentine and Hilbert (on a power of two square) only ever move one pixel
+for order, size in [(serpentineOrder(8, 8), 8), (hilbertOrder(8, 8), 8)]:
+    steps = np.abs(np.diff(gridPixels(size, size)[order], axis=0)).sum(axis=1)
+    assert np.all(steps == 1), steps
+# Serpentine starts from any corner
+assert serpentineOrder(2, 3, (1, 2)).tolist() == [5, 4, 3, 0, 1, 2]
+assert serpentineOrder(3, 2, (0, 1)).tolist() == [1, 0, 2, 3, 5, 4]
+# The spiral starts on the pixel nearest the centre and never moves further out before a ring is done
+spiral = gridPixels(9, 9)[spiralOrder(9, 9, (5.2, 2.9))]
+assert spiral[0].tolist() == [5, 3]
+rings = np.abs(spiral - [5, 3]).max(axis=1)
+assert np.all(np.diff(rings) >= 0), rings
+
+# Estimated move times match the simulated moves, to within the step the ledger may round either way
+for diffAlt, diffAz in [(0, 1), (1, 0), (3, -7), (-0.5, 20), (0, 0)]:
+    tracking.moveStepper(abs(diffAlt) + 1, abs(diffAz) + 1)
+    start = clock.unixTime()
+    tracking.moveStepper(diffAlt, diffAz)
+    actual = clock.unixTime() - start
+    estimate = tracking.estimateMoveTime(diffAlt, diffAz)
+    assert abs(actual - estimate) <= 0.05 * actual + 0.05, (diffAlt, diffAz, actual, estimate)
+
+# The minimum slew order beats nearest neighbour alone on a scattered set, and is never slower than serpentine on a
+# full frame
+rng = np.random.default_rng(1)
+alt, az = rng.uniform(0, 10, 60), rng.uniform(0, 30, 60)
+left = set(range(60))
+antAlt, antAz = 0.0, 0.0
+order = minimumSlewOrder(alt, az, antAlt, antAz)
+assert sorted(order.tolist()) == list(range(60))
+greedy, a, z = [], antAlt, antAz
+while left:
+    k = min(left, key=lambda k: tracking.estimateMoveTime(alt[k] - a, az[k] - z))
+    greedy.append(k)
+    left.remove(k)
+    a, z = alt[k], az[k]
+greedy_time = orderMoveTime(alt[greedy], az[greedy], antAlt, antAz)
+opt_time = orderMoveTime(alt[order], az[order], antAlt, antAz)
+assert opt_time < greedy_time, (opt_time, greedy_time)
+print(f"60 scattered pixels: nearest neighbour {greedy_time:.1f} s of slewing, with 2-opt {opt_time:.1f} s")
+
+for antAlt, antAz in [(0, 0), (14, 24), (17, 27)]:
+    plans = {name: planScan(8, 8, 10, 20, 1, 1, antAlt, antAz, 14, 24, orders=(name,)) for name in SCAN_ORDERS}
+    best = planScan(8, 8, 10, 20, 1, 1, antAlt, antAz, 14, 24)
+    assert best.move_time == min(plan.move_time for plan in plans.values())
+    print(f"Antenna at ({antAlt}, {antAz}): " + ", ".join(f"{name} {plan.move_time:.1f}s"
+                                                          for name, plan in plans.items()) + f", using {best.name}")
+print("All scan planner tests passed.")
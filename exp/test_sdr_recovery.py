@@ -0,0 +1,115 @@
+"""
+File: test_sdr_recovery.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: SDR fault recovery test using a fake rtl_power for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import math
+import os
+import sys
+import tempfile
+
+EXP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(EXP_DIR, "..", "src"))
+os.environ["PATH"] = os.path.join(EXP_DIR, "fake_rtl_power") + os.pathsep + os.environ["PATH"]
+
+from utilities import Log
+import sdrRecovery
+from dataCollection import measSpectrum, measSpectrumAdaptive
+from powerStream import Integration, PowerStream
+from rtlPowerParser import parseBuffer
+from sdrRecovery import SdrError, SdrRecovery
+
+Log.logFilePath = os.path.join(tempfile.mkdtemp(), "LOG.txt")
+Log.VERBOSE = "LOW"
+
+counter = os.path.join(tempfile.mkdtemp(), "count")
+os.environ["FAKE_RTL_POWER_COUNTER"] = counter
+
+
+def run(mode, stream=False, fails=2):
+    os.environ["FAKE_RTL_POWER_MODE"] = mode
+    os.environ["FAKE_RTL_POWER_FAILS"] = str(fails)
+    if os.path.exists(counter):
+        os.remove(counter)
+    recovery = SdrRecovery(max_retries=3, base_delay=0.05, reset_command="true")
+    power_stream = PowerStream("980M", "1020M", "0.2s", "0").start() if stream else None
+    integration = measSpectrum("980M", "1020M", "0.2s", "0", stream=power_stream, recovery=recovery)
+    if power_stream is not None:
+        power_stream.stop()
+    print(f"{mode:6s} stream={stream!s:5s} power={integration.power:8.3f} {recovery.summary()}")
+    return integration, recovery
+
+
+integration, recovery = run("ok")
+assert not math.isnan(integration.power) and recovery.counts["recovered"] == 0
+
+integration, recovery = run("flaky")
+assert not math.isnan(integration.power) and recovery.counts["timeout"] == 2 and recovery.counts["recovered"] == 1
+
+integration, recovery = run("fail")
+assert math.isnan(integration.power) and recovery.counts["error"] == 4 and recovery.counts["skipped"] == 1
+
+integration, recovery = run("nan")
+assert math.isnan(integration.power) and recovery.counts["nan"] == 4 and recovery.counts["skipped"] == 1
+
+integration, recovery = run("flaky", stream=True, fails=1)
+assert not math.isnan(integration.power) and recovery.counts["recovered"] == 1
+
+integration, recovery = run("hang", stream=True)
+assert math.isnan(integration.power) and recovery.counts["timeout"] == 4 and recovery.counts["skipped"] == 1
+
+# A cut off line is dropped and the rest of the sweep is kept
+integration, recovery = run("truncated")
+assert not math.isnan(integration.power) and recovery.counts["error"] == 0
+hops = parseBuffer(b"2024-04-08, 18:00:00, 980000000, 982400000, 128000.00, 16, -32.1, -32.2, -32.3\n"
+                   b"2024-04-08, 18:00:00, 982400000, 984800000, 128000.00, 16, -32.1, -3")
+assert len(hops.bins) == 1 and hops.bins.shape[1] == 3
+
+# A stream that cannot be restarted counts as a failed attempt instead of stopping the observation
+
+
+def restart():
+    raise OSError("rtl_power not found")
+
+
+def measure():
+    raise SdrError("timeout", "no integration received from power stream")
+
+
+recovery = SdrRecovery(max_retries=2, base_delay=0.01, reset_command=None)
+integration = recovery.run(measure, restart=restart, failed=lambda: Integration(0, 0, float("nan"), [], []))
+assert math.isnan(integration.power) and recovery.counts["error"] == 2 and recovery.counts["skipped"] == 1
+print(f"restart fails       {recovery.summary()}")
+
+# Adaptive integration keeps the spectrum of the later sub-integrations when the first one fails
+os.environ["FAKE_RTL_POWER_MODE"] = "flaky"
+os.environ["FAKE_RTL_POWER_FAILS"] = "1"
+if os.path.exists(counter):
+    os.remove(counter)
+sdrRecovery.DEFAULT_RECOVERY.max_retries = 0
+sdrRecovery.DEFAULT_RECOVERY.reset_command = "true"
+integration, error, int_time = measSpectrumAdaptive("980M", "1020M", "0.2s", "0", 1e9, 0.4, 0.6)
+assert not math.isnan(integration.power) and int_time == 0.4, (integration.power, int_time)
+assert len(integration.spectrum) > 0 and len(integration.freqs) == len(integration.spectrum)
+print(f"adaptive, first failed power={integration.power:8.3f} {len(integration.spectrum)} bins")
+
+print("All SDR recovery tests passed.")
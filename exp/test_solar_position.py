@@ -0,0 +1,49 @@
+"""
+File: test_solar_position.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Accuracy test of the NumPy (NOAA) sun position against astropy for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from solarPosition import sunPositionNoaa, sunPositionAstropy
+
+MAX_ERROR_DEG = 0.05  # The antenna beam is about 3 degrees wide
+SITES = {"Kingston": (44.2247, -76.4978), "Cape Town": (-33.92, 18.42), "Tromso": (69.65, 18.96), "Quito": (-0.18, -78.47)}
+
+# Every 4.4 hours over 2024-2027, so every time of day and season is sampled
+times = np.arange(1704067200, 1704067200 + 4 * 365.25 * 86400, 4.4 * 3600)
+
+for name, (lat, lon) in SITES.items():
+    alt_noaa, az_noaa = sunPositionNoaa(times, lat, lon)
+    alt_astropy, az_astropy = sunPositionAstropy(times, lat, lon)
+    up = alt_astropy > 0
+    alt_error = np.abs(alt_noaa - alt_astropy)[up]
+    # Azimuth error as an angle on the sky
+    az_error = (np.abs(np.mod(az_noaa - az_astropy + 180, 360) - 180) * np.cos(np.radians(alt_astropy)))[up]
+    print(f"{name:10s} {up.sum():5d} samples above horizon, max error alt {alt_error.max():.4f} deg, "
+          f"az {az_error.max():.4f} deg")
+    assert alt_error.max() < MAX_ERROR_DEG and az_error.max() < MAX_ERROR_DEG, name
+
+print("All sun position tests passed.")
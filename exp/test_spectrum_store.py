@@ -0,0 +1,107 @@
+"""
+File: test_spectrum_store.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Write-then-read round trip of the spectrum store with the fake rtl_power, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+
+EXP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(EXP_DIR, "..", "src"))
+os.environ["PATH"] = os.path.join(EXP_DIR, "fake_rtl_power") + os.pathsep + os.environ["PATH"]
+os.environ["FAKE_RTL_POWER_MODE"] = "ok"
+
+from powerStream import Integration, PowerStream
+from rfiMask import RfiMask
+from spectrumStore import INDEX_DTYPE, INDEX_FILE, SPECTRA_FILE, SPECTRUM_DTYPE, SpectrumStore, loadSpectra
+from utilities import Log
+
+TMP_DIR = tempfile.mkdtemp()
+Log.logFilePath = os.path.join(TMP_DIR, "LOG.txt")
+Log.VERBOSE = "LOW"
+CHUNK_ROWS = 4
+
+
+def rows(dirPath):
+    return len(loadSpectra(dirPath)[0])
+
+
+# Integrations from the fake rtl_power, one with a strong spike so the RFI mask flags a bin
+stream = PowerStream("980M", "1020M", "0.1s", "0").start()
+integrations = []
+after = 0
+while len(integrations) < 2 * CHUNK_ROWS + 2:
+    integration = stream.getIntegrationAfter(after)
+    assert integration is not None, "no integration from the fake rtl_power"
+    integrations.append(integration)
+    after = integration.end_time
+stream.stop()
+n_bins = len(integrations[0].freqs)
+spiked = integrations[1].spectrum.copy()
+spiked[10] += 30
+integrations[1] = RfiMask().apply(integrations[1]._replace(spectrum=spiked))
+assert integrations[1].masked > 0
+
+# Rows are only written when a chunk fills, and always as a whole chunk
+store_dir = os.path.join(TMP_DIR, "store")
+os.mkdir(store_dir)
+store = SpectrumStore(store_dir, chunk_rows=CHUNK_ROWS)
+assert rows(store_dir) == 0 and loadSpectra(store_dir)[1].shape == (0, 0)
+for k, integration in enumerate(integrations):
+    store.append(integration, 100 + k, 20 + k)
+    assert rows(store_dir) == (k + 1) // CHUNK_ROWS * CHUNK_ROWS, (k, rows(store_dir))
+
+# close() writes the partial last chunk
+store.close()
+index, spectra, freqs = loadSpectra(store_dir)
+assert isinstance(index, np.memmap) and isinstance(spectra, np.memmap)
+assert index.shape == (len(integrations),) and index.dtype == INDEX_DTYPE
+assert spectra.shape == (len(integrations), n_bins) and spectra.dtype == SPECTRUM_DTYPE
+assert freqs.shape == (n_bins,) and np.array_equal(freqs, integrations[0].freqs)
+assert os.path.getsize(os.path.join(store_dir, SPECTRA_FILE)) == len(integrations) * n_bins * SPECTRUM_DTYPE.itemsize
+
+# Every row reads back as written. The spectrum is stored raw, with only the fraction masked in the index.
+for k, integration in enumerate(integrations):
+    assert np.array_equal(spectra[k], np.asarray(integration.spectrum, dtype=SPECTRUM_DTYPE)), k
+    assert index["time"][k] == integration.start_time and (index["az"][k], index["alt"][k]) == (100 + k, 20 + k)
+    assert index["power"][k] == np.float32(integration.power) and index["masked"][k] == np.float32(integration.masked)
+assert spectra[1][10] == np.float32(spiked[10]) and index["masked"][1] > 0
+print(f"{len(integrations)} integrations of {n_bins} bins in chunks of {CHUNK_ROWS}: round trip exact")
+
+# A reopened store carries on at the end, storing nan for failed or mismatched spectra
+store = SpectrumStore(store_dir, chunk_rows=CHUNK_ROWS)
+store.append(Integration(1, 2, float("nan"), np.zeros(0), np.zeros(0)), 0, 0)
+store.append(integrations[0]._replace(spectrum=integrations[0].spectrum[:-1]), 0, 0)
+store.close()
+index, spectra, freqs = loadSpectra(store_dir)
+assert spectra.shape == (len(integrations) + 2, n_bins)
+assert np.all(np.isnan(spectra[-2:])) and np.isnan(index["power"][-2])
+
+# A run cut off mid-write is read up to its last complete row
+with open(os.path.join(store_dir, SPECTRA_FILE), "ab") as f:
+    f.write(np.zeros(n_bins // 2, dtype=SPECTRUM_DTYPE).tobytes())
+with open(os.path.join(store_dir, INDEX_FILE), "ab") as f:
+    f.write(np.zeros(1, dtype=INDEX_DTYPE).tobytes())
+assert loadSpectra(store_dir)[1].shape == (len(integrations) + 2, n_bins)
+print("All spectrum store tests passed.")
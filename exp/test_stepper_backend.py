@@ -0,0 +1,83 @@
+"""
+File: test_stepper_backend.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Checks compiled step waveforms on the simulated stepper backend, for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import tracking
+from motionProfile import planMove
+from stepperBackend import SimulatedBackend, compileWaveform, waveformEdges
+from utilities import Log
+
+TMP_DIR = tempfile.mkdtemp()
+Log.logFilePath = os.path.join(TMP_DIR, "LOG.txt")
+Log.VERBOSE = "LOW"
+
+# Every pulse of a compiled move becomes one rising and one falling edge, in time order, with both pins grouped
+# where the axes step together
+profile = planMove(300, 120, tracking.ALT_LIMITS, tracking.AZ_LIMITS)
+waveform = compileWaveform(profile, tracking.STEP_ALT, tracking.STEP_AZ, tracking.STEP_HIGH_TIME)
+edges = waveformEdges(waveform)
+times = np.array([t for t, level, pins in edges])
+assert np.all(np.diff(times) >= 0)
+assert sum(len(pins) for t, level, pins in edges if level == 1) == 420
+assert sum(len(pins) for t, level, pins in edges if level == 0) == 420
+assert any(len(pins) == 2 for t, level, pins in edges)
+assert waveform.duration == profile.duration
+
+# A move with no steps has no edges
+assert waveformEdges(compileWaveform(planMove(0, 0, tracking.ALT_LIMITS, tracking.AZ_LIMITS), 1, 2, 0.001)) == []
+
+# moveStepper on the simulated backend records the right number of steps and directions, and costs no real time
+tracking.initGpio("sim", state_path=os.path.join(TMP_DIR, "mountState.json"))
+sim = tracking.MOTOR
+assert isinstance(sim, SimulatedBackend)
+t0 = time.perf_counter()
+tracking.moveStepper(-3, 10, cal_flag=True)
+elapsed = time.perf_counter() - t0
+steps_alt = abs(round(-3 / tracking.STEP_SIZE * tracking.EL_GEAR_RATIO))
+steps_az = abs(round(10 / tracking.STEP_SIZE * tracking.AZ_GEAR_RATIO))
+assert sim.stepCount(tracking.STEP_ALT) == steps_alt, sim.stepCount(tracking.STEP_ALT)
+assert sim.stepCount(tracking.STEP_AZ) == steps_az, sim.stepCount(tracking.STEP_AZ)
+assert sim.levels[tracking.DIR_ALT] == tracking.CCW and sim.levels[tracking.DIR_AZ] == tracking.CCW
+expected = planMove(steps_alt, steps_az, tracking.ALT_LIMITS, tracking.AZ_LIMITS).duration
+assert abs(sim.now - expected) < 1e-9
+# Step pins end low and the direction was set before the first pulse
+assert sim.levels[tracking.STEP_ALT] == 0 and sim.levels[tracking.STEP_AZ] == 0
+first_step = min(t for t, pin, level in sim.timeline if pin in (tracking.STEP_ALT, tracking.STEP_AZ))
+assert all(t <= first_step for t, pin, level in sim.timeline if pin in (tracking.DIR_ALT, tracking.DIR_AZ))
+print(f"Simulated {steps_alt} alt and {steps_az} az steps, {sim.now:.2f} s of motion in {1000 * elapsed:.1f} ms")
+
+# Compiling a long slew is cheap next to the move itself
+profile = planMove(667, 586, tracking.ALT_LIMITS, tracking.AZ_LIMITS)
+t0 = time.perf_counter()
+edges = waveformEdges(compileWaveform(profile, tracking.STEP_ALT, tracking.STEP_AZ, tracking.STEP_HIGH_TIME))
+compile_ms = 1000 * (time.perf_counter() - t0)
+print(f"Compiled a {profile.duration:.2f} s slew ({len(edges)} edge groups) in {compile_ms:.2f} ms")
+
+print("All stepper backend tests passed.")
@@ -0,0 +1,218 @@
+"""
+File: adaptiveImaging.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Coarse-to-fine imaging that refines only around the solar peak for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+import clock
+from onTheFly import ScanSample
+from scanPlanner import minimumSlewOrder
+from tracking import antennaPosition, getDifferenceDeg, moveStepper
+from utilities import Log
+
+REFINE_FRACTION = 0.5  # Cells scoring at least this fraction of the best score are refined
+PEAK_FIT_DB = 3  # Samples within this many dB of the brightest are used to fit the peak
+
+
+def coarseToFineFrame(measure, antAlt, antAz, startAlt, startAz, height, width, el_step, az_step, offsetAlt,
+                      offsetAz, settle_time, max_pixels, max_time=0, coarse=2, min_size=0.5, on_sample=None):
+    """
+    Image a frame coarse to fine. A coarse pass measures one cell of coarse x coarse pixels at a time, then the cells
+    that stand out (bright above the median of the frame, or differing most from their neighbours) are split into
+    four cells of half the size, and so on down to min_size pixels. Everything else stays coarse. Cells are measured
+    stop-and-stare, in a minimum slew order within each pass, until max_pixels measurements or max_time seconds.
+
+    :param measure: Function measuring one Integration where the antenna is.
+    :param antAlt: Current altitude of the antenna in degrees. (float)
+    :param antAz: Current azimuth of the antenna in degrees. (float)
+    :param startAlt: Altitude of the centre of the first row in degrees. (float)
+    :param startAz: Azimuth of the centre of the first column in degrees. (float)
+    :param height: Image height in pixels. (int)
+    :param width: Image width in pixels. (int)
+    :param el_step: Altitude between pixel centres in degrees. (float)
+    :param az_step: Azimuth between pixel centres in degrees. (float)
+    :param offsetAlt: Altitude offset of the antenna in degrees. (float)
+    :param offsetAz: Azimuth offset of the antenna in degrees. (float)
+    :param settle_time: Seconds to wait after each move before measuring. (float)
+    :param max_pixels: Most measurements to take. (int)
+    :param max_time: Most seconds to spend on the frame, 0 for no limit. Default = 0 (float)
+    :param coarse: Size of the coarse cells in pixels. Default = 2 (int)
+    :param min_size: Smallest cell size in pixels. Default = 0.5 (float)
+    :param on_sample: Function called with every ScanSample as it is measured. Default = None
+    :return: List of ScanSamples, the size in pixels of the cell each was measured for (np.ndarray), and the altitude
+             and azimuth of the antenna at the end. (list, np.ndarray, float, float)
+    """
+    start = clock.unixTime()
+    rows = np.minimum((coarse - 1) / 2 + coarse * np.arange(-(-height // coarse)), height - 1)
+    cols = np.minimum((coarse - 1) / 2 + coarse * np.arange(-(-width // coarse)), width - 1)
+    pendingRow, pendingCol = [a.ravel() for a in np.meshgrid(rows, cols, indexing="ij")]
+    pendingSize = np.full(len(pendingRow), float(coarse))
+
+    samples = []
+    cellRow, cellCol, cellSize, refined = np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0, dtype=bool)
+
+    def outOfTime():
+        return max_time > 0 and clock.unixTime() - start >= max_time
+
+    level = 0
+    while len(pendingRow) > 0 and len(samples) < max_pixels and not outOfTime():
+        # Shortest slew through this pass, after cutting it to what is left of the pixel budget
+        pendingRow, pendingCol, pendingSize = [a[:max_pixels - len(samples)] for a in
+                                               (pendingRow, pendingCol, pendingSize)]
+        order = minimumSlewOrder(startAlt + pendingRow * el_step, startAz + pendingCol * az_step, antAlt, antAz)
+        Log.info(f"Coarse-to-fine pass {level}: {len(order)} cells of {pendingSize.max()} pixels")
+        for k in order:
+            if outOfTime():
+                break
+            diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, startAlt + pendingRow[k] * el_step,
+                                                              startAz + pendingCol[k] * az_step, offsetAlt, offsetAz)
+            moveStepper(diffAlt, diffAz)
+            clock.sleep(settle_time)
+            integration = measure()
+            alt, az = antennaPosition(offsetAlt, offsetAz)
+            sample = ScanSample((integration.start_time + integration.end_time) / 2, alt, az, integration)
+            samples.append(sample)
+            cellRow = np.append(cellRow, pendingRow[k])
+            cellCol = np.append(cellCol, pendingCol[k])
+            cellSize = np.append(cellSize, pendingSize[k])
+            refined = np.append(refined, False)
+            if on_sample is not None:
+                on_sample(sample)
+
+        power = np.array([sample.integration.power for sample in samples])
+        if np.all(np.isnan(power)):
+            # Failed or skipped integrations give nothing to refine around
+            Log.warn(f"Coarse-to-fine pass {level}: no valid measurements, skipping refinement")
+            break
+        pendingRow, pendingCol, pendingSize, refine = _nextPass(cellRow, cellCol, cellSize, refined, power, height,
+                                                                width, min_size)
+        refined |= refine
+        level += 1
+
+    Log.info(f"Coarse-to-fine frame: {len(samples)} measurements in {clock.unixTime() - start:.1f}s, "
+             f"{height * width} pixels in the full frame")
+    return samples, cellSize, antAlt, antAz
+
+
+def _nextPass(cellRow, cellCol, cellSize, refined, power, height, width, min_size):
+    """
+    Choose the cells to refine and lay out their children, brightest and steepest cells first.
+
+    :return: Row, column and size of the child cells, and which cells were refined. (np.ndarray x 4)
+    """
+    score = refineScores(cellRow, cellCol, cellSize, power)
+    eligible = ~refined & (cellSize / 2 >= min_size) & ~np.isnan(score)
+    if not np.any(eligible):
+        return np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(len(cellRow), dtype=bool)
+    refine = eligible & (score >= REFINE_FRACTION * np.max(score[eligible]))
+    parents = np.flatnonzero(refine)[np.argsort(-score[refine], kind="stable")]
+
+    # Four children a quarter of the parent's size off its centre, dropping any outside the frame or already measured
+    offsets = np.array([[-1, -1], [-1, 1], [1, -1], [1, 1]]) / 4
+    childRow = (cellRow[parents, None] + offsets[:, 0] * cellSize[parents, None]).ravel()
+    childCol = (cellCol[parents, None] + offsets[:, 1] * cellSize[parents, None]).ravel()
+    childSize = np.repeat(cellSize[parents] / 2, 4)
+    keep = (childRow >= -0.5) & (childRow <= height - 0.5) & (childCol >= -0.5) & (childCol <= width - 0.5)
+    keep &= ~np.any(np.isclose(childRow[:, None], cellRow[None, :]) & np.isclose(childCol[:, None], cellCol[None, :]),
+                    axis=1)
+    return childRow[keep], childCol[keep], childSize[keep], refine
+
+
+def refineScores(row, col, size, power):
+    """
+    How much each cell needs refining: its power above the median of all cells, plus the largest power difference to
+    any cell next to it (within one and a half of its size). Failed (nan) cells score nan.
+
+    :param row: Row of every cell centre, in pixels. (np.ndarray)
+    :param col: Column of every cell centre, in pixels. (np.ndarray)
+    :param size: Size of every cell, in pixels. (np.ndarray)
+    :param power: Power of every cell (dB). (np.ndarray)
+    :return: Score of every cell (dB). (np.ndarray)
+    """
+    background = np.nanmedian(power) if np.any(~np.isnan(power)) else 0.0
+    distance = np.hypot(row[:, None] - row[None, :], col[:, None] - col[None, :])
+    neighbour = (distance <= 1.5 * size[:, None]) & (distance > 0) & ~np.isnan(power[None, :])
+    difference = np.where(neighbour, np.abs(power[:, None] - power[None, :]), 0)
+    return np.maximum(power - background, 0) + difference.max(axis=1, initial=0)
+
+
+def regridNearest(alt, az, values, startAlt, startAz, el_step, az_step, height, width):
+    """
+    Regrid scattered samples to a full image, each pixel taking the value of the sample nearest its centre (in
+    pixels). Nan samples are left out, and the image is all nan without any.
+
+    :return: height x width image. (np.ndarray)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    index = nearestSample(alt, az, ~np.isnan(values), startAlt, startAz, el_step, az_step, height, width)
+    return np.where(index >= 0, values[index], np.nan)
+
+
+def nearestSample(alt, az, valid, startAlt, startAz, el_step, az_step, height, width):
+    """
+    :param valid: Which samples may be used. (np.ndarray of bool)
+    :return: Index of the valid sample nearest the centre of every pixel (in pixels), all -1 without any.
+             (height x width np.ndarray of int)
+    """
+    candidates = np.flatnonzero(valid)
+    if len(candidates) == 0:
+        return np.full((height, width), -1)
+    sampleRow = (np.asarray(alt, dtype=np.float64)[candidates] - startAlt) / el_step
+    sampleCol = (np.asarray(az, dtype=np.float64)[candidates] - startAz) / az_step
+    rows, cols = np.mgrid[0:height, 0:width]
+    distance = (rows.ravel()[:, None] - sampleRow[None, :]) ** 2 + (cols.ravel()[:, None] - sampleCol[None, :]) ** 2
+    return candidates[np.argmin(distance, axis=1)].reshape(height, width)
+
+
+def peakPosition(alt, az, power):
+    """
+    Position of the power peak, from a least squares paraboloid through the samples within PEAK_FIT_DB of the
+    brightest. Falls back to the brightest sample if there are too few samples or the fit has no maximum.
+
+    :param alt: Altitude of every sample in degrees. (np.ndarray)
+    :param az: Azimuth of every sample in degrees. (np.ndarray)
+    :param power: Power of every sample (dB). (np.ndarray)
+    :return: Altitude and azimuth of the peak in degrees, nan without any valid (not nan) sample. (float, float)
+    """
+    alt, az, power = [np.asarray(a, dtype=np.float64) for a in (alt, az, power)]
+    valid = ~np.isnan(power)
+    if not np.any(valid):
+        return float("nan"), float("nan")
+    alt, az, power = alt[valid], az[valid], power[valid]
+    brightest = int(np.argmax(power))
+    near = power >= power[brightest] - PEAK_FIT_DB
+    if np.sum(near) < 6:
+        return float(alt[brightest]), float(az[brightest])
+    # Fit around the brightest sample, so the terms stay well conditioned
+    x = alt[near] - alt[brightest]
+    y = az[near] - az[brightest]
+    terms = np.column_stack([np.ones_like(x), x, y, x * x, y * y, x * y])
+    a, b, c, d, e, f = np.linalg.lstsq(terms, power[near], rcond=None)[0]
+    hessian = np.array([[2 * d, f], [f, 2 * e]])
+    if not np.all(np.linalg.eigvalsh(hessian) < 0):
+        return float(alt[brightest]), float(az[brightest])
+    dx, dy = np.linalg.solve(hessian, [-b, -c])
+    # A vertex outside the fitted samples is an extrapolation, not a peak
+    if not (x.min() <= dx <= x.max() and y.min() <= dy <= y.max()):
+        return float(alt[brightest]), float(az[brightest])
+    return float(alt[brightest] + dx), float(az[brightest] + dy)
@@ -0,0 +1,151 @@
+"""
+File: clock.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Wall and virtual clocks for the Solar Eclipse Viewer project for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import datetime
+import time
+
+# Everything that waits or timestamps a session goes through the functions below, so a session can run on a virtual
+# clock with simulated hardware and replay as fast as the code runs. Code driving real hardware (step pulse timing,
+# rtl_power timeouts) keeps using the time module directly.
+
+
+class Clock:
+    """
+    The wall clock.
+    """
+
+    def unixTime(self):
+        return time.time()
+
+    def now(self):
+        return datetime.datetime.now()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def elapse(self, seconds):
+        # Real hardware takes its own time
+        pass
+
+    def pause(self, seconds):
+        import matplotlib.pyplot as plt
+        plt.pause(seconds)
+
+
+class VirtualClock(Clock):
+    """
+    Clock that only moves when slept on, or when simulated hardware reports the time it took.
+    """
+
+    def __init__(self, start=None):
+        """
+        :param start: Unix time the clock starts at. Default = None (now)
+        """
+        self.t = time.time() if start is None else float(start)
+
+    def unixTime(self):
+        return self.t
+
+    def now(self):
+        return datetime.datetime.fromtimestamp(self.t)
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.t += seconds
+
+    def elapse(self, seconds):
+        self.sleep(seconds)
+
+    def pause(self, seconds):
+        # Redraw live figures without waiting for them
+        import matplotlib.pyplot as plt
+        plt.pause(0.001)
+        self.sleep(seconds)
+
+
+CLOCK = Clock()
+
+
+def useVirtualClock(start=None):
+    """
+    Switch every session clock call over to a virtual clock.
+
+    :param start: Unix time the clock starts at. Default = None (now)
+    :return: VirtualClock
+    """
+    global CLOCK
+    CLOCK = VirtualClock(start)
+    return CLOCK
+
+
+def isVirtual():
+    """
+    :return: Whether the virtual clock is in use. (bool)
+    """
+    return isinstance(CLOCK, VirtualClock)
+
+
+def unixTime():
+    """
+    :return: Current unix time. (float)
+    """
+    return CLOCK.unixTime()
+
+
+def now():
+    """
+    :return: Current local time, like datetime.datetime.now(). (datetime.datetime)
+    """
+    return CLOCK.now()
+
+
+def sleep(seconds):
+    """
+    Wait for a number of seconds. Negative waits return straight away.
+
+    :param seconds: (float)
+    :return: None
+    """
+    CLOCK.sleep(seconds)
+
+
+def elapse(seconds):
+    """
+    Account for time taken by simulated hardware. Moves a virtual clock on, does nothing on the wall clock.
+
+    :param seconds: (float)
+    :return: None
+    """
+    CLOCK.elapse(seconds)
+
+
+def pause(seconds):
+    """
+    sleep() for loops showing live matplotlib figures, keeping them responsive (plt.pause).
+
+    :param seconds: (float)
+    :return: None
+    """
+    CLOCK.pause(seconds)
@@ -23,13 +23,19 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 import subprocess as sp
-import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 import os
-from utilities import Log
+import clock
+from powerStream import Integration
+from rtlPowerParser import parseBuffer, meanPower, sweepSpectrum
+from sdrRecovery import SdrError, DEFAULT_RECOVERY
+from rfiMask import DEFAULT_RFI_MASK, maskedSpectrum
+from utilities import Log, parseFrequency, parseInterval
 
+RTL_POWER_STARTUP_TIME = 3  # Seconds allowed on top of the integration interval for rtl_power to open the SDR
 
-def measPower(freq_min, freq_max, integration_interval, gain):
+
+def measPower(freq_min, freq_max, integration_interval, gain, stream=None):
     """
     Measure the power using rtl_power and return the mean power over all frequencies and time.
 
@@ -37,44 +43,283 @@ def measPower(freq_min, freq_max, integration_interval, gain):
     :param freq_max: Maximum frequency for power measurement.
     :param integration_interval: Integration interval for SDR power measurement.
     :param gain: Input gain for RTL-SDR
+    :param stream: Running PowerStream. If given, the next integration from the stream is used instead of starting
+                   a new rtl_power process. Default = None
     :return: Mean power (dB) over all frequencies and time.
     """
-    Log.info("Starting measPower with min: " + str(freq_min) + " max: " + str(freq_max) + " integration interval: "
+    return measSpectrum(freq_min, freq_max, integration_interval, gain, stream=stream).power
+
+
+def measSpectrum(freq_min, freq_max, integration_interval, gain, stream=None, after=None, recovery=None,
+                 rfi_mask=None, band=None):
+    """
+    Measure the per-bin spectrum using rtl_power. Takes the same arguments as measPower. A measurement that hangs,
+    errors or gives nan is retried by the SDR recovery layer, and flagged with a nan power if it keeps failing.
+    Bins flagged as RFI are left out of the reported power, the spectrum itself is returned unmasked. When the sweep
+    also covers reference bands, the power and the RFI statistics are taken over the main band only.
+
+    :param freq_min: Minimum frequency for power measurement.
+    :param freq_max: Maximum frequency for power measurement.
+    :param integration_interval: Integration interval for SDR power measurement.
+    :param gain: Input gain for RTL-SDR
+    :param stream: Running PowerStream. Default = None
+    :param after: With a stream, unix time the integration must start after. Default = None (now)
+    :param recovery: SdrRecovery to use. Default = None (DEFAULT_RECOVERY)
+    :param rfi_mask: RfiMask to use. Default = None (DEFAULT_RFI_MASK)
+    :param band: (freq_min, freq_max) strings of the main band inside the sweep. Default = None (the whole sweep)
+    :return: Integration holding the start and end time, the mean power (dB), the per-bin frequencies and powers
+             and the bins masked as RFI and their fraction.
+    """
+    Log.info("Starting measSpectrum with min: " + str(freq_min) + " max: " + str(freq_max) + " integration interval: "
              + integration_interval)
+    if recovery is None:
+        recovery = DEFAULT_RECOVERY
+    if rfi_mask is None:
+        rfi_mask = DEFAULT_RFI_MASK
+    request_time = clock.unixTime() if after is None else after
+
+    def failed():
+        return Integration(request_time, clock.unixTime(), float("nan"), np.zeros(0), np.zeros(0))
+
+    if stream is not None:
+        integration = recovery.run(lambda: _streamIntegration(stream, request_time), restart=stream.restart,
+                                   failed=failed)
+    else:
+        # No output file is given, so rtl_power writes its CSV lines to stdout and they are parsed straight from the
+        # pipe.
+        command = ['rtl_power', '-f', str(freq_min) + ':' + str(freq_max) + ':128k', '-i', str(integration_interval),
+                   '-g', str(gain), '-1', '-']
+        timeout = parseInterval(integration_interval) + RTL_POWER_STARTUP_TIME
+        Log.info("Executing command: " + " ".join(command))
+        integration = recovery.run(lambda: _rtlPowerIntegration(command, timeout), failed=failed)
+
+    in_band = None
+    if band is not None and tuple(band) != (freq_min, freq_max) and len(integration.spectrum) > 0:
+        in_band = bandBins(integration.freqs, band)
+    integration = rfi_mask.apply(integration, in_band)
+    if in_band is not None:
+        spectrum = maskedSpectrum(integration)[in_band]
+        spectrum = spectrum[~np.isnan(spectrum)]
+        integration = integration._replace(power=float(spectrum.mean()) if len(spectrum) else float("nan"))
+    Log.info("Power: " + str(integration.power) + " (integration " + str(integration.start_time) + " - "
+             + str(integration.end_time) + ", " + "%.1f" % (100 * integration.masked) + "% of bins masked)")
+    Log.info("End measSpectrum")
+
+    return integration
 
-    command = ('rtl_power -f ' + str(freq_min) + ':' + str(freq_max) + ':128k -i ' + str(integration_interval)
-               + ' -g ' + str(gain) + ' -1 tmp/rtl_power_out.csv')
-    Log.info("Executing command: " + str(command))
 
-    # TODO: Parse rst for error message or nan. Log error.
+def _rtlPowerIntegration(command, timeout):
+    """
+    Run rtl_power once and parse its output.
+
+    :param command: rtl_power command as a list of arguments.
+    :param timeout: Seconds before rtl_power is considered hung. (float)
+    :return: Integration
+    :raises SdrError: if rtl_power hangs, exits with an error or prints no data that can be parsed.
+    """
+    start_time = clock.unixTime()
     try:
-        #rst = sp.run([command], shell=True, capture_output=True, text=True, check=True) # TODO: check=True was causing issues in testing
-        rst = sp.run([command], shell=True, capture_output=True, text=True, timeout=4)
-    except:
-        Log.error("Error executing rtl_power command")
-        Log.error("User must manually reset SDR now")
-        input("Press enter once SDR reset...")
-        try:
-            Log.info("2nd attempt executing command: " + str(command))
-            rst = sp.run([command], shell=True, capture_output=True, text=True, timeout=4)
-        except:
-            Log.error("Error occurred again. Exiting program.")
-            exit()
-        #sp.run(['./resetusb'], shell=True, capture_output=True, text=True, timeout=1)
-
-    Log.info("Done rtl_power. Reading CSV...")
-    raw = pd.read_csv("tmp/rtl_power_out.csv")
-    proc = raw.iloc[:, 0:4]
-    proc[len(proc.columns)] = raw.iloc[:, 6:-1].mean(axis=1)
-    mean_all_freq_and_time = proc.iloc[:, 4].mean()
-
-    Log.info("Power: " + str(mean_all_freq_and_time))
-    Log.info("End measPower")
-
-    return mean_all_freq_and_time
-
-
-def writeData(current_time, power, sunAlt, sunAz):
+        rst = sp.run(command, capture_output=True, timeout=timeout)
+    except sp.TimeoutExpired:
+        raise SdrError("timeout", "rtl_power did not finish within " + str(timeout) + " s")
+    except OSError as e:
+        raise SdrError("error", "could not run rtl_power: " + str(e))
+
+    try:
+        hops = parseBuffer(rst.stdout)
+    except (ValueError, IndexError) as e:
+        raise SdrError("error", "could not parse rtl_power output: " + str(e))
+    if rst.returncode != 0 or len(hops.bins) == 0:
+        stderr = rst.stderr.decode(errors="replace").strip().splitlines()
+        raise SdrError("error", "rtl_power exited with code " + str(rst.returncode) + ", "
+                       + str(len(hops.bins)) + " hops. " + (stderr[-1] if stderr else ""))
+
+    freqs, spectrum = sweepSpectrum(hops)
+    return Integration(start_time, clock.unixTime(), meanPower(hops), freqs, spectrum)
+
+
+def _streamIntegration(stream, request_time):
+    """
+    Return the next integration from a stream that starts after request_time. Waiting for a fresh integration
+    guarantees none of it was taken while the antenna was still moving.
+
+    :param stream: Running PowerStream.
+    :param request_time: Unix time the integration must start after. (float)
+    :return: Integration
+    :raises SdrError: if no integration arrives in time.
+    """
+    integration = stream.getIntegrationAfter(request_time)
+    if integration is None:
+        raise SdrError("timeout", "no integration received from power stream")
+    return integration
+
+
+def measSpectrumAdaptive(freq_min, freq_max, sub_interval, gain, target_error, min_time, max_time, stream=None,
+                         band=None):
+    """
+    Integrate short sub-integrations until the standard error of the mean band power falls below target_error.
+    Bright on-sun pixels converge quickly, while noisy pixels keep integrating up to max_time. At least two
+    sub-integrations are needed for an error, and without a stream each one pays the rtl_power startup, so a stream
+    should always be given.
+
+    :param freq_min: Minimum frequency for power measurement.
+    :param freq_max: Maximum frequency for power measurement.
+    :param sub_interval: Length of one sub-integration. Ex. 0.2s (string)
+    :param gain: Input gain for RTL-SDR
+    :param target_error: Standard error of the mean power to stop at (dB). (float)
+    :param min_time: Minimum integration time in seconds. (float)
+    :param max_time: Maximum integration time in seconds. (float)
+    :param stream: Running PowerStream. If given, consecutive integrations from the stream are used. Default = None
+    :param band: (freq_min, freq_max) strings of the main band the error is computed on. Default = None (the whole
+                 sweep)
+    :return: Integration averaged over all sub-integrations, standard error of its power (dB) and achieved
+             integration time in seconds.
+    """
+    Log.info("Starting measSpectrumAdaptive with target error: " + str(target_error) + " dB, time bounds: "
+             + str(min_time) + "-" + str(max_time) + " s")
+    sub_sec = parseInterval(sub_interval)
+    if stream is None:
+        Log.warn("Adaptive integration without a power stream starts rtl_power for every sub-integration")
+
+    first = measSpectrum(freq_min, freq_max, sub_interval, gain, stream=stream, band=band)
+    integration = first
+    # Spectra are averaged over the sub-integrations with the same bins as the first valid one. A failed first
+    # sub-integration has no spectrum to compare against.
+    reference = None
+    powers = []
+    spectra = []
+    masks = []
+    masked = []
+    attempts = 0
+    error = float("nan")
+    while True:
+        attempts += 1
+        if not np.isnan(integration.power):
+            if reference is None:
+                reference = integration
+            powers.append(integration.power)
+            masked.append(integration.masked)
+            if len(integration.spectrum) == len(reference.spectrum):
+                spectra.append(integration.spectrum)
+                if integration.mask is not None:
+                    masks.append(integration.mask)
+
+        int_time = len(powers) * sub_sec
+        if len(powers) >= 2:
+            error = float(np.std(powers, ddof=1) / np.sqrt(len(powers)))
+            if int_time >= min_time and error <= target_error:
+                break
+        if attempts * sub_sec >= max_time:
+            Log.warn("Adaptive integration reached max time with error " + str(error) + " dB")
+            break
+
+        if stream is not None:
+            # Take the integration straight after the last one instead of waiting for a new one to start.
+            integration = measSpectrum(freq_min, freq_max, sub_interval, gain, stream=stream,
+                                       after=integration.end_time - sub_sec / 2, band=band)
+        else:
+            integration = measSpectrum(freq_min, freq_max, sub_interval, gain, band=band)
+
+    power = float(np.mean(powers)) if powers else float("nan")
+    if reference is None:
+        reference = first
+    if spectra:
+        # The raw spectra are averaged, nan bins (failed reads) over the sub-integrations that have them
+        spectra = np.array(spectra)
+        n_kept = np.sum(~np.isnan(spectra), axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            spectrum = np.where(n_kept > 0, np.nansum(spectra, axis=0) / n_kept, np.nan)
+    else:
+        spectrum = reference.spectrum
+    Log.info("Adaptive power: " + str(power) + " +/- " + str(error) + " dB after " + str(int_time) + " s ("
+             + str(len(powers)) + " sub-integrations)")
+
+    # A bin masked as RFI in any sub-integration is flagged in the average
+    mask = np.any(masks, axis=0) if masks else None
+    return (Integration(first.start_time, integration.end_time, power, reference.freqs, spectrum,
+                        float(np.mean(masked)) if masked else 0.0, mask), error, int_time)
+
+
+def parseBands(bands):
+    """
+    Parse a comma separated list of bands.
+
+    :param bands: Bands as min:max pairs. Ex. "1400M:1420M,1100M:1120M" (string). None or "" for no bands.
+    :return: List of (freq_min, freq_max) strings.
+    """
+    if not bands:
+        return []
+    return [tuple(band.strip().split(":")) for band in bands.split(",")]
+
+
+def bandName(band):
+    """
+    :param band: (freq_min, freq_max) strings.
+    :return: Name used for the band in data files. Ex. 980M-1020M (string)
+    """
+    return str(band[0]) + "-" + str(band[1])
+
+
+def sweepRange(bands):
+    """
+    Frequency range of a single sweep covering every band.
+
+    :param bands: List of (freq_min, freq_max) strings.
+    :return: freq_min and freq_max of the sweep. (string, string)
+    """
+    freq_min = min((band[0] for band in bands), key=parseFrequency)
+    freq_max = max((band[1] for band in bands), key=parseFrequency)
+    return freq_min, freq_max
+
+
+def bandBins(freqs, band):
+    """
+    :param freqs: Bin frequencies in Hz. (np.ndarray)
+    :param band: (freq_min, freq_max) strings.
+    :return: Bins inside the band. (np.ndarray of bool)
+    """
+    freqs = np.asarray(freqs)
+    return (freqs >= parseFrequency(band[0])) & (freqs < parseFrequency(band[1]))
+
+
+def bandPowers(integration, bands):
+    """
+    Split the bins of one integration between bands and average each band.
+
+    :param integration: Integration covering every band, measured with the first band as its main band.
+    :param bands: List of (freq_min, freq_max) strings, the main band first.
+    :return: Dict of band name to mean power (dB). The main band gets the power exactly as measured. For the others,
+             bins masked as RFI or nan are left out, and a band with no bins left is nan.
+    """
+    freqs = np.asarray(integration.freqs)
+    spectrum = maskedSpectrum(integration)
+    powers = {bandName(bands[0]): integration.power}
+    for band in bands[1:]:
+        in_band = bandBins(freqs, band) & ~np.isnan(spectrum)
+        powers[bandName(band)] = float(spectrum[in_band].mean()) if in_band.any() else float("nan")
+    return powers
+
+
+def measBandPowers(bands, integration_interval, gain, stream=None, recovery=None):
+    """
+    Measure several bands with one SDR sweep covering all of them, so extra bands cost about the same as one.
+
+    :param bands: List of (freq_min, freq_max) strings, the main band first.
+    :param integration_interval: Integration interval for SDR power measurement.
+    :param gain: Input gain for RTL-SDR
+    :param stream: Running PowerStream over sweepRange(bands). Default = None
+    :param recovery: SdrRecovery to use. Default = None (DEFAULT_RECOVERY)
+    :return: Integration of the whole sweep with the power of the main band, and dict of band name to mean power (dB).
+    """
+    freq_min, freq_max = sweepRange(bands)
+    integration = measSpectrum(freq_min, freq_max, integration_interval, gain, stream=stream, recovery=recovery,
+                               band=bands[0])
+    powers = bandPowers(integration, bands)
+    Log.info("Band powers: " + str(powers))
+    return integration, powers
+
+
+def writeData(current_time, power, sunAlt, sunAz, band_powers=None):
     """
     Write data to a CSV file.
 
@@ -82,8 +327,10 @@ def writeData(current_time, power, sunAlt, sunAz):
     :param power: Power measurement.
     :param sunAlt: Sun's altitude.
     :param sunAz: Sun's azimuth.
+    :param band_powers: Dict of band name to power, written as extra columns in the same order every call. Default = None
     :return: None
     """
+    import pandas as pd  # Only needed here, kept out of the measurement path's imports
     Log.info("Starting writeData")
     Log.info("Writing " + str(current_time) + " " + str(power) + " " + str(sunAlt) + " " + str(sunAz))
 
@@ -93,6 +340,9 @@ def writeData(current_time, power, sunAlt, sunAz):
         'SunAltitude': [sunAlt],
         'SunAzimuth': [sunAz]
     })
+    if band_powers is not None:
+        for name, band_power in band_powers.items():
+            data['Power' + name] = [band_power]
 
     try:
         data.to_csv('data.csv', mode='a', header=False, index=False)
@@ -111,6 +361,7 @@ def plotPower(timeData, powerData, savePlot=False):
     :param powerData: List of power data.
     :return: None
     """
+    import matplotlib.pyplot as plt  # Only imported when plotting is on
     Log.info("Starting plotPower")
 
     plt.clf()
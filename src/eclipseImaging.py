@@ -24,17 +24,31 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 # Package imports
 import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-import time
 import datetime
+import clock
 import os
 import socket
 import pickle
 
 # Method imports
-from dataCollection import measPower
-from tracking import calibrate, getSunPositionFromPickle, getDifferenceDeg, moveStepper
-from utilities import Log
+from powerStream import PowerStream
+from iqPower import IQPowerStream
+from multiDongle import MultiPowerStream
+from spectrumStore import SpectrumStore
+from simulatedSdr import SimulatedPowerStream
+from imageCube import ImageCube
+from sdrRecovery import DEFAULT_RECOVERY
+from rfiMask import DEFAULT_RFI_MASK
+from dataCollection import measSpectrum, measSpectrumAdaptive, bandPowers, bandName, parseBands, sweepRange
+from ephemeris import loadEphemeris
+from ephemerisCache import loadCachedEphemeris
+from onTheFly import gridCube, gridSamples, scanFrame
+from adaptiveImaging import coarseToFineFrame, nearestSample, peakPosition
+from scanPlanner import SCAN_ORDERS, nearestCorner
+from observationPlan import compileImagingPlan, executePlan, loadPlan, planSummary, savePlan, stepsToDeg, validatePlan
+from tracking import (initGpio, resumeOrCalibrate, antennaPosition, getDifferenceDeg, ledgerPosition, moveStepper,
+                      shutdown)
+from utilities import Log, parseInterval
 
 parser = argparse.ArgumentParser(
     description='Solar Viewer is designed to measure microwave radiation from the sun. This'
@@ -60,6 +74,22 @@ parser.add_argument('--latitude', type=str, nargs='?', const='+44d13m29s', defau
                     help='Latitude of location. Default = +44d13m29s')
 parser.add_argument('--longitude', type=str, nargs='?', const='-76d29m52s', default='-76d29m52s',
                     help='Longitude of location. Default = -76d29m52s')
+parser.add_argument('--sun_source', type=str, choices={"noaa", "astropy"}, nargs='?', const="noaa", default="noaa",
+                    help='Sun position source. noaa is the built-in analytic algorithm, astropy the slower high '
+                         'precision transform. Default = noaa')
+parser.add_argument('--motor_backend', type=str, choices={"gpio", "pigpio"}, nargs='?', const="gpio", default="gpio",
+                    help='Stepper pulse backend. gpio plays each move from a thread with RPi.GPIO, pigpio hands it '
+                         'to the pigpio daemon as DMA timed waveforms (falls back to gpio if pigpiod is not running). '
+                         'Default = gpio')
+parser.add_argument('--force_calibration', type=int, nargs='?', const=1, default=0,
+                    help='Flag to home the mount even if the last session shut down cleanly and its saved position '
+                         'could be resumed. 0 = False, 1 = True. Default = 0')
+parser.add_argument('--simulate', type=int, nargs='?', const=1, default=0,
+                    help='Flag to run without hardware on a simulated mount and SDR, on a virtual clock that only moves '
+                         'when the session waits, so the session replays as fast as the code runs. 0 = False, '
+                         '1 = True. Default = 0')
+parser.add_argument('--sim_start', type=str, nargs='?', const=None, default=None,
+                    help='Local start time of a simulated session. Ex. 2024-04-08T14:00:00. Default = None (now)')
 parser.add_argument('--image_width', type=int, nargs='?', const=8, default=8,
                     help='Height of image in degrees (int). Default = 8')
 parser.add_argument('--image_height', type=int, nargs='?', const=8, default=8,
@@ -72,10 +102,65 @@ parser.add_argument('--verbose', type=str, choices={"LOW", "MED", "HIGH"}, nargs
                     default="HIGH", help="Select verbosity level of console output. Default = HIGH")
 parser.add_argument('--stabilization_time', type=float, nargs='?', const=0.2, default=0.2,
                     help='Time in seconds to wait before taking a measurement after moving the steppers. Default = 0.2')
+parser.add_argument('--scan_order', type=str, choices={"auto", "serpentine", "spiral", "hilbert", "min_slew"},
+                    nargs='?', const="auto", default="auto",
+                    help='Pixel visit order of each frame. spiral starts on the sun and works outwards, min_slew is a '
+                         'nearest neighbour order improved by 2-opt, auto picks whichever has the least estimated '
+                         'slewing. Default = auto')
+parser.add_argument('--otf', type=int, nargs='?', const=1, default=0,
+                    help='Flag to scan each frame on the fly: rows are slewed at --scan_speed while integrations stream '
+                         'back to back, and each is gridded by where the antenna was during it. Always streams. '
+                         '0 = False, 1 = True. Default = 0')
+parser.add_argument('--scan_speed', type=float, nargs='?', const=0, default=0,
+                    help='Azimuth speed in deg/s of on-the-fly rows. Default = 0 (one --integration_interval per '
+                         '--az_step)')
+parser.add_argument('--coarse_to_fine', type=int, nargs='?', const=1, default=0,
+                    help='Flag to image each frame coarse to fine: a pass of 2x2 pixel cells, then only the cells '
+                         'around the peak and its slopes are split, down to half pixel cells, within --pixel_budget '
+                         'measurements. 0 = False, 1 = True. Default = 0')
+parser.add_argument('--pixel_budget', type=int, nargs='?', const=0, default=0,
+                    help='Most measurements of a coarse-to-fine frame. Default = 0 (half the pixels of the frame)')
+parser.add_argument('--frame_time_budget', type=float, nargs='?', const=0, default=0,
+                    help='Most seconds a coarse-to-fine frame may take. Default = 0 (no limit)')
+parser.add_argument('--compile_plan', type=str, nargs='?', const=None, default=None,
+                    help='Compile the stop-and-stare session into a plan file, check it and exit without touching the '
+                         'mount. Ex. ./plan.csv. Default = None')
+parser.add_argument('--plan', type=str, nargs='?', const=None, default=None,
+                    help='Run a plan compiled with --compile_plan instead of compiling the session at startup. '
+                         'Ex. ./plan.csv. Default = None')
 parser.add_argument('--plot_figure', type=int, nargs='?', const=0, default=0,
                     help='Flag to select if plot should be generated. 0 = False, 1 = True. Default = 0')
 parser.add_argument('--socket_host', type=str, nargs='?', const=None, default=None,
                     help='Specify the hostname for the machine receiving data. Default = None (socket disabled).')
+parser.add_argument('--stream', type=int, nargs='?', const=1, default=0,
+                    help='Flag to keep one rtl_power process running for every measurement. 0 = False, 1 = True. Default = 0')
+parser.add_argument('--backend', type=str, choices={"rtl_power", "iq_psd", "iq_total"}, nargs='?', const="rtl_power",
+                    default="rtl_power", help='Power measurement backend. iq_psd and iq_total read raw IQ from rtl_sdr and '
+                                             'always stream. Default = rtl_power')
+parser.add_argument('--adaptive_error', type=float, nargs='?', const=0, default=0,
+                    help='Target standard error of each pixel power in dB. Enables adaptive integration, with '
+                         '--integration_interval as the sub-integration length and the power stream always on '
+                         '(--stream 1). Default = 0 (disabled)')
+parser.add_argument('--adaptive_min_time', type=float, nargs='?', const=0.5, default=0.5,
+                    help='Minimum adaptive integration time in seconds. Default = 0.5')
+parser.add_argument('--adaptive_max_time', type=float, nargs='?', const=5, default=5,
+                    help='Maximum adaptive integration time in seconds. Default = 5')
+parser.add_argument('--devices', type=str, nargs='?', const=None, default=None,
+                    help='Comma separated RTL-SDR device indexes or serials. Ex. 0,1. One device streams from that '
+                         'device, more than one runs a worker process per device. Default = None (first device)')
+parser.add_argument('--multi_mode', type=str, choices={"split", "average"}, nargs='?', const="split", default="split",
+                    help='With several devices, split the band between them or average co-pointed devices. Default = split')
+parser.add_argument('--ref_bands', type=str, nargs='?', const=None, default=None,
+                    help='Comma separated reference bands measured in the same sweep as the main band. '
+                         'Ex. 1100M:1120M,1400M:1420M. Default = None')
+parser.add_argument('--rfi_threshold', type=float, nargs='?', const=5, default=5,
+                    help='Leave spectrum bins further than this many robust standard deviations from the median out '
+                         'of the reported power as RFI. Stored spectra are not masked. 0 disables masking. Default = 5')
+parser.add_argument('--ephemeris', type=str, nargs='?', const=None, default=None,
+                    help='Precomputed sun position file (.npy, or a legacy .pickle). Ex. ./../bin/April8Eclipse.npy. '
+                         'Default = None (use the bin/ephemeris cache for --latitude/--longitude)')
+parser.add_argument('--channels', type=int, nargs='?', const=8, default=8,
+                    help='Number of frequency channels in the image cube of each frame (int). Default = 8')
 args = parser.parse_args()
 
 # Setup Logging
@@ -85,12 +170,33 @@ log = Log(args, os.path.realpath(__file__))
 DISH_ARM_ANGLE_CALIBRATION = 62.5 # Revered back to original value after April 7th testing
 LAT = args.latitude
 LON = args.longitude
+SUN_SOURCE = args.sun_source
+MOTOR_BACKEND = args.motor_backend
+SIMULATE = args.simulate
+if SIMULATE == 1:
+    # The clock must be virtual before anything reads the time
+    clock.useVirtualClock(None if args.sim_start is None else
+                          datetime.datetime.fromisoformat(args.sim_start).timestamp())
+    MOTOR_BACKEND = "sim"
+FORCE_CALIBRATION = args.force_calibration
 ANT_OFFSET_EL = args.elevation_offset
 ANT_OFFSET_AZ = args.azimuth_offset + DISH_ARM_ANGLE_CALIBRATION
 FREQ_MIN = args.freq_min
 FREQ_MAX = args.freq_max
+BANDS = [(FREQ_MIN, FREQ_MAX)] + parseBands(args.ref_bands)
+SWEEP_MIN, SWEEP_MAX = sweepRange(BANDS)  # One sweep covers the main band and every reference band
+DEFAULT_RFI_MASK.threshold = args.rfi_threshold
 INTEGRATION_INTERVAL = args.integration_interval
+INTEGRATION_SEC = parseInterval(INTEGRATION_INTERVAL)
+ADAPTIVE_ERROR = args.adaptive_error
+ADAPTIVE_MIN_TIME = args.adaptive_min_time
+ADAPTIVE_MAX_TIME = args.adaptive_max_time
 GAIN = args.gain
+STREAM_FLAG = args.stream
+BACKEND = args.backend
+DEVICES = args.devices.split(",") if args.devices else []
+MULTI_MODE = args.multi_mode
+N_CHANNELS = args.channels
 IMG_WIDTH = args.image_width
 IMG_HEIGHT = args.image_height
 AZ_STEP = args.az_step
@@ -98,9 +204,35 @@ EL_STEP = args.el_step
 DUR = args.duration
 MEAS_INTERVAL = args.meas_interval
 STAB_TIME = args.stabilization_time
+SCAN_ORDER_CANDIDATES = SCAN_ORDERS if args.scan_order == "auto" else (args.scan_order,)
+OTF_FLAG = args.otf
+COARSE_TO_FINE = args.coarse_to_fine
+PIXEL_BUDGET = args.pixel_budget if args.pixel_budget > 0 else IMG_WIDTH*IMG_HEIGHT // 2
+FRAME_TIME_BUDGET = args.frame_time_budget
+COMPILE_PLAN_PATH = args.compile_plan
+PLAN_PATH = args.plan
+SCAN_SPEED = args.scan_speed if args.scan_speed > 0 else AZ_STEP / INTEGRATION_SEC
 PLOT_FLAG = args.plot_figure
 SOCKET_HOST = args.socket_host
 
+# Keep one SDR process running for the whole session if requested
+POWER_STREAM = None
+if SIMULATE == 1:
+    POWER_STREAM = SimulatedPowerStream(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, LAT, LON,
+                                        lambda t: antennaPosition(ANT_OFFSET_EL, ANT_OFFSET_AZ, t), source=SUN_SOURCE).start()
+elif len(DEVICES) > 1:
+    POWER_STREAM = MultiPowerStream(DEVICES, SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, mode=MULTI_MODE).start()
+elif BACKEND != "rtl_power":
+    POWER_STREAM = IQPowerStream(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, mode=BACKEND[3:],
+                                 bands=BANDS).start()
+elif STREAM_FLAG == 1 or len(DEVICES) == 1 or OTF_FLAG == 1 or ADAPTIVE_ERROR > 0:
+    POWER_STREAM = PowerStream(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN,
+                               device=DEVICES[0] if DEVICES else None).start()
+
+# Every integration's full spectrum is kept in the run directory for later re-analysis
+SPECTRUM_STORE = SpectrumStore(Log.logDirPath)
+Log.warn(DEFAULT_RFI_MASK.describe())
+
 def socket_send(data):
     global SOCKET_HOST
     if SOCKET_HOST != None:
@@ -129,141 +261,512 @@ ECLIPSE_END_TIME = datetime.datetime(2024,4,8,16,35,00) # Starts at 2:09pm
 meas_interval = int(float(MEAS_INTERVAL))
 duration_hrs = int(DUR.split(":")[0])
 duration_min = int(DUR.split(":")[1])
-current_time = datetime.datetime.now(tz=None)
+current_time = clock.now()
 duration_hrs_min = datetime.timedelta(hours=duration_hrs, minutes=duration_min)
 end_time = current_time + duration_hrs_min - datetime.timedelta(minutes=meas_interval)
 
-# Calibration and position determination
-antAlt, antAz = calibrate(ANT_OFFSET_EL, ANT_OFFSET_AZ)
-
-def moveAndTakeImage(antAlt, antAz, startingAlt, startingAz):
-    Log.info(f"Moving to image start point: alt={startingAlt}, az={startingAz}")
-    # Initial calculation of the difference in degrees between antenna and starting position
-    diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, startingAlt, startingAz, ANT_OFFSET_EL, ANT_OFFSET_AZ)
-    degErrorAlt, degErrorAz = moveStepper(diffAlt, diffAz)
-
+# Sun positions are loaded once and interpolated for every lookup. Without --ephemeris they come from the cache, and
+# only the parts of the session not cached yet are computed.
+if args.ephemeris is not None:
+    EPHEMERIS = loadEphemeris(args.ephemeris)
+else:
+    EPHEMERIS = loadCachedEphemeris(LAT, LON, clock.unixTime(), end_time.timestamp() + 60 * meas_interval,
+                                    source=SUN_SOURCE)
+
+def measurePixel(antAlt, antAz):
+    """
+    Measure the power of one pixel and keep its spectrum. Uses adaptive integration if --adaptive_error is set.
+    The main band and any reference bands come from the same sweep.
+
+    :param antAlt: Current altitude of the antenna in degrees. (float)
+    :param antAz: Current azimuth of the antenna in degrees. (float)
+    :return: Main band power (dB), integration time (s), standard error of the power (dB, nan for fixed integration),
+             dict of band name to power (dB) for every band and the Integration itself.
+    """
+    if ADAPTIVE_ERROR > 0:
+        integration, power_err, int_time = measSpectrumAdaptive(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN,
+                                                                ADAPTIVE_ERROR, ADAPTIVE_MIN_TIME, ADAPTIVE_MAX_TIME,
+                                                                stream=POWER_STREAM, band=BANDS[0])
+    else:
+        integration = measSpectrum(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, stream=POWER_STREAM, band=BANDS[0])
+        power_err = float("nan")
+        int_time = INTEGRATION_SEC
+    SPECTRUM_STORE.append(integration, antAz, antAlt)
+    band_powers = bandPowers(integration, BANDS)
+    return band_powers[bandName(BANDS[0])], int_time, power_err, band_powers, integration
+
+
+def takePlannedImage(steps):
+    """
+    Take one stop-and-stare frame of the session plan. The pixel order, pointings and their times were all worked
+    out when the plan was compiled, so this only replays them and keeps what is measured.
+
+    :param steps: The frame's steps of PLAN. (np.ndarray)
+    :return: Frame data to send and plot. (dict)
+    """
     # Initialize a 2D array to store the data collected
     power_data = np.zeros((IMG_HEIGHT, IMG_WIDTH))
     az_data = np.zeros((IMG_HEIGHT, IMG_WIDTH))
     alt_data = np.zeros((IMG_HEIGHT, IMG_WIDTH))
     time_data = np.zeros((IMG_HEIGHT, IMG_WIDTH), dtype=object)
-
-    # Setup file to write to
-    fmt_start_time = str(datetime.datetime.now().strftime("%Y%m%d%H%M%S"))
+    int_time_data = np.zeros((IMG_HEIGHT, IMG_WIDTH))
+    power_err_data = np.zeros((IMG_HEIGHT, IMG_WIDTH))
+    band_data = {bandName(band): np.zeros((IMG_HEIGHT, IMG_WIDTH)) for band in BANDS[1:]}
+    # Channel images of the main band, binned from the spectra measured at each pixel
+    cube = ImageCube(FREQ_MIN, FREQ_MAX, N_CHANNELS, IMG_HEIGHT, IMG_WIDTH)
+
+    # Setup file to write to, named for the frame's planned start
+    fmt_start_time = str(datetime.datetime.fromtimestamp(steps["time"][0]).strftime("%Y%m%d%H%M%S"))
     save_data_path = os.path.join(Log.logDirPath, "ImageData" + fmt_start_time + ".csv")
     file = open(save_data_path, 'w')
-    file.write("time,az,alt,power\n")
+    band_header = "".join(",power" + name for name in band_data)
+    file.write("time,az,alt,power,int_time,power_err" + band_header + "\n")
     file.close()
-    Log.info("Created file " + save_data_path + " to store all image data (time, az, alt, power).")
-
-    Log.info("Beginning image scan.")
-    image_start_time = time.time()
-    # Data collection loop, scanning over the specified range in Altitude and Azimuth
-    for i in range(IMG_HEIGHT):
-        Log.info(f"Beginning row {i}")
-        # Alternate scanning direction for each row to improve efficiency
-        if i % 2 == 0:
-            for j in range(IMG_WIDTH):
-                now = datetime.datetime.now()
-                time_data[i][j] = now.strftime("%Y-%m-%d %H:%M:%S")
-                power_data[i][j] = measPower(FREQ_MIN, FREQ_MAX, INTEGRATION_INTERVAL, GAIN)
-                az_data[i][j] = antAz
-                alt_data[i][j] = antAlt
-                file = open(save_data_path, 'a')
-                file.write(f"{time_data[i][j]},{az_data[i][j]},{alt_data[i][j]},{power_data[i][j]}\n")
-                file.close()
-
-                tmpSunAlt, tmpSunAz = getSunPositionFromPickle()
-                socket_send({"id" : "pt", "sun_az" : tmpSunAz, "sun_alt" : tmpSunAlt, "telescope_az" : antAz, "telescope_alt" : antAlt,
-                             "time" : now, "power" : power_data[i][j]})
-                if j != IMG_WIDTH-1:
-                    diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, antAlt, antAz + AZ_STEP,
-                                                                      ANT_OFFSET_EL, ANT_OFFSET_AZ)
-                    moveStepper(0, diffAz)
-                time.sleep(STAB_TIME)
-        else:
-            for j in range(IMG_WIDTH):
-                now = datetime.datetime.now()
-                time_data[i][IMG_WIDTH-j-1] = now.strftime("%Y-%m-%d %H:%M:%S")
-                power_data[i][IMG_WIDTH-j-1] = measPower(FREQ_MIN, FREQ_MAX, INTEGRATION_INTERVAL, GAIN)
-                az_data[i][IMG_WIDTH-j-1] = antAz
-                alt_data[i][IMG_WIDTH-j-1] = antAlt
-                file = open(save_data_path, 'a')
-                file.write(f"{time_data[i][IMG_WIDTH-j-1]},{az_data[i][IMG_WIDTH-j-1]},{alt_data[i][IMG_WIDTH-j-1]},{power_data[i][IMG_WIDTH-j-1]}\n")
-                file.close()
-                tmpSunAlt, tmpSunAz = getSunPositionFromPickle()
-                socket_send({"id": "pt", "sun_az": tmpSunAz, "sun_alt": tmpSunAlt, "telescope_az": antAz,
-                             "telescope_alt": antAlt,
-                             "time": now, "power": power_data[i][IMG_WIDTH-j-1]})
-                if j != IMG_WIDTH-1:
-                    diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, antAlt, antAz - AZ_STEP,
-                                                                      ANT_OFFSET_EL, ANT_OFFSET_AZ)
-                    moveStepper(0, diffAz)
-                time.sleep(STAB_TIME)
-        if i != IMG_HEIGHT-1:
-            diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, antAlt + EL_STEP, antAz, ANT_OFFSET_EL,
-                                                              ANT_OFFSET_AZ)
-            moveStepper(diffAlt, 0)
-    image_end_time = time.time()
+    Log.info("Created file " + save_data_path + " to store all image data (time, az, alt, power, int_time, power_err"
+             + band_header + ").")
+    pixel_times = []
+
+    def measure(step):
+        pixel_times.append(clock.unixTime())
+        antAlt, antAz = stepsToDeg((step["alt_steps"], step["az_steps"]), ANT_OFFSET_EL, ANT_OFFSET_AZ)
+        return clock.now(), antAlt, antAz, measurePixel(antAlt, antAz)
+
+    def record(step, result):
+        now, antAlt, antAz, (power, int_time, power_err, band_powers, integration) = result
+        i, col = step["row"], step["col"]
+        time_data[i][col] = now.strftime("%Y-%m-%d %H:%M:%S")
+        power_data[i][col], int_time_data[i][col], power_err_data[i][col] = power, int_time, power_err
+        cube.setPixel(i, col, integration)
+        for name in band_data:
+            band_data[name][i][col] = band_powers[name]
+        az_data[i][col] = antAz
+        alt_data[i][col] = antAlt
+        file = open(save_data_path, 'a')
+        file.write(f"{time_data[i][col]},{az_data[i][col]},{alt_data[i][col]},{power_data[i][col]},"
+                   f"{int_time_data[i][col]},{power_err_data[i][col]}"
+                   + "".join(f",{band_data[name][i][col]}" for name in band_data) + "\n")
+        file.close()
+        socket_send({"id" : "pt", "sun_az" : step["sun_az"], "sun_alt" : step["sun_alt"], "telescope_az" : antAz,
+                     "telescope_alt" : antAlt, "time" : now, "power" : power_data[i][col]})
+
+    Log.info(f"Beginning image scan at {datetime.datetime.fromtimestamp(steps['time'][0])}.")
+    executePlan(PLAN, measure, record, steps=steps)
+    image_start_time = pixel_times[0] if pixel_times else clock.unixTime()
+    image_end_time = clock.unixTime()
+    SPECTRUM_STORE.flush()
     Log.info(f"Image completed in {image_end_time-image_start_time}s, {(image_end_time-image_start_time)/(IMG_WIDTH*IMG_HEIGHT)}s per pixel")
     # Save the collected data to a CSV file with a timestamp
     save_data_p_only_path = "ImageDataPowerOnly" + fmt_start_time + ".csv"
     np.savetxt(os.path.join(Log.logDirPath, save_data_p_only_path),
                power_data, delimiter=",")
     Log.info("Image data (power only) saved to: " + save_data_p_only_path)
+    save_cube_path = "ImageCube" + fmt_start_time + ".npz"
+    cube.save(os.path.join(Log.logDirPath, save_cube_path))
+    Log.info("Image cube (" + str(len(cube)) + " channels) saved to: " + save_cube_path)
+
+    full_data = {"id" : "im", "time" : time_data, "az" : az_data, "alt" : alt_data, "power" : power_data,
+                 "int_time" : int_time_data, "power_err" : power_err_data, "bands" : band_data,
+                 "cube" : cube.data, "channel_freqs" : cube.channelFreqs()}
+
+    return full_data
+
+
+def scanAndTakeImage(antAlt, antAz, startingAlt, startingAz):
+    """
+    Take one frame on the fly (see onTheFly.scanFrame) and grid it into the same data as takePlannedImage. Each pixel's
+    power is the mean of the integrations gridded into it, with their standard error as power_err, and az/alt/time are
+    their mean. Every integration is also written to an ImageSamples file with where the antenna was during it.
+
+    :param antAlt: Current altitude of the antenna in degrees. (float)
+    :param antAz: Current azimuth of the antenna in degrees. (float)
+    :param startingAlt: Altitude of the first row in degrees. (float)
+    :param startingAz: Azimuth of the first column in degrees. (float)
+    :return: full_data dict, and the altitude and azimuth of the antenna at the end. (dict, float, float)
+    """
+    if ADAPTIVE_ERROR > 0:
+        Log.warn("Adaptive integration does not apply to on-the-fly scans, using fixed integrations")
+    band_names = [bandName(band) for band in BANDS[1:]]
+
+    # Setup file to write to
+    fmt_start_time = str(clock.now().strftime("%Y%m%d%H%M%S"))
+    save_samples_path = os.path.join(Log.logDirPath, "ImageSamples" + fmt_start_time + ".csv")
+    file = open(save_samples_path, 'w')
+    band_header = "".join(",power" + name for name in band_names)
+    file.write("time,az,alt,power" + band_header + "\n")
+    file.close()
+    Log.info("Created file " + save_samples_path + " to store every on-the-fly integration (time, az, alt, power"
+             + band_header + ").")
+
+    sample_bands = []
+
+    def onSample(sample):
+        SPECTRUM_STORE.append(sample.integration, sample.az, sample.alt)
+        band_powers = bandPowers(sample.integration, BANDS)
+        sample_bands.append(band_powers)
+        sample_time = datetime.datetime.fromtimestamp(sample.time)
+        file = open(save_samples_path, 'a')
+        file.write(f"{sample_time.strftime('%Y-%m-%d %H:%M:%S.%f')},{sample.az},{sample.alt},"
+                   f"{sample.integration.power}" + "".join(f",{band_powers[name]}" for name in band_names) + "\n")
+        file.close()
+        tmpSunAlt, tmpSunAz = EPHEMERIS.position(sample.time)
+        socket_send({"id" : "pt", "sun_az" : tmpSunAz, "sun_alt" : tmpSunAlt, "telescope_az" : sample.az,
+                     "telescope_alt" : sample.alt, "time" : sample_time, "power" : sample.integration.power})
+
+    Log.info(f"Beginning on-the-fly image scan at {SCAN_SPEED} deg/s.")
+    image_start_time = clock.unixTime()
+    samples, antAlt, antAz = scanFrame(
+        lambda after: measSpectrum(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, stream=POWER_STREAM, after=after,
+                                   band=BANDS[0]),
+        INTEGRATION_SEC, antAlt, antAz, startingAlt, startingAz, IMG_HEIGHT, IMG_WIDTH, EL_STEP, AZ_STEP, SCAN_SPEED,
+        ANT_OFFSET_EL, ANT_OFFSET_AZ, on_sample=onSample,
+        corner=nearestCorner(IMG_HEIGHT, IMG_WIDTH, startingAlt, startingAz, EL_STEP, AZ_STEP, antAlt, antAz))
+    image_end_time = clock.unixTime()
+    SPECTRUM_STORE.flush()
+    Log.info(f"Image completed in {image_end_time-image_start_time}s, {len(samples)} integrations")
+
+    # Grid the samples into pixels
+    alt = np.array([sample.alt for sample in samples])
+    az = np.array([sample.az for sample in samples])
+
+    def grid(values):
+        return gridSamples(alt, az, values, startingAlt, startingAz, EL_STEP, AZ_STEP, IMG_HEIGHT, IMG_WIDTH)
+
+    power_data, power_err_data, counts = grid([sample.integration.power for sample in samples])
+    alt_data = grid(alt)[0]
+    az_data = grid(az)[0]
+    int_time_data = counts * INTEGRATION_SEC
+    band_data = {name: grid([band_powers[name] for band_powers in sample_bands])[0] for name in band_names}
+    time_data = np.full((IMG_HEIGHT, IMG_WIDTH), "", dtype=object)
+    for (i, j), t in np.ndenumerate(grid([sample.time for sample in samples])[0]):
+        if not np.isnan(t):
+            time_data[i][j] = datetime.datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S")
+    cube = ImageCube(FREQ_MIN, FREQ_MAX, N_CHANNELS, IMG_HEIGHT, IMG_WIDTH)
+    gridCube(samples, cube, startingAlt, startingAz, EL_STEP, AZ_STEP)
+    if np.any(counts == 0):
+        Log.warn(f"{np.sum(counts == 0)} pixels got no integrations, scan slower or use a longer --az_step")
+
+    save_data_p_only_path = "ImageDataPowerOnly" + fmt_start_time + ".csv"
+    np.savetxt(os.path.join(Log.logDirPath, save_data_p_only_path),
+               power_data, delimiter=",")
+    Log.info("Image data (power only) saved to: " + save_data_p_only_path)
+    save_cube_path = "ImageCube" + fmt_start_time + ".npz"
+    cube.save(os.path.join(Log.logDirPath, save_cube_path))
+    Log.info("Image cube (" + str(len(cube)) + " channels) saved to: " + save_cube_path)
 
-    full_data = {"id" : "im", "time" : time_data, "az" : az_data, "alt" : alt_data, "power" : power_data}
+    full_data = {"id" : "im", "time" : time_data, "az" : az_data, "alt" : alt_data, "power" : power_data,
+                 "int_time" : int_time_data, "power_err" : power_err_data, "bands" : band_data,
+                 "cube" : cube.data, "channel_freqs" : cube.channelFreqs(),
+                 "samples" : {"time" : np.array([sample.time for sample in samples]), "az" : az, "alt" : alt,
+                              "power" : np.array([sample.integration.power for sample in samples])}}
 
     return full_data, antAlt, antAz
 
 
-frame_count = 0
-Log.info(f"Beginning main loop. Current time: {current_time}. Loop will continue until: {end_time}.")
-while current_time < end_time:
-    iteration_start_time = datetime.datetime.now(tz=None)
-    sunAlt, sunAz = getSunPositionFromPickle()
+def refineAndTakeImage(antAlt, antAz, startingAlt, startingAz):
+    """
+    Take one frame coarse to fine (see adaptiveImaging.coarseToFineFrame), measuring finely only around the sun. The
+    measurements are written to an ImageSamples file and kept in full_data["samples"], and regridded into the same
+    data as takePlannedImage, each pixel taking the measurement nearest its centre.
 
-    # Calculate the starting Altitude and Azimuth based on the sun's position and image dimensions
-    startingAlt = sunAlt - (IMG_HEIGHT*EL_STEP / 2) + frame_count*0.32
-    startingAz = sunAz - (IMG_WIDTH*AZ_STEP / 2) + frame_count*0.62
-    finalAlt = startingAlt + IMG_HEIGHT*EL_STEP
-    finalAz = startingAz + IMG_WIDTH*AZ_STEP
+    :param antAlt: Current altitude of the antenna in degrees. (float)
+    :param antAz: Current azimuth of the antenna in degrees. (float)
+    :param startingAlt: Altitude of the first row in degrees. (float)
+    :param startingAz: Azimuth of the first column in degrees. (float)
+    :return: full_data dict, and the altitude and azimuth of the antenna at the end. (dict, float, float)
+    """
+    band_names = [bandName(band) for band in BANDS[1:]]
 
-    # Checking that entire image is within limits before beginning
-    Log.info("Checking bounds of image are within limits...")
-    if finalAlt > (UPPER_LIM_ALT + ANT_OFFSET_EL) or finalAlt < (LOWER_LIM_ALT + ANT_OFFSET_EL):
-        Log.error("Image Final altitude " + str(finalAlt) + " is out of range. Exiting")
-        exit()
-    if startingAlt > (UPPER_LIM_ALT + ANT_OFFSET_EL) or startingAlt < (LOWER_LIM_ALT + ANT_OFFSET_EL):
-        Log.error("Image Starting altitude " + str(startingAlt) + " is out of range. Exiting")
-        exit()
-    if finalAz > (UPPER_LIM_AZ + ANT_OFFSET_AZ) or finalAz < (LOWER_LIM_AZ + ANT_OFFSET_AZ):
-        Log.error("Image Final azimuth " + str(finalAz) + " is out of range. Exiting")
-        exit()
-    if startingAz > (UPPER_LIM_AZ + ANT_OFFSET_AZ) or startingAz < (LOWER_LIM_AZ + ANT_OFFSET_AZ):
-        Log.error("Image Starting azimuth " + str(startingAz) + " is out of range. Exiting")
-        exit()
-    Log.info("All image bounds are within limits.")
+    # Setup file to write to
+    fmt_start_time = str(clock.now().strftime("%Y%m%d%H%M%S"))
+    save_samples_path = os.path.join(Log.logDirPath, "ImageSamples" + fmt_start_time + ".csv")
+    file = open(save_samples_path, 'w')
+    band_header = "".join(",power" + name for name in band_names)
+    file.write("time,az,alt,power" + band_header + "\n")
+    file.close()
+    Log.info("Created file " + save_samples_path + " to store every coarse-to-fine measurement (time, az, alt, power"
+             + band_header + ").")
+
+    sample_bands = []
+
+    def measure():
+        if ADAPTIVE_ERROR > 0:
+            return measSpectrumAdaptive(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, ADAPTIVE_ERROR,
+                                        ADAPTIVE_MIN_TIME, ADAPTIVE_MAX_TIME, stream=POWER_STREAM, band=BANDS[0])[0]
+        return measSpectrum(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, stream=POWER_STREAM, band=BANDS[0])
+
+    def onSample(sample):
+        SPECTRUM_STORE.append(sample.integration, sample.az, sample.alt)
+        band_powers = bandPowers(sample.integration, BANDS)
+        sample_bands.append(band_powers)
+        sample_time = datetime.datetime.fromtimestamp(sample.time)
+        file = open(save_samples_path, 'a')
+        file.write(f"{sample_time.strftime('%Y-%m-%d %H:%M:%S.%f')},{sample.az},{sample.alt},"
+                   f"{sample.integration.power}" + "".join(f",{band_powers[name]}" for name in band_names) + "\n")
+        file.close()
+        tmpSunAlt, tmpSunAz = EPHEMERIS.position(sample.time)
+        socket_send({"id" : "pt", "sun_az" : tmpSunAz, "sun_alt" : tmpSunAlt, "telescope_az" : sample.az,
+                     "telescope_alt" : sample.alt, "time" : sample_time, "power" : sample.integration.power})
+
+    Log.info(f"Beginning coarse-to-fine image scan, at most {PIXEL_BUDGET} measurements.")
+    image_start_time = clock.unixTime()
+    samples, cell_size, antAlt, antAz = coarseToFineFrame(
+        measure, antAlt, antAz, startingAlt, startingAz, IMG_HEIGHT, IMG_WIDTH, EL_STEP, AZ_STEP, ANT_OFFSET_EL,
+        ANT_OFFSET_AZ, STAB_TIME, PIXEL_BUDGET, max_time=FRAME_TIME_BUDGET, on_sample=onSample)
+    image_end_time = clock.unixTime()
+    SPECTRUM_STORE.flush()
+    Log.info(f"Image completed in {image_end_time-image_start_time}s, {len(samples)} measurements")
+
+    # Regrid the measurements into pixels
+    alt = np.array([sample.alt for sample in samples])
+    az = np.array([sample.az for sample in samples])
+    power = np.array([sample.integration.power for sample in samples])
+    peakAlt, peakAz = peakPosition(alt, az, power)
+    if np.isnan(peakAlt):
+        Log.warn("No valid measurements in the frame, no peak found")
+    else:
+        Log.info(f"Peak at alt={peakAlt:.3f}, az={peakAz:.3f}")
+    nearest = nearestSample(alt, az, ~np.isnan(power), startingAlt, startingAz, EL_STEP, AZ_STEP, IMG_HEIGHT,
+                            IMG_WIDTH)
+
+    def regrid(values):
+        return np.where(nearest >= 0, np.asarray(values, dtype=np.float64)[nearest], np.nan)
+
+    power_data = regrid(power)
+    int_time_data = regrid([sample.integration.end_time - sample.integration.start_time for sample in samples])
+    power_err_data = np.full((IMG_HEIGHT, IMG_WIDTH), np.nan)
+    band_data = {name: regrid([band_powers[name] for band_powers in sample_bands]) for name in band_names}
+    alt_data, az_data = np.meshgrid(startingAlt + np.arange(IMG_HEIGHT) * EL_STEP,
+                                    startingAz + np.arange(IMG_WIDTH) * AZ_STEP, indexing="ij")
+    time_data = np.full((IMG_HEIGHT, IMG_WIDTH), "", dtype=object)
+    cube = ImageCube(FREQ_MIN, FREQ_MAX, N_CHANNELS, IMG_HEIGHT, IMG_WIDTH)
+    for (i, j), k in np.ndenumerate(nearest):
+        if k >= 0:
+            time_data[i][j] = datetime.datetime.fromtimestamp(samples[k].time).strftime("%Y-%m-%d %H:%M:%S")
+            cube.setPixel(i, j, samples[k].integration)
+
+    save_data_p_only_path = "ImageDataPowerOnly" + fmt_start_time + ".csv"
+    np.savetxt(os.path.join(Log.logDirPath, save_data_p_only_path),
+               power_data, delimiter=",")
+    Log.info("Image data (power only) saved to: " + save_data_p_only_path)
+    save_cube_path = "ImageCube" + fmt_start_time + ".npz"
+    cube.save(os.path.join(Log.logDirPath, save_cube_path))
+    Log.info("Image cube (" + str(len(cube)) + " channels) saved to: " + save_cube_path)
 
-    full_data, antAlt, antAz = moveAndTakeImage(antAlt, antAz, startingAlt, startingAz)
+    full_data = {"id" : "im", "time" : time_data, "az" : az_data, "alt" : alt_data, "power" : power_data,
+                 "int_time" : int_time_data, "power_err" : power_err_data, "bands" : band_data,
+                 "cube" : cube.data, "channel_freqs" : cube.channelFreqs(), "peak" : (peakAlt, peakAz),
+                 "samples" : {"time" : np.array([sample.time for sample in samples]), "az" : az, "alt" : alt,
+                              "power" : power, "cell_size" : cell_size}}
 
+    return full_data, antAlt, antAz
+
+
+def frameStart(frame_count, t=None):
+    """
+    Calculate the starting Altitude and Azimuth of a frame based on the sun's position and image dimensions.
+
+    :param frame_count: Number of the frame in the session. (int)
+    :param t: Unix time the frame starts at. Default = None (now)
+    :return: Altitude and azimuth of the first pixel in degrees. (float, float)
+    """
+    sunAlt, sunAz = EPHEMERIS.position(t)
+    startingAlt = sunAlt - (IMG_HEIGHT*EL_STEP / 2) + frame_count*0.32
+    startingAz = sunAz - (IMG_WIDTH*AZ_STEP / 2) + frame_count*0.62
+    return startingAlt, startingAz
+
+
+def frameProblems(frame_count, t=None):
+    """
+    Check that the whole footprint of a frame is inside the mount's limits.
+
+    :param frame_count: Number of the frame in the session. (int)
+    :param t: Unix time the frame starts at. Default = None (now)
+    :return: List of problems, empty if the frame can be taken. (list of string)
+    """
+    startingAlt, startingAz = frameStart(frame_count, t)
+    # On-the-fly rows start half a pixel outside the frame
+    lowAz = startingAz - AZ_STEP/2 if OTF_FLAG == 1 else startingAz
+    problems = []
+    for name, value, low, high in (
+            ("starting altitude", startingAlt, LOWER_LIM_ALT + ANT_OFFSET_EL, UPPER_LIM_ALT + ANT_OFFSET_EL),
+            ("final altitude", startingAlt + IMG_HEIGHT*EL_STEP, LOWER_LIM_ALT + ANT_OFFSET_EL,
+             UPPER_LIM_ALT + ANT_OFFSET_EL),
+            ("starting azimuth", lowAz, LOWER_LIM_AZ + ANT_OFFSET_AZ, UPPER_LIM_AZ + ANT_OFFSET_AZ),
+            ("final azimuth", startingAz + IMG_WIDTH*AZ_STEP, LOWER_LIM_AZ + ANT_OFFSET_AZ,
+             UPPER_LIM_AZ + ANT_OFFSET_AZ)):
+        if value < low or value > high:
+            problems.append(f"Frame {frame_count} {name} {value} is out of range")
+    return problems
+
+
+def prepositionNextFrame(antAlt, antAz, frame_count, t):
+    """
+    Start slewing to the corner of the next frame nearest the antenna, without waiting for the move, so the slew
+    happens while waiting for the frame instead of at its start. Starting at the nearest corner makes successive
+    frames alternate scan direction, each beginning where the last one ended.
+
+    :param antAlt: Current altitude of the antenna in degrees. (float)
+    :param antAz: Current azimuth of the antenna in degrees. (float)
+    :param frame_count: Number of the next frame in the session. (int)
+    :param t: Unix time the next frame starts at. (float)
+    :return: Altitude and azimuth the antenna is moving to in degrees. (float, float)
+    """
+    startingAlt, startingAz = frameStart(frame_count, t)
+    corner = nearestCorner(IMG_HEIGHT, IMG_WIDTH, startingAlt, startingAz, EL_STEP, AZ_STEP, antAlt, antAz)
+    targetAlt = startingAlt + corner[0]*EL_STEP
+    targetAz = startingAz + corner[1]*AZ_STEP
+    if OTF_FLAG == 1:
+        # On-the-fly rows start half a pixel outside the frame
+        targetAz += AZ_STEP/2 if corner[1] != 0 else -AZ_STEP/2
+    Log.info(f"Pre-positioning to the next frame's start corner: alt={targetAlt}, az={targetAz}")
+    diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, targetAlt, targetAz, ANT_OFFSET_EL, ANT_OFFSET_AZ)
+    moveStepper(diffAlt, diffAz, wait=False)
+    return antAlt, antAz
+
+
+def showImage(full_data):
+    """
+    Send a finished frame over the socket and plot it if requested.
+
+    :param full_data: Frame data from takePlannedImage, scanAndTakeImage or refineAndTakeImage. (dict)
+    :return: None
+    """
     socket_send(full_data)
 
     if PLOT_FLAG == 1:
         Log.info("Generating plot...")
+        import matplotlib.pyplot as plt
         # Display the collected data as an image
         plt.imshow(full_data["power"], origin='lower', interpolation=None)
         plt.savefig(os.path.join(Log.logDirPath, "figure.png"))
         plt.show()
 
+
+def checkPlan(plan, mount_started=False):
+    """
+    Log a plan's summary and any problems with it, save it if --compile_plan was given, and exit if it cannot be run
+    or was only to be compiled.
+
+    :param plan: ObservationPlan
+    :param mount_started: True once initGpio has run, so the mount is shut down cleanly before exiting. (bool)
+    :return: None
+    """
+    Log.info(planSummary(plan))
+    problems = validatePlan(plan, offsetAlt=ANT_OFFSET_EL, offsetAz=ANT_OFFSET_AZ, now=clock.unixTime())
+    for problem in problems:
+        Log.error(problem)
+    if COMPILE_PLAN_PATH is not None:
+        savePlan(plan, COMPILE_PLAN_PATH)
+        Log.info("Plan saved to: " + COMPILE_PLAN_PATH)
+    if len(problems) > 0 or COMPILE_PLAN_PATH is not None:
+        if len(problems) > 0:
+            Log.error("Plan cannot be run. Exiting")
+        if POWER_STREAM is not None:
+            POWER_STREAM.stop()
+        if mount_started:
+            shutdown()
+        exit()
+
+
+def compilePlan(start_steps):
+    """
+    Compile the stop-and-stare session from now on, one frame every meas_interval.
+
+    :param start_steps: Ledger position the mount starts from. (tuple)
+    :return: ObservationPlan
+    """
+    return compileImagingPlan(EPHEMERIS, clock.unixTime(), end_time.timestamp(), 60 * meas_interval, IMG_HEIGHT,
+                              IMG_WIDTH, EL_STEP, AZ_STEP, INTEGRATION_SEC, STAB_TIME, ANT_OFFSET_EL, ANT_OFFSET_AZ,
+                              frameStart, orders=SCAN_ORDER_CANDIDATES, start_steps=start_steps,
+                              info={"latitude": LAT, "longitude": LON})
+
+
+# Stop-and-stare sessions are compiled into a plan, so every frame is checked against the mount's limits before the
+# session starts, instead of the session stopping at the first frame that is out of range. A saved plan is checked
+# before the mount moves, and --compile_plan compiles from home without touching the mount.
+PLAN = None
+PLANNED = OTF_FLAG == 0 and COARSE_TO_FINE == 0
+if not PLANNED and (COMPILE_PLAN_PATH is not None or PLAN_PATH is not None):
+    Log.error("--compile_plan and --plan are only for stop-and-stare frames, not --otf or --coarse_to_fine. Exiting")
+    exit()
+if PLAN_PATH is not None:
+    PLAN = loadPlan(PLAN_PATH)
+    Log.info("Loaded " + PLAN_PATH)
+    checkPlan(PLAN)
+elif COMPILE_PLAN_PATH is not None:
+    checkPlan(compilePlan((0, 0)))
+
+# Calibration and position determination
+initGpio(MOTOR_BACKEND)
+antAlt, antAz = resumeOrCalibrate(ANT_OFFSET_EL, ANT_OFFSET_AZ, force=FORCE_CALIBRATION == 1)
+
+if PLANNED:
+    if PLAN is None:
+        # Compiled once the mount is ready, so the first frame starts from where the mount is and is not already late
+        PLAN = compilePlan(ledgerPosition())
+        checkPlan(PLAN, mount_started=True)
+    Log.info(f"Beginning planned session. Current time: {clock.now()}.")
+    # Each frame moves to its first pixel as soon as the last one ends, then waits for its planned start
+    for frame_count in np.unique(PLAN.steps["frame"]):
+        steps = PLAN.steps[PLAN.steps["frame"] == frame_count]
+        if clock.unixTime() - steps["time"][-1] > PLAN.header["max_late"]:
+            Log.warn(f"Skipping frame {frame_count}, planned for {datetime.datetime.fromtimestamp(steps['time'][0])}")
+            continue
+        Log.info(f"Frame {frame_count}")
+        showImage(takePlannedImage(steps))
+
+frame_count = 0
+if not PLANNED:
+    # Every frame's footprint is checked at its nominal start time before the first one is taken, as a compiled plan
+    # is, so the session does not stop mid-eclipse at the first frame that is out of range
+    Log.info("Checking bounds of every image are within limits...")
+    problems = []
+    for k in range(int(np.ceil((end_time - clock.now()).total_seconds() / (60*meas_interval)))):
+        problems += frameProblems(k, clock.unixTime() + k*60*meas_interval)
+    for problem in problems:
+        Log.error(problem)
+    if len(problems) > 0:
+        Log.error("Session cannot be run. Exiting")
+        if POWER_STREAM is not None:
+            POWER_STREAM.stop()
+        shutdown()
+        exit()
+    Log.info("All image bounds are within limits.")
+    Log.info(f"Beginning main loop. Current time: {current_time}. Loop will continue until: {end_time}.")
+while not PLANNED and current_time < end_time:
+    iteration_start_time = clock.now()
+    Log.info(f"Frame {frame_count}")
+    startingAlt, startingAz = frameStart(frame_count)
+
+    # A frame that starts later than checked can drift out of range, it is skipped instead of ending the session
+    problems = frameProblems(frame_count)
+    for problem in problems:
+        Log.error(problem + ". Skipping frame")
+    if len(problems) == 0:
+        if OTF_FLAG == 1:
+            full_data, antAlt, antAz = scanAndTakeImage(antAlt, antAz, startingAlt, startingAz)
+        else:
+            full_data, antAlt, antAz = refineAndTakeImage(antAlt, antAz, startingAlt, startingAz)
+
+        showImage(full_data)
+
     next_image_time = iteration_start_time+datetime.timedelta(minutes=meas_interval)
+    if next_image_time < end_time:
+        antAlt, antAz = prepositionNextFrame(antAlt, antAz, frame_count + 1,
+                                             max(next_image_time, clock.now()).timestamp())
 
     Log.info(f"Waiting until {next_image_time} before starting next image.")
-    while datetime.datetime.now() < next_image_time:
-        pass
+    clock.sleep((next_image_time - clock.now()).total_seconds())
 
-    current_time = datetime.datetime.now(tz=None)
+    current_time = clock.now()
     frame_count += 1
     Log.info(f"Updated frame_count to {frame_count}")
 
+if POWER_STREAM is not None:
+    POWER_STREAM.stop()
+SPECTRUM_STORE.close()
+shutdown()
+Log.info(DEFAULT_RECOVERY.summary())
+Log.info(DEFAULT_RFI_MASK.summary())
+
 #socket_send({"id" : "b"})
@@ -0,0 +1,212 @@
+"""
+File: ephemeris.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Precomputed sun position lookup for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import pickle
+import numpy as np
+
+import clock
+from utilities import Log
+
+# An ephemeris file is a .npy array of EPHEMERIS_DTYPE records sorted by time (unix seconds, UTC), with the sun's
+# azimuth and altitude in degrees.
+EPHEMERIS_DTYPE = np.dtype([("time", "<f8"), ("az", "<f8"), ("alt", "<f8")])
+
+
+class Ephemeris:
+    """
+    Sun positions sampled on a time grid, loaded once and interpolated between samples.
+
+    Lookups bisect the sorted time axis (O(log n)) and interpolate linearly, or with a cubic (Catmull-Rom) spline
+    through the four nearest samples, so positions do not snap to the grid. Azimuth is interpolated the short way
+    around 0/360 degrees. position() answers one time, positions() a whole array of times at once.
+    """
+
+    def __init__(self, records, kind="linear"):
+        """
+        :param records: Array of EPHEMERIS_DTYPE records sorted by time, normally memory-mapped by loadEphemeris.
+        :param kind: "linear" or "cubic" interpolation. Default = linear (string)
+        """
+        if kind not in ("linear", "cubic"):
+            raise ValueError("Unknown interpolation: " + str(kind))
+        if len(records) < 2:
+            raise ValueError("Ephemeris needs at least 2 samples, got " + str(len(records)))
+        self.kind = kind
+        # Plain ndarray views of the (possibly memory-mapped) records, indexing a np.memmap is much slower
+        records = records.view(np.ndarray)
+        self.times = records["time"]
+        self.az = records["az"]
+        self.alt = records["alt"]
+        self._warned = False
+
+    def start(self):
+        """
+        :return: Unix time of the first sample. (float)
+        """
+        return float(self.times[0])
+
+    def end(self):
+        """
+        :return: Unix time of the last sample. (float)
+        """
+        return float(self.times[-1])
+
+    def position(self, t=None):
+        """
+        Sun position at one time.
+
+        :param t: Unix time. Default = None (now)
+        :return: Sun altitude and azimuth in degrees. (float, float)
+        """
+        t = self._clamp(clock.unixTime() if t is None else float(t))
+        n = len(self.times)
+        k = min(max(int(np.searchsorted(self.times, t, side="right")) - 1, 0), n - 2)
+        t0 = float(self.times[k])
+        u = (t - t0) / (float(self.times[k + 1]) - t0)
+        alt1, alt2 = float(self.alt[k]), float(self.alt[k + 1])
+        az1 = float(self.az[k])
+        daz2 = _wrapScalar(float(self.az[k + 1]) - az1)
+
+        if self.kind == "linear":
+            return alt1 + u * (alt2 - alt1), (az1 + u * daz2) % 360
+
+        # Past either end the missing neighbour is extrapolated linearly
+        alt0 = float(self.alt[k - 1]) if k > 0 else 2 * alt1 - alt2
+        alt3 = float(self.alt[k + 2]) if k < n - 2 else 2 * alt2 - alt1
+        daz0 = _wrapScalar(float(self.az[k - 1]) - az1) if k > 0 else -daz2
+        daz3 = _wrapScalar(float(self.az[k + 2]) - az1) if k < n - 2 else 2 * daz2
+        return _catmullRom(alt0, alt1, alt2, alt3, u), (az1 + _catmullRom(daz0, 0, daz2, daz3, u)) % 360
+
+    def positions(self, t):
+        """
+        Sun positions at many times, in one vectorized pass. Times outside the ephemeris are clamped to its ends.
+
+        :param t: Unix times. (np.ndarray)
+        :return: Sun altitudes and azimuths in degrees. (np.ndarray, np.ndarray)
+        """
+        t = np.asarray(t, dtype=np.float64)
+        n = len(self.times)
+        if len(t) > 0:
+            self._clamp(float(t.min()))
+            self._clamp(float(t.max()))
+        t = np.clip(t, self.times[0], self.times[-1])
+
+        # Interval k holds times[k] <= t <= times[k + 1]
+        k = np.clip(np.searchsorted(self.times, t, side="right") - 1, 0, n - 2)
+        t0 = self.times[k]
+        u = (t - t0) / (self.times[k + 1] - t0)
+
+        if self.kind == "linear":
+            alt = self.alt[k] + u * (self.alt[k + 1] - self.alt[k])
+            az = self.az[k] + u * _wrap(self.az[k + 1] - self.az[k])
+        else:
+            km, kp = np.maximum(k - 1, 0), np.minimum(k + 2, n - 1)
+            alt1, alt2 = self.alt[k], self.alt[k + 1]
+            # Past either end the missing neighbour is extrapolated linearly
+            alt0 = np.where(k > 0, self.alt[km], 2 * alt1 - alt2)
+            alt3 = np.where(k < n - 2, self.alt[kp], 2 * alt2 - alt1)
+            alt = _catmullRom(alt0, alt1, alt2, alt3, u)
+            # Azimuth samples are taken relative to az[k] so the spline never crosses the 0/360 seam
+            az1 = self.az[k]
+            daz2 = _wrap(self.az[k + 1] - az1)
+            daz0 = np.where(k > 0, _wrap(self.az[km] - az1), -daz2)
+            daz3 = np.where(k < n - 2, _wrap(self.az[kp] - az1), 2 * daz2)
+            az = az1 + _catmullRom(daz0, 0, daz2, daz3, u)
+        return alt, np.mod(az, 360)
+
+    def _clamp(self, t):
+        """
+        Clamp a time to the ephemeris, warning once if it is outside.
+
+        :param t: Unix time. (float)
+        :return: float
+        """
+        if self.times[0] <= t <= self.times[-1]:
+            return t
+        if not self._warned:
+            Log.warn("Time " + str(t) + " outside ephemeris " + str(self.start()) + " - " + str(self.end())
+                     + ", clamping to its ends")
+            self._warned = True
+        return min(max(t, self.start()), self.end())
+
+
+def loadEphemeris(path, kind="linear"):
+    """
+    Load an ephemeris file. .npy files are memory-mapped, so loading is instant and only the pages a lookup touches
+    are read. A legacy pickle of [datetimes, az, alt] (as written by exp/generate_solar_positions_astropy.py) is
+    converted in memory.
+
+    :param path: Path of a .npy ephemeris or a legacy .pickle. (string)
+    :param kind: "linear" or "cubic" interpolation. Default = linear (string)
+    :return: Ephemeris
+    """
+    if path.endswith(".pickle"):
+        with open(path, "rb") as handle:
+            sunPos = pickle.load(handle)
+        records = np.zeros(len(sunPos[0]), dtype=EPHEMERIS_DTYPE)
+        # The pickled datetimes are naive UTC
+        records["time"] = np.array(list(sunPos[0]), dtype="datetime64[us]").astype(np.int64) / 1e6
+        records["az"] = sunPos[1].astype(np.float64)
+        records["alt"] = sunPos[2].astype(np.float64)
+    else:
+        records = np.load(path, mmap_mode="r")
+    Log.info("Loaded ephemeris " + path + " with " + str(len(records)) + " samples")
+    return Ephemeris(records, kind=kind)
+
+
+def saveEphemeris(path, times, az, alt):
+    """
+    Write an ephemeris file readable by loadEphemeris.
+
+    :param path: Output .npy path. (string)
+    :param times: Unix times, sorted. (np.ndarray)
+    :param az: Sun azimuth in degrees. (np.ndarray)
+    :param alt: Sun altitude in degrees. (np.ndarray)
+    :return: None
+    """
+    records = np.zeros(len(times), dtype=EPHEMERIS_DTYPE)
+    records["time"] = times
+    records["az"] = az
+    records["alt"] = alt
+    np.save(path, records)
+
+
+def _wrap(deg):
+    """
+    :return: Angle difference wrapped to -180..180 degrees.
+    """
+    return np.mod(np.asarray(deg) + 180, 360) - 180
+
+
+def _wrapScalar(deg):
+    """
+    :return: Angle difference wrapped to -180..180 degrees. (float)
+    """
+    return (deg + 180) % 360 - 180
+
+
+def _catmullRom(p0, p1, p2, p3, u):
+    """
+    Catmull-Rom spline between p1 (u = 0) and p2 (u = 1).
+    """
+    return p1 + 0.5 * u * ((p2 - p0) + u * ((2 * p0 - 5 * p1 + 4 * p2 - p3) + u * (3 * (p1 - p2) + p3 - p0)))
@@ -0,0 +1,147 @@
+"""
+File: ephemerisCache.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: On-disk cache of precomputed sun positions for any site and date for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+
+from ephemeris import Ephemeris, EPHEMERIS_DTYPE
+from solarPosition import sunPosition
+from utilities import Log, parseAngle
+
+# Bump when the way positions are computed changes, so old caches are not reused
+EPHEMERIS_VERSION = 1
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin", "ephemeris")
+CHUNK_SEC = 6 * 3600  # Span of one cache file, chunks start at 00, 06, 12 and 18 UTC
+DEFAULT_STEP = 10  # Seconds between samples
+
+
+def siteKey(lat, lon, step=DEFAULT_STEP, source="noaa"):
+    """
+    Name of the cache directory for a site, step and sun position source. Sites are rounded to about 1 m, so the same
+    site given in different formats shares a cache.
+
+    :param lat: Latitude. Ex. +44d13m29s or 44.2247 (string)
+    :param lon: Longitude. Ex. -76d29m52s or -76.4978 (string)
+    :param step: Seconds between samples. (float)
+    :param source: "noaa" or "astropy". (string)
+    :return: string
+    """
+    return "lat%+.5f_lon%+.5f_step%gs_%s_v%d" % (parseAngle(lat), parseAngle(lon), step, source, EPHEMERIS_VERSION)
+
+
+def loadCachedEphemeris(lat, lon, start, end, step=DEFAULT_STEP, cache_dir=CACHE_DIR, workers=None, kind="linear",
+                        source="noaa"):
+    """
+    Ephemeris covering start..end for a site, read from the cache. Only the chunks missing from the cache are
+    computed (see buildChunks) and saved for next time.
+
+    :param lat: Latitude. Ex. +44d13m29s (string)
+    :param lon: Longitude. Ex. -76d29m52s (string)
+    :param start: Unix time the ephemeris must start at or before. (float)
+    :param end: Unix time the ephemeris must end at or after. (float)
+    :param step: Seconds between samples. Default = 10 (float)
+    :param cache_dir: Root directory of the cache. (string)
+    :param workers: Number of worker processes. Default = None (one per CPU)
+    :param kind: "linear" or "cubic" interpolation. Default = linear (string)
+    :param source: Sun position source, "noaa" or "astropy". Default = noaa (string)
+    :return: Ephemeris
+    """
+    site_dir = os.path.join(cache_dir, siteKey(lat, lon, step, source))
+    os.makedirs(site_dir, exist_ok=True)
+    chunk_starts = np.arange(np.floor(start / CHUNK_SEC), np.floor(end / CHUNK_SEC) + 1) * CHUNK_SEC
+    # One more chunk after the end, so the last sample is after end
+    chunk_starts = np.append(chunk_starts, chunk_starts[-1] + CHUNK_SEC)
+    paths = [os.path.join(site_dir, _chunkName(chunk_start)) for chunk_start in chunk_starts]
+
+    missing = [(chunk_start, path) for chunk_start, path in zip(chunk_starts, paths) if not os.path.exists(path)]
+    if missing:
+        buildChunks(lat, lon, missing, step, workers, source)
+    else:
+        Log.info("Ephemeris cache " + site_dir + " covers the whole range")
+
+    records = np.concatenate([np.load(path, mmap_mode="r") for path in paths])
+    return Ephemeris(records, kind=kind)
+
+
+def buildChunks(lat, lon, chunks, step=DEFAULT_STEP, workers=None, source="noaa"):
+    """
+    Compute and save cache chunks, in parallel for astropy. The noaa source takes milliseconds per chunk, so its
+    chunks are computed in this process.
+
+    :param lat: Latitude. (string)
+    :param lon: Longitude. (string)
+    :param chunks: List of (chunk start unix time, output path).
+    :param step: Seconds between samples. (float)
+    :param workers: Number of worker processes. Default = None (one per CPU)
+    :param source: "noaa" or "astropy". Default = noaa (string)
+    :return: None
+    """
+    if source == "noaa":
+        workers = 1
+    elif workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(chunks)))
+    Log.info("Computing " + str(len(chunks)) + " ephemeris chunks with " + str(workers) + " worker processes")
+    t0 = time.time()
+    jobs = [(parseAngle(lat), parseAngle(lon), float(chunk_start), step, path, source) for chunk_start, path in chunks]
+    if workers == 1:
+        for job in jobs:
+            _buildChunk(*job)
+    else:
+        with mp.Pool(workers) as pool:
+            pool.starmap(_buildChunk, jobs)
+    Log.info("Computed ephemeris chunks in " + "%.1f" % (time.time() - t0) + " s")
+
+
+def _buildChunk(lat, lon, chunk_start, step, path, source):
+    """
+    Worker. Compute one chunk of sun positions in a single vectorized call and write it atomically, so an interrupted
+    build never leaves a partial chunk in the cache.
+
+    :param lat: Latitude in degrees. (float)
+    :param lon: Longitude in degrees. (float)
+    :param chunk_start: Unix time of the first sample. (float)
+    :param step: Seconds between samples. (float)
+    :param path: Output .npy path. (string)
+    :param source: "noaa" or "astropy". (string)
+    :return: None
+    """
+    times = chunk_start + np.arange(0, CHUNK_SEC, step)
+    records = np.zeros(len(times), dtype=EPHEMERIS_DTYPE)
+    records["time"] = times
+    records["alt"], records["az"] = sunPosition(times, lat, lon, source=source)
+    tmp_path = path + ".tmp%d" % os.getpid()
+    with open(tmp_path, "wb") as f:
+        np.save(f, records)
+    os.replace(tmp_path, path)
+
+
+def _chunkName(chunk_start):
+    """
+    :param chunk_start: Unix time of the chunk's first sample. (float)
+    :return: Chunk file name. Ex. 20240408T120000.npy (string)
+    """
+    return time.strftime("%Y%m%dT%H%M%S", time.gmtime(chunk_start)) + ".npy"
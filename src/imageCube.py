@@ -0,0 +1,114 @@
+"""
+File: imageCube.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Per-frequency image cubes built from raster scan spectra for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+from rfiMask import maskedSpectrum
+from utilities import parseFrequency
+
+
+class ImageCube:
+    """
+    One image frame per frequency channel, stored as a single contiguous (channel x alt x az) float32 array.
+
+    The channels are equal width slices of freq_min..freq_max. Each pixel's channel powers are the mean of the
+    spectrum bins already measured for that pixel, so no extra pointings are needed. channel(k) returns a view into
+    the cube rather than a copy, so memory only grows with the cube itself.
+    """
+
+    def __init__(self, freq_min, freq_max, n_channels, height, width):
+        """
+        :param freq_min: Minimum frequency of the first channel. Ex. 980M (string)
+        :param freq_max: Maximum frequency of the last channel. Ex. 1020M (string)
+        :param n_channels: Number of frequency channels. (int)
+        :param height: Image height in pixels (altitude). (int)
+        :param width: Image width in pixels (azimuth). (int)
+        """
+        self.edges = np.linspace(parseFrequency(freq_min), parseFrequency(freq_max), n_channels + 1)
+        self.data = np.full((n_channels, height, width), np.nan, dtype=np.float32)
+        self._freqs = None
+        self._bin_channel = None
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def channel(self, k):
+        """
+        :param k: Channel number. (int)
+        :return: alt x az image of channel k. A view into the cube, not a copy. (np.ndarray)
+        """
+        return self.data[k]
+
+    def channelFreqs(self):
+        """
+        :return: Centre frequency of every channel in Hz. (np.ndarray)
+        """
+        return (self.edges[:-1] + self.edges[1:]) / 2
+
+    def setPixel(self, i, j, integration):
+        """
+        Bin one integration's spectrum into the channels of a pixel. Bins outside the cube's range (reference bands),
+        bins masked as RFI and nan bins are ignored. A channel with no bins is nan.
+
+        :param i: Row (altitude) index. (int)
+        :param j: Column (azimuth) index. (int)
+        :param integration: Integration measured at the pixel.
+        :return: None
+        """
+        freqs = np.asarray(integration.freqs)
+        spectrum = maskedSpectrum(integration)
+        if len(spectrum) == 0 or len(spectrum) != len(freqs):
+            self.data[:, i, j] = np.nan
+            return
+
+        bin_channel = self._channelIndex(freqs)
+        valid = (bin_channel >= 0) & ~np.isnan(spectrum)
+        sums = np.bincount(bin_channel[valid], weights=spectrum[valid], minlength=len(self))
+        counts = np.bincount(bin_channel[valid], minlength=len(self))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.data[:, i, j] = sums / counts
+
+    def save(self, path):
+        """
+        Save the cube and its channel frequencies to a .npz file.
+
+        :param path: Output file path. (string)
+        :return: None
+        """
+        np.savez(path, cube=self.data, channel_freqs=self.channelFreqs(), edges=self.edges)
+
+    def _channelIndex(self, freqs):
+        """
+        Channel of every spectrum bin, -1 for bins outside the cube. Cached, since every pixel of a scan has the same
+        frequency axis.
+
+        :param freqs: Bin frequencies in Hz. (np.ndarray)
+        :return: np.ndarray of int
+        """
+        if self._freqs is None or len(self._freqs) != len(freqs) or not np.array_equal(self._freqs, freqs):
+            bin_channel = np.searchsorted(self.edges, freqs, side="right") - 1
+            bin_channel[(bin_channel < 0) | (bin_channel >= len(self))] = -1
+            self._freqs = freqs.copy()
+            self._bin_channel = bin_channel
+        return self._bin_channel
@@ -24,14 +24,24 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-import time
 import datetime
+import clock
 import os
 
-from dataCollection import measPower
-from tracking import calibrate, getSunPosition, getDifferenceDeg, moveStepper
-from utilities import Log
+from powerStream import PowerStream
+from iqPower import IQPowerStream
+from multiDongle import MultiPowerStream
+from spectrumStore import SpectrumStore
+from simulatedSdr import SimulatedPowerStream
+from sdrRecovery import DEFAULT_RECOVERY
+from rfiMask import DEFAULT_RFI_MASK
+from dataCollection import measSpectrum, measSpectrumAdaptive, bandPowers, bandName, parseBands, sweepRange
+from ephemerisCache import loadCachedEphemeris
+from onTheFly import gridSamples, scanFrame
+from adaptiveImaging import coarseToFineFrame, peakPosition, regridNearest
+from scanPlanner import SCAN_ORDERS, planScan
+from tracking import initGpio, resumeOrCalibrate, antennaPosition, getDifferenceDeg, moveStepper, shutdown
+from utilities import Log, parseInterval
 
 # TODO: Move to its own folder, image.py should have its own main.
 
@@ -58,6 +68,22 @@ parser.add_argument('--latitude', type=str, nargs='?', const='+44d13m29s', defau
                     help='Latitude of location. Default = +44d13m29s')
 parser.add_argument('--longitude', type=str, nargs='?', const='-76d29m52s', default='-76d29m52s',
                     help='Longitude of location. Default = -76d29m52s')
+parser.add_argument('--sun_source', type=str, choices={"noaa", "astropy"}, nargs='?', const="noaa", default="noaa",
+                    help='Sun position source. noaa is the built-in analytic algorithm, astropy the slower high '
+                         'precision transform. Default = noaa')
+parser.add_argument('--motor_backend', type=str, choices={"gpio", "pigpio"}, nargs='?', const="gpio", default="gpio",
+                    help='Stepper pulse backend. gpio plays each move from a thread with RPi.GPIO, pigpio hands it '
+                         'to the pigpio daemon as DMA timed waveforms (falls back to gpio if pigpiod is not running). '
+                         'Default = gpio')
+parser.add_argument('--force_calibration', type=int, nargs='?', const=1, default=0,
+                    help='Flag to home the mount even if the last session shut down cleanly and its saved position '
+                         'could be resumed. 0 = False, 1 = True. Default = 0')
+parser.add_argument('--simulate', type=int, nargs='?', const=1, default=0,
+                    help='Flag to run without hardware on a simulated mount and SDR, on a virtual clock that only moves '
+                         'when the session waits, so the session replays as fast as the code runs. 0 = False, '
+                         '1 = True. Default = 0')
+parser.add_argument('--sim_start', type=str, nargs='?', const=None, default=None,
+                    help='Local start time of a simulated session. Ex. 2024-04-08T14:00:00. Default = None (now)')
 parser.add_argument('--image_width', type=int, nargs='?', const=8, default=8,
                     help='Height of image in degrees (int). Default = 8')
 parser.add_argument('--image_height', type=int, nargs='?', const=8, default=8,
@@ -68,6 +94,50 @@ parser.add_argument('--img_start_az', type=float, nargs='?', const=400, default=
                     help='Starting azimuth of the sun, manual input for testing. Ex. 22.5. Default = 400')
 parser.add_argument('--verbose', type=str, choices={"LOW", "MED", "HIGH"}, nargs='?', const="HIGH",
                     default="HIGH", help="Select verbosity level of console output. Default = HIGH")
+parser.add_argument('--stream', type=int, nargs='?', const=1, default=0,
+                    help='Flag to keep one rtl_power process running for every measurement. 0 = False, 1 = True. Default = 0')
+parser.add_argument('--backend', type=str, choices={"rtl_power", "iq_psd", "iq_total"}, nargs='?', const="rtl_power",
+                    default="rtl_power", help='Power measurement backend. iq_psd and iq_total read raw IQ from rtl_sdr and '
+                                             'always stream. Default = rtl_power')
+parser.add_argument('--adaptive_error', type=float, nargs='?', const=0, default=0,
+                    help='Target standard error of each pixel power in dB. Enables adaptive integration, with '
+                         '--integration_interval as the sub-integration length and the power stream always on '
+                         '(--stream 1). Default = 0 (disabled)')
+parser.add_argument('--adaptive_min_time', type=float, nargs='?', const=0.5, default=0.5,
+                    help='Minimum adaptive integration time in seconds. Default = 0.5')
+parser.add_argument('--adaptive_max_time', type=float, nargs='?', const=5, default=5,
+                    help='Maximum adaptive integration time in seconds. Default = 5')
+parser.add_argument('--devices', type=str, nargs='?', const=None, default=None,
+                    help='Comma separated RTL-SDR device indexes or serials. Ex. 0,1. One device streams from that '
+                         'device, more than one runs a worker process per device. Default = None (first device)')
+parser.add_argument('--multi_mode', type=str, choices={"split", "average"}, nargs='?', const="split", default="split",
+                    help='With several devices, split the band between them or average co-pointed devices. Default = split')
+parser.add_argument('--ref_bands', type=str, nargs='?', const=None, default=None,
+                    help='Comma separated reference bands measured in the same sweep as the main band. '
+                         'Ex. 1100M:1120M,1400M:1420M. Default = None')
+parser.add_argument('--rfi_threshold', type=float, nargs='?', const=5, default=5,
+                    help='Leave spectrum bins further than this many robust standard deviations from the median out '
+                         'of the reported power as RFI. Stored spectra are not masked. 0 disables masking. Default = 5')
+parser.add_argument('--scan_order', type=str, choices={"auto", "serpentine", "spiral", "hilbert", "min_slew"},
+                    nargs='?', const="auto", default="auto",
+                    help='Pixel visit order. spiral starts on the sun and works outwards, min_slew is a nearest '
+                         'neighbour order improved by 2-opt, auto picks whichever has the least estimated slewing. '
+                         'Default = auto')
+parser.add_argument('--otf', type=int, nargs='?', const=1, default=0,
+                    help='Flag to scan the image on the fly: rows are slewed at --scan_speed while integrations stream '
+                         'back to back, and each is gridded by where the antenna was during it. Always streams. '
+                         '0 = False, 1 = True. Default = 0')
+parser.add_argument('--scan_speed', type=float, nargs='?', const=0, default=0,
+                    help='Azimuth speed in deg/s of on-the-fly rows. Default = 0 (one --integration_interval per '
+                         'pixel)')
+parser.add_argument('--coarse_to_fine', type=int, nargs='?', const=1, default=0,
+                    help='Flag to image coarse to fine: a pass of 2x2 pixel cells, then only the cells around the peak '
+                         'and its slopes are split, down to half pixel cells, within --pixel_budget measurements. '
+                         '0 = False, 1 = True. Default = 0')
+parser.add_argument('--pixel_budget', type=int, nargs='?', const=0, default=0,
+                    help='Most measurements of a coarse-to-fine image. Default = 0 (half the pixels of the image)')
+parser.add_argument('--plot_figure', type=int, nargs='?', const=1, default=1,
+                    help='Flag to select if the image should be plotted. 0 = False, 1 = True. Default = 1')
 args = parser.parse_args()
 
 # Setup Logging
@@ -77,25 +147,97 @@ log = Log(args, os.path.realpath(__file__))
 DISH_ARM_ANGLE_CALIBRATION = 47.5 # Updated March 28 after testing
 LAT = args.latitude
 LON = args.longitude
+SUN_SOURCE = args.sun_source
+MOTOR_BACKEND = args.motor_backend
+SIMULATE = args.simulate
+if SIMULATE == 1:
+    # The clock must be virtual before anything reads the time
+    clock.useVirtualClock(None if args.sim_start is None else
+                          datetime.datetime.fromisoformat(args.sim_start).timestamp())
+    MOTOR_BACKEND = "sim"
+FORCE_CALIBRATION = args.force_calibration
 ANT_OFFSET_EL = args.elevation_offset
 ANT_OFFSET_AZ = args.azimuth_offset + DISH_ARM_ANGLE_CALIBRATION
 FREQ_MIN = args.freq_min
 FREQ_MAX = args.freq_max
+BANDS = [(FREQ_MIN, FREQ_MAX)] + parseBands(args.ref_bands)
+SWEEP_MIN, SWEEP_MAX = sweepRange(BANDS)  # One sweep covers the main band and every reference band
+DEFAULT_RFI_MASK.threshold = args.rfi_threshold
 INTEGRATION_INTERVAL = args.integration_interval
+INTEGRATION_SEC = parseInterval(INTEGRATION_INTERVAL)
+ADAPTIVE_ERROR = args.adaptive_error
+ADAPTIVE_MIN_TIME = args.adaptive_min_time
+ADAPTIVE_MAX_TIME = args.adaptive_max_time
 GAIN = args.gain
+STREAM_FLAG = args.stream
+BACKEND = args.backend
+DEVICES = args.devices.split(",") if args.devices else []
+MULTI_MODE = args.multi_mode
 IMG_WIDTH = args.image_width
 IMG_HEIGHT = args.image_height
 IMG_START_ALT = args.img_start_alt
 IMG_START_AZ = args.img_start_az
+PLOT_FLAG = args.plot_figure
+SCAN_ORDER_CANDIDATES = SCAN_ORDERS if args.scan_order == "auto" else (args.scan_order,)
+OTF_FLAG = args.otf
+COARSE_TO_FINE = args.coarse_to_fine
+PIXEL_BUDGET = args.pixel_budget if args.pixel_budget > 0 else IMG_WIDTH*IMG_HEIGHT // 2
+SCAN_SPEED = args.scan_speed if args.scan_speed > 0 else 1 / INTEGRATION_SEC
+
+# Keep one SDR process running for the whole session if requested
+POWER_STREAM = None
+if SIMULATE == 1:
+    POWER_STREAM = SimulatedPowerStream(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, LAT, LON,
+                                        lambda t: antennaPosition(ANT_OFFSET_EL, ANT_OFFSET_AZ, t), source=SUN_SOURCE).start()
+elif len(DEVICES) > 1:
+    POWER_STREAM = MultiPowerStream(DEVICES, SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, mode=MULTI_MODE).start()
+elif BACKEND != "rtl_power":
+    POWER_STREAM = IQPowerStream(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, mode=BACKEND[3:],
+                                 bands=BANDS).start()
+elif STREAM_FLAG == 1 or len(DEVICES) == 1 or OTF_FLAG == 1 or ADAPTIVE_ERROR > 0:
+    POWER_STREAM = PowerStream(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN,
+                               device=DEVICES[0] if DEVICES else None).start()
+
+# Every integration's full spectrum is kept in the run directory for later re-analysis
+SPECTRUM_STORE = SpectrumStore(Log.logDirPath)
+Log.warn(DEFAULT_RFI_MASK.describe())
+
+
+def measurePixel(antAlt, antAz):
+    """
+    Measure the power of one pixel and keep its spectrum. Uses adaptive integration if --adaptive_error is set.
+    The main band and any reference bands come from the same sweep.
+
+    :param antAlt: Current altitude of the antenna in degrees. (float)
+    :param antAz: Current azimuth of the antenna in degrees. (float)
+    :return: Main band power (dB), integration time (s), standard error of the power (dB, nan for fixed integration)
+             and dict of band name to power (dB) for every band.
+    """
+    if ADAPTIVE_ERROR > 0:
+        integration, power_err, int_time = measSpectrumAdaptive(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN,
+                                                                ADAPTIVE_ERROR, ADAPTIVE_MIN_TIME, ADAPTIVE_MAX_TIME,
+                                                                stream=POWER_STREAM, band=BANDS[0])
+    else:
+        integration = measSpectrum(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, stream=POWER_STREAM, band=BANDS[0])
+        power_err = float("nan")
+        int_time = INTEGRATION_SEC
+    SPECTRUM_STORE.append(integration, antAz, antAlt)
+    band_powers = bandPowers(integration, BANDS)
+    return band_powers[bandName(BANDS[0])], int_time, power_err, band_powers
+
 
 LOWER_LIM_ALT = 0
 UPPER_LIM_ALT = 32
 LOWER_LIM_AZ = 0
 UPPER_LIM_AZ = 145
 
+# Sun positions come from the cache, computing the next hour if it is not cached yet
+EPHEMERIS = loadCachedEphemeris(LAT, LON, clock.unixTime(), clock.unixTime() + 3600, source=SUN_SOURCE)
+
 # Calibration and position determination
-antAlt, antAz = calibrate(ANT_OFFSET_EL, ANT_OFFSET_AZ)
-sunAlt, sunAz = getSunPosition(LAT, LON)
+initGpio(MOTOR_BACKEND)
+antAlt, antAz = resumeOrCalibrate(ANT_OFFSET_EL, ANT_OFFSET_AZ, force=FORCE_CALIBRATION == 1)
+sunAlt, sunAz = EPHEMERIS.position()
 
 # If image start altitude and azimuth is specified, use that instead (testing)
 # Otherwise calculate the starting Altitude and Azimuth based on the sun's position and image dimensions
@@ -128,39 +270,105 @@ if startingAz > (UPPER_LIM_AZ + ANT_OFFSET_AZ) or startingAz < (LOWER_LIM_AZ + A
     exit()
 Log.info("All image bounds are within limits.")
 
-# Initial calculation of the difference in degrees between antenna and starting position
-diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, startingAlt, startingAz, ANT_OFFSET_EL, ANT_OFFSET_AZ)
-degErrorAlt, degErrorAz = moveStepper(diffAlt, diffAz)
-
-# Initialize a 2D array to store the data collected
-data = np.zeros((IMG_HEIGHT, IMG_WIDTH))
-
-# Data collection loop, scanning over the specified range in Altitude and Azimuth
-for i in range(IMG_HEIGHT):
-    # Alternate scanning direction for each row to improve efficiency
-    if i % 2 == 0:
-        for j in range(IMG_WIDTH):
-            data[i][j] = measPower(FREQ_MIN, FREQ_MAX, INTEGRATION_INTERVAL, GAIN)
-            if j != IMG_WIDTH-1:
-                diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, antAlt, antAz + 1, ANT_OFFSET_EL, ANT_OFFSET_AZ)
-                moveStepper(0, diffAz)
-            time.sleep(0.2)
+if OTF_FLAG == 1:
+    # Scan on the fly, writing every integration with where the antenna was during it
+    fmt_start_time = str(clock.now().strftime("%Y%m%d%H%M%S"))
+    samples, antAlt, antAz = scanFrame(
+        lambda after: measSpectrum(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, stream=POWER_STREAM, after=after,
+                                   band=BANDS[0]),
+        INTEGRATION_SEC, antAlt, antAz, startingAlt, startingAz, IMG_HEIGHT, IMG_WIDTH, 1, 1, SCAN_SPEED,
+        ANT_OFFSET_EL, ANT_OFFSET_AZ,
+        on_sample=lambda sample: SPECTRUM_STORE.append(sample.integration, sample.az, sample.alt))
+    sample_alt = np.array([sample.alt for sample in samples])
+    sample_az = np.array([sample.az for sample in samples])
+    sample_power = np.array([sample.integration.power for sample in samples])
+    np.savetxt(os.path.join(Log.logDirPath, "ImageSamples" + fmt_start_time + ".csv"),
+               np.column_stack([[sample.time for sample in samples], sample_az, sample_alt, sample_power]),
+               delimiter=",", header="time,az,alt,power", comments="")
+
+    def grid(values):
+        return gridSamples(sample_alt, sample_az, values, startingAlt, startingAz, 1, 1, IMG_HEIGHT, IMG_WIDTH)
+
+    data, power_err_data, counts = grid(sample_power)
+    int_time_data = counts * INTEGRATION_SEC
+    band_data = {bandName(band): grid([bandPowers(sample.integration, BANDS)[bandName(band)] for sample in samples])[0]
+                 for band in BANDS[1:]}
+elif COARSE_TO_FINE == 1:
+    # Measure finely only around the peak, writing every measurement with where the antenna was
+    fmt_start_time = str(clock.now().strftime("%Y%m%d%H%M%S"))
+    samples, cell_size, antAlt, antAz = coarseToFineFrame(
+        lambda: measSpectrum(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, stream=POWER_STREAM, band=BANDS[0]),
+        antAlt, antAz, startingAlt, startingAz, IMG_HEIGHT, IMG_WIDTH, 1, 1, ANT_OFFSET_EL, ANT_OFFSET_AZ, 0.2,
+        PIXEL_BUDGET,
+        on_sample=lambda sample: SPECTRUM_STORE.append(sample.integration, sample.az, sample.alt))
+    sample_alt = np.array([sample.alt for sample in samples])
+    sample_az = np.array([sample.az for sample in samples])
+    sample_power = np.array([sample.integration.power for sample in samples])
+    np.savetxt(os.path.join(Log.logDirPath, "ImageSamples" + fmt_start_time + ".csv"),
+               np.column_stack([[sample.time for sample in samples], sample_az, sample_alt, sample_power, cell_size]),
+               delimiter=",", header="time,az,alt,power,cell_size", comments="")
+    peakAlt, peakAz = peakPosition(sample_alt, sample_az, sample_power)
+    if np.isnan(peakAlt):
+        Log.warn("No valid measurements in the frame, no peak found")
     else:
-        for j in range(IMG_WIDTH):
-            data[i][IMG_WIDTH-j-1] = measPower(FREQ_MIN, FREQ_MAX, INTEGRATION_INTERVAL, GAIN)
-            if j != IMG_WIDTH-1:
-                diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, antAlt, antAz - 1, ANT_OFFSET_EL, ANT_OFFSET_AZ)
-                moveStepper(0, diffAz)
-            time.sleep(0.2)
-    if i != IMG_HEIGHT-1:
-        diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, antAlt + 1, antAz, ANT_OFFSET_EL, ANT_OFFSET_AZ)
-        moveStepper(diffAlt, 0)
+        Log.info(f"Peak at alt={peakAlt:.3f}, az={peakAz:.3f}")
+
+    def regrid(values):
+        return regridNearest(sample_alt, sample_az, values, startingAlt, startingAz, 1, 1, IMG_HEIGHT, IMG_WIDTH)
+
+    data = regrid(sample_power)
+    int_time_data = np.full((IMG_HEIGHT, IMG_WIDTH), INTEGRATION_SEC)
+    power_err_data = np.full((IMG_HEIGHT, IMG_WIDTH), np.nan)
+    band_data = {bandName(band): regrid([bandPowers(sample.integration, BANDS)[bandName(band)] for sample in samples])
+                 for band in BANDS[1:]}
+else:
+    # Pick the pixel order with the least slewing, the spiral starting where the sun will be half way through
+    sunAlt, sunAz = EPHEMERIS.position(clock.unixTime() + IMG_HEIGHT * IMG_WIDTH * (INTEGRATION_SEC + 0.2) / 2)
+    plan = planScan(IMG_HEIGHT, IMG_WIDTH, startingAlt, startingAz, 1, 1, antAlt, antAz, sunAlt, sunAz,
+                    orders=SCAN_ORDER_CANDIDATES)
+
+    # Initial calculation of the difference in degrees between antenna and starting position
+    diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, startingAlt + plan.pixels[0][0],
+                                                      startingAz + plan.pixels[0][1], ANT_OFFSET_EL, ANT_OFFSET_AZ)
+    degErrorAlt, degErrorAz = moveStepper(diffAlt, diffAz)
+
+    # Initialize a 2D array to store the data collected
+    data = np.zeros((IMG_HEIGHT, IMG_WIDTH))
+    int_time_data = np.zeros((IMG_HEIGHT, IMG_WIDTH))
+    power_err_data = np.zeros((IMG_HEIGHT, IMG_WIDTH))
+    band_data = {bandName(band): np.zeros((IMG_HEIGHT, IMG_WIDTH)) for band in BANDS[1:]}
+
+    # Data collection loop, visiting the pixels in the planned order
+    for k, (i, col) in enumerate(plan.pixels):
+        data[i][col], int_time_data[i][col], power_err_data[i][col], band_powers = measurePixel(antAlt, antAz)
+        for name in band_data:
+            band_data[name][i][col] = band_powers[name]
+        if k != len(plan.pixels)-1:
+            diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, startingAlt + plan.pixels[k+1][0],
+                                                              startingAz + plan.pixels[k+1][1], ANT_OFFSET_EL,
+                                                              ANT_OFFSET_AZ)
+            moveStepper(diffAlt, diffAz)
+            clock.sleep(0.2)
+
+if POWER_STREAM is not None:
+    POWER_STREAM.stop()
+SPECTRUM_STORE.close()
+shutdown()
+Log.info(DEFAULT_RECOVERY.summary())
+Log.info(DEFAULT_RFI_MASK.summary())
 
 # Save the collected data to a CSV file with a timestamp
-np.savetxt(os.path.join(Log.logDirPath, "ImageData" + str(datetime.datetime.now().strftime("%Y%m%d%H%M%S")) + ".csv"),
-           data, delimiter=",")
+fmt_end_time = str(clock.now().strftime("%Y%m%d%H%M%S"))
+np.savetxt(os.path.join(Log.logDirPath, "ImageData" + fmt_end_time + ".csv"), data, delimiter=",")
+np.savetxt(os.path.join(Log.logDirPath, "ImageIntTime" + fmt_end_time + ".csv"), int_time_data, delimiter=",")
+np.savetxt(os.path.join(Log.logDirPath, "ImagePowerErr" + fmt_end_time + ".csv"), power_err_data, delimiter=",")
+for name in band_data:
+    np.savetxt(os.path.join(Log.logDirPath, "ImageData" + name + "_" + fmt_end_time + ".csv"), band_data[name],
+               delimiter=",")
 
-# Display the collected data as an image
-plt.imshow(data, origin='lower', interpolation=None)
-plt.savefig(os.path.join(Log.logDirPath, "figure.png"))
-plt.show()
+if PLOT_FLAG == 1:
+    import matplotlib.pyplot as plt
+    # Display the collected data as an image
+    plt.imshow(data, origin='lower', interpolation=None)
+    plt.savefig(os.path.join(Log.logDirPath, "figure.png"))
+    plt.show()
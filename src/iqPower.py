@@ -0,0 +1,294 @@
+"""
+File: iqPower.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Direct IQ-capture radiometer backend for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import subprocess as sp
+import threading
+import time
+import numpy as np
+
+from powerStream import Integration, QueuedStream
+from utilities import Log, parseFrequency, parseInterval
+
+MAX_SAMPLE_RATE = 2.4e6  # Highest RTL-SDR sample rate that does not drop samples on the Pi
+READ_SIZE = 1 << 18  # Bytes read from the IQ source at a time (128k complex samples)
+RTL_SDR_RATES = ((225001, 300000), (900001, 3200000))  # Sample rate ranges in Hz rtl_sdr accepts
+
+
+def validSampleRate(rate):
+    """
+    Lowest sample rate rtl_sdr accepts that is at least the requested one, so the requested band is still covered.
+
+    :param rate: Requested sample rate in Hz. (float)
+    :return: Sample rate in Hz, the highest rtl_sdr accepts if the request is above it. (float)
+    """
+    for low, high in RTL_SDR_RATES:
+        if rate <= high:
+            return float(max(rate, low))
+    return float(RTL_SDR_RATES[-1][1])
+
+
+def iqFromBytes(buf):
+    """
+    Convert raw rtl_sdr output (interleaved unsigned 8-bit I and Q) to complex samples.
+
+    :param buf: Raw IQ bytes. Must have an even length. (bytes)
+    :return: Complex samples scaled to [-1, 1]. (np.ndarray, complex64)
+    """
+    raw = np.frombuffer(buf, dtype=np.uint8).astype(np.float32)
+    raw -= 127.5
+    raw *= 1 / 127.5
+    return raw.view(np.complex64)
+
+
+def segmentPowerSum(iq, n_bins, overlap=0.5):
+    """
+    Sum of windowed periodograms over all Welch segments in a block of samples.
+
+    :param iq: Complex samples. (np.ndarray)
+    :param n_bins: FFT length, i.e. number of frequency bins. (int)
+    :param overlap: Fractional overlap between segments. Default = 0.5 (float)
+    :return: Sum of |FFT|^2 per bin (np.ndarray, DC centred) and number of segments summed. (int)
+    """
+    step = max(1, int(n_bins * (1 - overlap)))
+    if len(iq) < n_bins:
+        return np.zeros(n_bins), 0
+    segments = np.lib.stride_tricks.sliding_window_view(iq, n_bins)[::step]
+    spectra = np.fft.fft(segments * _hannWindow(n_bins), axis=1)
+    power = (spectra.real ** 2 + spectra.imag ** 2).sum(axis=0)
+    return np.fft.fftshift(power), len(segments)
+
+
+_windows = {}
+
+
+def _hannWindow(n_bins):
+    """
+    Cached Hann window so it is only computed once per FFT length.
+
+    :param n_bins: Window length. (int)
+    :return: Hann window. (np.ndarray, float32)
+    """
+    if n_bins not in _windows:
+        _windows[n_bins] = np.hanning(n_bins).astype(np.float32)
+    return _windows[n_bins]
+
+
+class IQPowerStream(QueuedStream):
+    """
+    Radiometer that reads raw IQ samples and computes band power with NumPy instead of running rtl_power.
+
+    Samples come from rtl_sdr stdout, or from a file or FIFO for testing. Two modes are available:
+    "psd" computes a Welch PSD over n_bins bins and returns the band mean in dB like rtl_power does, and
+    "total" returns 10*log10(mean |IQ|^2) and skips the FFT completely. The stream has the same interface
+    as PowerStream, so either can be passed to measPower.
+
+    The captured bandwidth is limited by the sample rate, so the central min(freq_max - freq_min, 2.4 MHz)
+    of the requested band is measured. Narrower bands than rtl_sdr can sample are captured at the next rate it
+    accepts. psd mode then keeps only the bins inside the band, total mode measures the whole captured bandwidth.
+    """
+
+    def __init__(self, freq_min, freq_max, integration_interval, gain, mode="psd", n_bins=256, overlap=0.5,
+                 source=None, max_queued=64, bands=None):
+        """
+        Configure the stream. Nothing is read until start() is called.
+
+        :param freq_min: Minimum frequency for power measurement. Ex. 980M (string)
+        :param freq_max: Maximum frequency for power measurement. Ex. 1020M (string)
+        :param integration_interval: Integration interval. Ex. 1s (string)
+        :param gain: Input gain for RTL-SDR. (string)
+        :param mode: "psd" or "total". Default = psd (string)
+        :param n_bins: Number of PSD bins in psd mode. Default = 256 (int)
+        :param overlap: Welch segment overlap in psd mode. Default = 0.5 (float)
+        :param source: Path to a file or FIFO of raw IQ bytes. Default = None (run rtl_sdr)
+        :param max_queued: Number of integrations kept before the oldest is discarded. (int)
+        :param bands: List of (freq_min, freq_max) strings measured from the stream, the main band first. With
+                      reference bands, every band must be inside the captured bandwidth, and total mode cannot measure
+                      them at all. Default = None
+        :raises ValueError: if a band cannot be measured from the captured samples.
+        """
+        if mode not in ("psd", "total"):
+            raise ValueError("Unknown IQ power mode: " + str(mode))
+        QueuedStream.__init__(self, parseInterval(integration_interval), max_queued)
+        self.mode = mode
+        self.n_bins = n_bins
+        self.overlap = overlap
+        self.gain = gain
+        self.source = source
+
+        freq_min_hz = parseFrequency(freq_min)
+        freq_max_hz = parseFrequency(freq_max)
+        self.center_freq = (freq_min_hz + freq_max_hz) / 2
+        self.band_width = min(freq_max_hz - freq_min_hz, MAX_SAMPLE_RATE)
+        self.sample_rate = validSampleRate(self.band_width)
+        if self.sample_rate != self.band_width:
+            Log.warn(f"rtl_sdr cannot sample at {self.band_width:.0f} Hz, using {self.sample_rate:.0f} Hz"
+                     + (", keeping the bins inside the band" if mode == "psd" else
+                        ", total power includes the extra bandwidth"))
+        self.samples_per_integration = int(self.sample_rate * self.interval_sec)
+        if bands is not None and len(bands) > 1:
+            self._checkBands(bands)
+
+        self._proc = None
+        self._file = None
+        self._thread = None
+
+    def _checkBands(self, bands):
+        """
+        :param bands: List of (freq_min, freq_max) strings.
+        :return: None
+        :raises ValueError: if a band is not inside the captured bandwidth, or the stream is in total mode.
+        """
+        if self.mode == "total":
+            raise ValueError("The IQ total power backend measures one power per integration, use iq_psd to measure "
+                             "reference bands")
+        low = self.center_freq - self.band_width / 2
+        high = self.center_freq + self.band_width / 2
+        for band in bands:
+            if parseFrequency(band[0]) < low or parseFrequency(band[1]) > high:
+                raise ValueError(f"Band {band[0]}:{band[1]} is outside the {low:.0f}-{high:.0f} Hz captured by the IQ "
+                                 f"backend, which can sample at most {MAX_SAMPLE_RATE:.0f} Hz around the centre "
+                                 "of the sweep")
+
+    def command(self):
+        """
+        Build the rtl_sdr command line. Samples are written to stdout.
+
+        :return: Command as a list of arguments.
+        """
+        return ["rtl_sdr", "-f", str(int(self.center_freq)), "-s", str(int(self.sample_rate)), "-g", str(self.gain),
+                "-"]
+
+    def start(self):
+        """
+        Start rtl_sdr (or open the IQ file) and the reader thread.
+
+        :return: self, so a stream can be created and started in one line.
+        """
+        if self.source is None:
+            command = self.command()
+            Log.info("Starting IQ power stream (" + self.mode + "): " + " ".join(command))
+            self._proc = sp.Popen(command, stdout=sp.PIPE, stderr=sp.DEVNULL)
+            self._file = self._proc.stdout
+        else:
+            Log.info("Starting IQ power stream (" + self.mode + ") from " + str(self.source))
+            self._file = open(self.source, "rb")
+        self._thread = threading.Thread(target=self._readLoop, args=(self._file,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Terminate rtl_sdr or close the IQ file. The reader thread exits at end of input.
+
+        :return: None
+        """
+        if self._proc is not None and self._proc.poll() is None:
+            Log.info("Stopping IQ power stream")
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=2)
+            except sp.TimeoutExpired:
+                self._proc.kill()
+        elif self._file is not None:
+            self._file.close()
+        self._proc = None
+        self._file = None
+
+    def restart(self):
+        """
+        Stop and start the stream, discarding any queued integrations.
+
+        :return: None
+        """
+        Log.warn("Restarting IQ power stream")
+        self.stop()
+        self._clearQueue()
+        self.start()
+
+    def isAlive(self):
+        """
+        :return: True if samples are still being read. (bool)
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def _readLoop(self, file):
+        """
+        Reader thread. Accumulate power over fixed size blocks and queue one Integration per integration interval.
+        Only running sums are kept, so memory use does not depend on the integration time.
+
+        :param file: Binary file object giving raw IQ bytes.
+        :return: None
+        """
+        power_sum = 0
+        count = 0
+        samples = 0
+        start_time = time.time()
+        while True:
+            try:
+                buf = file.read(READ_SIZE)
+            except (OSError, ValueError):
+                return
+            if not buf:
+                return
+            iq = iqFromBytes(buf[:len(buf) & ~1])
+            if self.mode == "psd":
+                block_sum, block_count = segmentPowerSum(iq, self.n_bins, self.overlap)
+                power_sum = power_sum + block_sum
+                count += block_count
+            else:
+                power_sum += float(np.sum(iq.real ** 2 + iq.imag ** 2))
+                count += len(iq)
+            samples += len(iq)
+
+            if samples >= self.samples_per_integration and count > 0:
+                end_time = time.time()
+                self._put(self._integration(power_sum, count, start_time, end_time))
+                power_sum = 0
+                count = 0
+                samples = 0
+                start_time = end_time
+
+    def _integration(self, power_sum, count, start_time, end_time):
+        """
+        Convert accumulated sums to an Integration.
+
+        :param power_sum: Per-bin periodogram sum (psd mode) or sum of |IQ|^2 (total mode).
+        :param count: Number of segments (psd mode) or samples (total mode) summed.
+        :param start_time: Unix time the integration started.
+        :param end_time: Unix time the integration finished.
+        :return: Integration. In psd mode the power is the mean over bins of the bin power in dB, as rtl_power reports.
+                 In total mode the spectrum is a single bin at the centre frequency.
+        """
+        if self.mode == "psd":
+            psd = power_sum / (count * np.sum(_hannWindow(self.n_bins) ** 2))
+            spectrum = 10 * np.log10(psd + 1e-20)
+            freqs = self.center_freq + np.fft.fftshift(np.fft.fftfreq(self.n_bins, 1 / self.sample_rate))
+            # Drop the DC spike from the RTL-SDR tuner, and any bins outside the band when sampling wider than it
+            keep = np.abs(freqs - self.center_freq) <= self.band_width / 2
+            keep[self.n_bins // 2] = False
+            spectrum = spectrum[keep]
+            freqs = freqs[keep]
+            return Integration(start_time, end_time, float(np.mean(spectrum)), freqs, spectrum)
+        power = float(10 * np.log10(power_sum / count + 1e-20))
+        return Integration(start_time, end_time, power, np.array([self.center_freq]), np.array([power]))
@@ -25,12 +25,21 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import argparse
 import os
 import datetime
-import matplotlib.pyplot as plt
+import clock
 
 # Method imports
-from dataCollection import measPower, writeData, plotPower
-from tracking import calibrate, getSunPosition, getDifferenceDeg, moveStepper, positionErrorCorrection
-from utilities import Log
+from powerStream import PowerStream
+from iqPower import IQPowerStream
+from multiDongle import MultiPowerStream
+from spectrumStore import SpectrumStore
+from simulatedSdr import SimulatedPowerStream
+from sdrRecovery import DEFAULT_RECOVERY
+from rfiMask import DEFAULT_RFI_MASK
+from dataCollection import measBandPowers, writeData, plotPower, parseBands, sweepRange, bandName
+from ephemerisCache import loadCachedEphemeris
+from observationPlan import compileTrackingPlan, executePlan, loadPlan, planSummary, savePlan, stepsToDeg, validatePlan
+from tracking import initGpio, calibrate, resumeOrCalibrate, antennaPosition, ledgerPosition, shutdown
+from utilities import Log, parseInterval
 
 parser = argparse.ArgumentParser(
     description='Solar Viewer is designed to measure microwave radiation from the sun. This'
@@ -56,8 +65,48 @@ parser.add_argument('--latitude', type=str, nargs='?', const='+44d13m29s', defau
                     help='Latitude of location. Default = +44d13m29s')
 parser.add_argument('--longitude', type=str, nargs='?', const='-76d29m52s', default='-76d29m52s',
                     help='Longitude of location. Default = -76d29m52s')
+parser.add_argument('--sun_source', type=str, choices={"noaa", "astropy"}, nargs='?', const="noaa", default="noaa",
+                    help='Sun position source. noaa is the built-in analytic algorithm, astropy the slower high '
+                         'precision transform. Default = noaa')
+parser.add_argument('--motor_backend', type=str, choices={"gpio", "pigpio"}, nargs='?', const="gpio", default="gpio",
+                    help='Stepper pulse backend. gpio plays each move from a thread with RPi.GPIO, pigpio hands it '
+                         'to the pigpio daemon as DMA timed waveforms (falls back to gpio if pigpiod is not running). '
+                         'Default = gpio')
+parser.add_argument('--force_calibration', type=int, nargs='?', const=1, default=0,
+                    help='Flag to home the mount even if the last session shut down cleanly and its saved position '
+                         'could be resumed. 0 = False, 1 = True. Default = 0')
+parser.add_argument('--simulate', type=int, nargs='?', const=1, default=0,
+                    help='Flag to run without hardware on a simulated mount and SDR, on a virtual clock that only moves '
+                         'when the session waits, so the session replays as fast as the code runs. 0 = False, '
+                         '1 = True. Default = 0')
+parser.add_argument('--sim_start', type=str, nargs='?', const=None, default=None,
+                    help='Local start time of a simulated session. Ex. 2024-04-08T14:00:00. Default = None (now)')
 parser.add_argument('--verbose', type=str, choices={"LOW", "MED", "HIGH"}, nargs='?', const="HIGH",
                     default="HIGH", help="Select verbosity level of console output. Default = HIGH")
+parser.add_argument('--stream', type=int, nargs='?', const=1, default=0,
+                    help='Flag to keep one rtl_power process running for every measurement. 0 = False, 1 = True. Default = 0')
+parser.add_argument('--backend', type=str, choices={"rtl_power", "iq_psd", "iq_total"}, nargs='?', const="rtl_power",
+                    default="rtl_power", help='Power measurement backend. iq_psd and iq_total read raw IQ from rtl_sdr and '
+                                             'always stream. Default = rtl_power')
+parser.add_argument('--devices', type=str, nargs='?', const=None, default=None,
+                    help='Comma separated RTL-SDR device indexes or serials. Ex. 0,1. One device streams from that '
+                         'device, more than one runs a worker process per device. Default = None (first device)')
+parser.add_argument('--multi_mode', type=str, choices={"split", "average"}, nargs='?', const="split", default="split",
+                    help='With several devices, split the band between them or average co-pointed devices. Default = split')
+parser.add_argument('--ref_bands', type=str, nargs='?', const=None, default=None,
+                    help='Comma separated reference bands measured in the same sweep as the main band. '
+                         'Ex. 1100M:1120M,1400M:1420M. Default = None')
+parser.add_argument('--rfi_threshold', type=float, nargs='?', const=5, default=5,
+                    help='Leave spectrum bins further than this many robust standard deviations from the median out '
+                         'of the reported power as RFI. Stored spectra are not masked. 0 disables masking. Default = 5')
+parser.add_argument('--compile_plan', type=str, nargs='?', const=None, default=None,
+                    help='Compile the session into a plan file, check it and exit without touching the mount. '
+                         'Ex. ./plan.csv. Default = None')
+parser.add_argument('--plan', type=str, nargs='?', const=None, default=None,
+                    help='Run a plan compiled with --compile_plan instead of compiling the session at startup. '
+                         'Ex. ./plan.csv. Default = None')
+parser.add_argument('--plot_figure', type=int, nargs='?', const=1, default=1,
+                    help='Flag to select if the power plot should be shown. 0 = False, 1 = True. Default = 1')
 args = parser.parse_args()
 
 # Setup Logging
@@ -67,51 +116,163 @@ log = Log(args, os.path.realpath(__file__))
 DISH_ARM_ANGLE_CALIBRATION = 62.5
 LAT = args.latitude
 LON = args.longitude
+SUN_SOURCE = args.sun_source
+MOTOR_BACKEND = args.motor_backend
+SIMULATE = args.simulate
+if SIMULATE == 1:
+    # The clock must be virtual before anything reads the time
+    clock.useVirtualClock(None if args.sim_start is None else
+                          datetime.datetime.fromisoformat(args.sim_start).timestamp())
+    MOTOR_BACKEND = "sim"
+FORCE_CALIBRATION = args.force_calibration
 ANT_OFFSET_EL = args.elevation_offset
 ANT_OFFSET_AZ = args.azimuth_offset + DISH_ARM_ANGLE_CALIBRATION
 FREQ_MIN = args.freq_min
 FREQ_MAX = args.freq_max
+BANDS = [(FREQ_MIN, FREQ_MAX)] + parseBands(args.ref_bands)
+SWEEP_MIN, SWEEP_MAX = sweepRange(BANDS)  # One sweep covers the main band and every reference band
+DEFAULT_RFI_MASK.threshold = args.rfi_threshold
 INTEGRATION_INTERVAL = args.integration_interval
+INTEGRATION_SEC = parseInterval(INTEGRATION_INTERVAL)
 DUR = args.duration
 GAIN = args.gain
+STREAM_FLAG = args.stream
+BACKEND = args.backend
+DEVICES = args.devices.split(",") if args.devices else []
+MULTI_MODE = args.multi_mode
+PLOT_FLAG = args.plot_figure
+COMPILE_PLAN_PATH = args.compile_plan
+PLAN_PATH = args.plan
+
+# Keep one SDR process running for the whole session if requested
+POWER_STREAM = None
+if SIMULATE == 1:
+    POWER_STREAM = SimulatedPowerStream(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, LAT, LON,
+                                        lambda t: antennaPosition(ANT_OFFSET_EL, ANT_OFFSET_AZ, t), source=SUN_SOURCE).start()
+elif len(DEVICES) > 1:
+    POWER_STREAM = MultiPowerStream(DEVICES, SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, mode=MULTI_MODE).start()
+elif BACKEND != "rtl_power":
+    POWER_STREAM = IQPowerStream(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN, mode=BACKEND[3:],
+                                 bands=BANDS).start()
+elif STREAM_FLAG == 1 or len(DEVICES) == 1:
+    POWER_STREAM = PowerStream(SWEEP_MIN, SWEEP_MAX, INTEGRATION_INTERVAL, GAIN,
+                               device=DEVICES[0] if DEVICES else None).start()
+
+# Every integration's full spectrum is kept in the run directory for later re-analysis
+SPECTRUM_STORE = SpectrumStore(Log.logDirPath)
+Log.warn(DEFAULT_RFI_MASK.describe())
 
 
 duration_hrs = int(DUR.split(":")[0])
 duration_mins = int(DUR.split(":")[1])
-current_time = datetime.datetime.now(tz=None)
+current_time = clock.now()
 duration_hrs_min = datetime.timedelta(hours=duration_hrs, minutes=duration_mins)
 end_time = current_time + duration_hrs_min
 
+# Sun positions for the session come from the cache, only the parts not cached yet are computed
+EPHEMERIS = loadCachedEphemeris(LAT, LON, clock.unixTime(), end_time.timestamp(), source=SUN_SOURCE)
+
 meas_interval = int(float(args.meas_interval) * 60)
 
+
+def checkPlan(plan, mount_started=False):
+    """
+    Log a plan's summary and any problems with it, save it if --compile_plan was given, and exit if it cannot be run
+    or was only to be compiled.
+
+    :param plan: ObservationPlan
+    :param mount_started: True once initGpio has run, so the mount is shut down cleanly before exiting. (bool)
+    :return: None
+    """
+    Log.info(planSummary(plan))
+    problems = validatePlan(plan, allow_clamp=True, offsetAlt=ANT_OFFSET_EL, offsetAz=ANT_OFFSET_AZ,
+                            now=clock.unixTime())
+    for problem in problems:
+        Log.error(problem)
+    if COMPILE_PLAN_PATH is not None:
+        savePlan(plan, COMPILE_PLAN_PATH)
+        Log.info("Plan saved to: " + COMPILE_PLAN_PATH)
+    if len(problems) > 0 or COMPILE_PLAN_PATH is not None:
+        if len(problems) > 0:
+            Log.error("Plan cannot be run. Exiting")
+        if POWER_STREAM is not None:
+            POWER_STREAM.stop()
+        if mount_started:
+            shutdown()
+        exit()
+
+
+def compilePlan(start_steps):
+    """
+    Compile the session from now on: one pointing at the sun every meas_interval. Positions the mount cannot reach
+    are pointed at the nearest limit, as moveStepper would.
+
+    :param start_steps: Ledger position the mount starts from. (tuple)
+    :return: ObservationPlan
+    """
+    return compileTrackingPlan(EPHEMERIS, clock.unixTime(), end_time.timestamp(), meas_interval, INTEGRATION_SEC, 0,
+                               ANT_OFFSET_EL, ANT_OFFSET_AZ, start_steps=start_steps,
+                               info={"latitude": LAT, "longitude": LON})
+
+
+# A saved plan is checked before the mount moves. --compile_plan compiles from home without touching the mount.
+PLAN = None
+if PLAN_PATH is not None:
+    PLAN = loadPlan(PLAN_PATH)
+    Log.info("Loaded " + PLAN_PATH)
+    checkPlan(PLAN)
+elif COMPILE_PLAN_PATH is not None:
+    checkPlan(compilePlan((0, 0)))
+
 timeData = []
 powerData = []
 
-# Create figure for plotting
-fig = plt.figure()
-plt.ion()
+if PLOT_FLAG == 1:
+    import matplotlib.pyplot as plt
+    # Create figure for plotting
+    fig = plt.figure()
+    plt.ion()
 
 # Calibrate mechanical setup
-antAlt, antAz = calibrate(ANT_OFFSET_EL, ANT_OFFSET_AZ)
-
-while current_time < end_time:
-    sunAlt, sunAz = getSunPosition(LAT, LON)
-    diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, sunAlt, sunAz,  ANT_OFFSET_EL, ANT_OFFSET_AZ)
-    degErrorAlt, degErrorAz = moveStepper(diffAlt, diffAz)
-    antAlt, antAz = positionErrorCorrection(antAlt, antAz, degErrorAlt, degErrorAz)
-    power = measPower(FREQ_MIN, FREQ_MAX, INTEGRATION_INTERVAL, GAIN)
-    current_time = datetime.datetime.now(tz=None)
-    writeData(current_time, power, sunAlt, sunAz)
+initGpio(MOTOR_BACKEND)
+antAlt, antAz = resumeOrCalibrate(ANT_OFFSET_EL, ANT_OFFSET_AZ, force=FORCE_CALIBRATION == 1)
+if PLAN is None:
+    # Compiled once the mount is ready, so the first pointing starts from where the mount is and is not already late
+    PLAN = compilePlan(ledgerPosition())
+    checkPlan(PLAN, mount_started=True)
+
+def measure(step):
+    antAlt, antAz = stepsToDeg((step["alt_steps"], step["az_steps"]), ANT_OFFSET_EL, ANT_OFFSET_AZ)
+    integration, band_powers = measBandPowers(BANDS, INTEGRATION_INTERVAL, GAIN, stream=POWER_STREAM)
+    SPECTRUM_STORE.append(integration, antAz, antAlt)
+    return band_powers
+
+
+def record(step, band_powers):
+    power = band_powers[bandName(BANDS[0])]
+    current_time = clock.now()
+    writeData(current_time, power, step["sun_alt"], step["sun_az"], band_powers if len(BANDS) > 1 else None)
     timeData.append(current_time)
     powerData.append(power)
-    plotPower(timeData, powerData)
-    plt.pause(meas_interval)
+    if PLOT_FLAG == 1:
+        plotPower(timeData, powerData)
+
+
+executePlan(PLAN, measure, record, sleep=clock.pause if PLOT_FLAG == 1 else clock.sleep)
+
+if PLOT_FLAG == 1:
+    # TODO: Add save plot
+    plt.ioff()
+    plt.show()
 
-# TODO: Add save plot
-plt.ioff()
-plt.show()
+    # Save plot
+    plotPower(timeData, powerData, savePlot=True)
 
-# Save plot
-plotPower(timeData, powerData, savePlot=True)
+if POWER_STREAM is not None:
+    POWER_STREAM.stop()
+SPECTRUM_STORE.close()
+Log.info(DEFAULT_RECOVERY.summary())
+Log.info(DEFAULT_RFI_MASK.summary())
 
 calibrate(ANT_OFFSET_EL, ANT_OFFSET_AZ)  # Return Al and Az rotators to zero position.
+shutdown()
@@ -0,0 +1,162 @@
+"""
+File: motionProfile.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Acceleration limited stepper motion planning for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from collections import namedtuple
+import numpy as np
+
+# Speed limits of one axis in steps/s and steps/s^2. start_speed is the speed the motor can start and stop at
+# without ramping (the old fixed 50 ms step period is 20 steps/s).
+AxisLimits = namedtuple("AxisLimits", ["max_speed", "accel", "start_speed"])
+
+# A planned two-axis move. tick_times are the pulse times in seconds from the start of the move, pulse_alt and
+# pulse_az are 1 where that axis steps on the tick. duration is one start_speed step period after the last pulse, so
+# back to back moves (like the single steps of calibration) never step faster than start_speed.
+MoveProfile = namedtuple("MoveProfile", ["tick_times", "pulse_alt", "pulse_az", "duration"])
+
+
+def trapezoidTimes(steps, max_speed, accel, start_speed):
+    """
+    Time of every step of a trapezoidal velocity profile. The axis starts at start_speed, accelerates at accel up to
+    max_speed, cruises, and decelerates back to start_speed at the last step. Short moves never reach max_speed and
+    get a triangular profile.
+
+    :param steps: Number of steps. (int)
+    :param max_speed: Cruise speed in steps/s. (float)
+    :param accel: Acceleration in steps/s^2. (float)
+    :param start_speed: Start and stop speed in steps/s. (float)
+    :return: Time of each step in seconds from the start of the move, the first step at 0. (np.ndarray)
+    """
+    if steps <= 0:
+        return np.zeros(0)
+    start_speed = min(start_speed, max_speed)
+    # Positions are measured from the first step, so a move of n steps covers n - 1 step intervals
+    distance = steps - 1
+    s = np.arange(steps, dtype=np.float64)
+    ramp = (max_speed ** 2 - start_speed ** 2) / (2 * accel)  # Steps needed to reach max_speed
+    if 2 * ramp > distance:
+        ramp = distance / 2
+    peak_speed = np.sqrt(start_speed ** 2 + 2 * accel * ramp)
+
+    def rampTime(x):
+        # Time to cover x steps while accelerating from start_speed
+        return (np.sqrt(start_speed ** 2 + 2 * accel * x) - start_speed) / accel
+
+    t_ramp = rampTime(ramp)
+    duration = 2 * t_ramp + (distance - 2 * ramp) / peak_speed
+    return np.where(s <= ramp, rampTime(s),
+                    np.where(s <= distance - ramp, t_ramp + (s - ramp) / peak_speed,
+                             duration - rampTime(np.maximum(distance - s, 0))))
+
+
+def moveDuration(steps, max_speed, accel, start_speed):
+    """
+    Duration of a single axis trapezoidal move, as planned by planMove, without planning it. Vectorized, so the time
+    of many candidate moves can be estimated at once.
+
+    :param steps: Number of steps, unsigned. (int or np.ndarray)
+    :param max_speed: Cruise speed in steps/s. (float)
+    :param accel: Acceleration in steps/s^2. (float)
+    :param start_speed: Start and stop speed in steps/s. (float)
+    :return: Seconds from the first step until the move is done, 0 for no steps. (float or np.ndarray)
+    """
+    steps = np.asarray(steps, dtype=np.float64)
+    start_speed = min(start_speed, max_speed)
+    distance = np.maximum(steps - 1, 0)
+    ramp = np.minimum((max_speed ** 2 - start_speed ** 2) / (2 * accel), distance / 2)
+    peak_speed = np.sqrt(start_speed ** 2 + 2 * accel * ramp)
+    duration = 2 * (peak_speed - start_speed) / accel + (distance - 2 * ramp) / peak_speed + 1 / start_speed
+    return np.where(steps > 0, duration, 0.0)[()]
+
+
+def planMove(steps_alt, steps_az, alt_limits, az_limits):
+    """
+    Plan a coordinated two-axis move. The axis with more steps follows a trapezoidal profile and the other axis
+    steps on evenly spaced ticks of it (see interleaveSteps), so both finish together. The profile is slowed if
+    needed so the minor axis stays within its own limits too.
+
+    :param steps_alt: Altitude steps, unsigned. (int)
+    :param steps_az: Azimuth steps, unsigned. (int)
+    :param alt_limits: AxisLimits of the altitude axis.
+    :param az_limits: AxisLimits of the azimuth axis.
+    :return: MoveProfile
+    """
+    ticks = max(steps_alt, steps_az)
+    pulse_alt, pulse_az = interleaveSteps(steps_alt, steps_az)
+    if ticks == 0:
+        return MoveProfile(np.zeros(0), pulse_alt, pulse_az, 0.0)
+
+    # On the major axis' timeline an axis moves at (its steps / ticks) of the tick rate on average, and never pulses
+    # closer than ticks // steps ticks apart, which bounds its speed between any two pulses.
+    scale = []
+    for steps, limits in ((steps_alt, alt_limits), (steps_az, az_limits)):
+        if steps > 0:
+            scale.append((limits, ticks // steps, ticks / steps))
+    max_speed = min(limits.max_speed * gap for limits, gap, ratio in scale)
+    accel = min(limits.accel * ratio for limits, gap, ratio in scale)
+    start_speed = min(limits.start_speed * gap for limits, gap, ratio in scale)
+
+    tick_times = trapezoidTimes(ticks, max_speed, accel, start_speed)
+    return MoveProfile(tick_times, pulse_alt, pulse_az, float(tick_times[-1]) + 1 / start_speed)
+
+
+def planIndependentMove(steps_alt, steps_az, alt_limits, az_limits):
+    """
+    Plan a two-axis move where each axis follows its own trapezoidal profile at its own limits, so the axes do not
+    finish together. Used for homing, where each axis stops on its own switch and neither should be slowed down to
+    the other's pace.
+
+    :param steps_alt: Altitude steps, unsigned. (int)
+    :param steps_az: Azimuth steps, unsigned. (int)
+    :param alt_limits: AxisLimits of the altitude axis.
+    :param az_limits: AxisLimits of the azimuth axis.
+    :return: MoveProfile
+    """
+    times_alt = trapezoidTimes(steps_alt, *alt_limits)
+    times_az = trapezoidTimes(steps_az, *az_limits)
+    tick_times = np.union1d(times_alt, times_az)
+    pulse_alt = np.isin(tick_times, times_alt).astype(int)
+    pulse_az = np.isin(tick_times, times_az).astype(int)
+    ends = [times[-1] + 1 / limits.start_speed for times, limits in ((times_alt, alt_limits), (times_az, az_limits))
+            if len(times) > 0]
+    return MoveProfile(tick_times, pulse_alt, pulse_az, float(max(ends, default=0.0)))
+
+
+def interleaveSteps(stepsA, stepsB):
+    """
+    Spread the step pulses of two axes over one timeline (Bresenham line drawing), so both axes start and finish
+    together. The axis with more steps pulses every tick, the other pulses on evenly spaced ticks.
+
+    :param stepsA: Number of steps for the first axis. (int)
+    :param stepsB: Number of steps for the second axis. (int)
+    :return: Two arrays with one entry per tick, 1 where that axis steps. Exactly stepsA and stepsB ones.
+             (np.ndarray, np.ndarray)
+    """
+    ticks = max(stepsA, stepsB)
+    if ticks == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    k = np.arange(ticks + 1)
+    # Steps completed by the end of each tick, rounded to the nearest whole step
+    doneA = (k * stepsA + ticks // 2) // ticks
+    doneB = (k * stepsB + ticks // 2) // ticks
+    return np.diff(doneA), np.diff(doneB)
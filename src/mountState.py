@@ -0,0 +1,131 @@
+"""
+File: mountState.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Persisted integer step position of the mount for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import time
+
+from utilities import Log
+
+# Bump when the meaning of the saved counts changes (gearing, microstepping), so old state forces homing
+MOUNT_STATE_VERSION = 1
+MOUNT_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin", "mountState.json")
+# Simulated sessions keep their own state, so they never touch the real mount's saved position
+SIM_MOUNT_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin", "mountStateSim.json")
+
+
+class MountState:
+    """
+    Absolute position of the mount as integer microstep counts per axis from the home (limit switch) position, the
+    ledger every move is booked against. Integer counts never drift, and degrees only come from them through the gear
+    ratios.
+
+    The state is written atomically after every move. clean is only saved as True by a clean shutdown, so a state
+    loaded with clean set can be trusted and the mount resumed without homing, while a crash or power cut leaves it
+    False and forces homing on the next start.
+    """
+
+    def __init__(self, path=MOUNT_STATE_PATH):
+        """
+        :param path: State file path. (string)
+        """
+        self.path = path
+        self.alt_steps = 0
+        self.az_steps = 0
+        self.homed = False
+        self.clean = False  # Whether the loaded state was left by a clean shutdown
+        # Commanded position in unrounded microsteps. Moves round this to whole steps, so the rounding of many small
+        # moves never adds up. Not saved, a resumed mount starts at its counts.
+        self.target_alt = 0.0
+        self.target_az = 0.0
+
+    def load(self):
+        """
+        Read the saved state. A missing, unreadable or outdated file leaves the mount unhomed.
+
+        :return: self
+        """
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            if state["version"] != MOUNT_STATE_VERSION:
+                raise ValueError("state version " + str(state["version"]))
+            self.alt_steps = int(state["alt_steps"])
+            self.az_steps = int(state["az_steps"])
+            self.homed = bool(state["homed"])
+            self.clean = bool(state["clean"])
+        except FileNotFoundError:
+            Log.info("No saved mount state at " + self.path)
+        except (ValueError, KeyError, TypeError) as e:
+            Log.warn("Ignoring saved mount state " + self.path + ": " + str(e))
+        self.target_alt = float(self.alt_steps)
+        self.target_az = float(self.az_steps)
+        return self
+
+    def canResume(self):
+        """
+        :return: Whether the saved position can be used without homing. (bool)
+        """
+        return self.homed and self.clean
+
+    def home(self):
+        """
+        Zero the counts at the home position and save.
+
+        :return: None
+        """
+        self.alt_steps = self.az_steps = 0
+        self.target_alt = self.target_az = 0.0
+        self.homed = True
+        self.save()
+
+    def book(self, steps_alt, steps_az):
+        """
+        Add a move to the counts and save.
+
+        :param steps_alt: Altitude microsteps, signed. (int)
+        :param steps_az: Azimuth microsteps, signed. (int)
+        :return: None
+        """
+        self.alt_steps += steps_alt
+        self.az_steps += steps_az
+        self.save()
+
+    def save(self, clean=False):
+        """
+        Write the state atomically (temporary file, fsync, rename), so the file is always either the old or the new
+        state.
+
+        :param clean: Mark the state as left by a clean shutdown. Default = False
+        :return: None
+        """
+        state = {"version": MOUNT_STATE_VERSION, "alt_steps": self.alt_steps, "az_steps": self.az_steps,
+                 "homed": self.homed, "clean": clean, "time": time.time()}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp%d" % os.getpid()
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,227 @@
+"""
+File: multiDongle.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Parallel acquisition from several RTL-SDR dongles for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import multiprocessing as mp
+import queue
+import threading
+import numpy as np
+
+from powerStream import Integration, PowerStream, QueuedStream
+from utilities import Log, parseFrequency, parseInterval
+
+
+class MultiPowerStream(QueuedStream):
+    """
+    Acquisition engine driving several RTL-SDR dongles at once, each in its own worker process running a
+    PowerStream. A collector thread lines up the integrations from every dongle by start time and merges them, so
+    callers get one Integration per pointing exactly as from a single PowerStream.
+
+    Modes:
+    "split"   The freq_min..freq_max band is divided into equal sub-bands, one per dongle, and the spectra are joined.
+    "average" Every dongle measures the whole band and the results are averaged. With N co-pointed dongles the
+              noise drops by sqrt(N), so the integration interval can be shortened for the same noise.
+    """
+
+    def __init__(self, devices, freq_min, freq_max, integration_interval, gain, mode="split", bin_size="128k",
+                 max_queued=64):
+        """
+        Configure the stream. No worker is started until start() is called.
+
+        :param devices: List of RTL-SDR device indexes or serials.
+        :param freq_min: Minimum frequency for power measurement. Ex. 980M (string)
+        :param freq_max: Maximum frequency for power measurement. Ex. 1020M (string)
+        :param integration_interval: Integration interval for SDR power measurement. Ex. 1s (string)
+        :param gain: Input gain for RTL-SDR. (string)
+        :param mode: "split" or "average". Default = split (string)
+        :param bin_size: rtl_power frequency bin size. Default = 128k (string)
+        :param max_queued: Number of merged integrations kept before the oldest is discarded. (int)
+        """
+        if mode not in ("split", "average"):
+            raise ValueError("Unknown multi-dongle mode: " + str(mode))
+        QueuedStream.__init__(self, parseInterval(integration_interval), max_queued)
+        self.devices = list(devices)
+        self.mode = mode
+        self.integration_interval = integration_interval
+        self.gain = gain
+        self.bin_size = bin_size
+        self.bands = self._deviceBands(freq_min, freq_max)
+
+        self._results = None
+        self._stop_event = None
+        self._workers = []
+        self._collector = None
+
+    def _deviceBands(self, freq_min, freq_max):
+        """
+        Frequency range measured by each dongle.
+
+        :return: List of (freq_min, freq_max) strings, one per device.
+        """
+        if self.mode == "average":
+            return [(freq_min, freq_max)] * len(self.devices)
+        edges = np.linspace(parseFrequency(freq_min), parseFrequency(freq_max), len(self.devices) + 1)
+        return [(str(int(edges[k])), str(int(edges[k + 1]))) for k in range(len(self.devices))]
+
+    def start(self):
+        """
+        Start one worker process per device and the collector thread.
+
+        :return: self, so a stream can be created and started in one line.
+        """
+        Log.info("Starting multi-dongle stream (" + self.mode + ") on devices " + str(self.devices))
+        self._results = mp.Queue()
+        self._stop_event = mp.Event()
+        self._workers = []
+        for k, device in enumerate(self.devices):
+            worker = mp.Process(target=_deviceWorker, daemon=True,
+                                args=(k, device, self.bands[k], self.integration_interval, self.gain, self.bin_size,
+                                      self._results, self._stop_event))
+            worker.start()
+            self._workers.append(worker)
+        self._collector = threading.Thread(target=self._collectLoop, args=(self._results, self._stop_event),
+                                           daemon=True)
+        self._collector.start()
+        return self
+
+    def stop(self):
+        """
+        Stop every worker process and the collector thread.
+
+        :return: None
+        """
+        if self._stop_event is None:
+            return
+        Log.info("Stopping multi-dongle stream")
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(timeout=3)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        self._stop_event = None
+
+    def restart(self):
+        """
+        Stop and start every worker, discarding any queued integrations.
+
+        :return: None
+        """
+        Log.warn("Restarting multi-dongle stream")
+        self.stop()
+        self._clearQueue()
+        self.start()
+
+    def isAlive(self):
+        """
+        :return: True if every worker process is running. (bool)
+        """
+        return len(self._workers) > 0 and all(worker.is_alive() for worker in self._workers)
+
+    def _collectLoop(self, results, stop_event):
+        """
+        Collector thread. Keep the integrations from each device in order and merge one from every device when
+        their start times agree to within half an integration interval.
+
+        :param results: Queue of (device number, Integration) from the workers.
+        :param stop_event: Set when the stream is stopped.
+        :return: None
+        """
+        pending = [[] for _ in self.devices]
+        tolerance = self.interval_sec / 2
+        while not stop_event.is_set():
+            try:
+                k, integration = results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            pending[k].append(integration)
+            if len(pending[k]) > self._queue.maxsize:
+                # Another device has stopped sending, keep only its most recent integrations
+                pending[k].pop(0)
+
+            while all(pending):
+                latest = max(p[0].start_time for p in pending)
+                # Drop integrations that no other device has a partner for.
+                for p in pending:
+                    while p and p[0].start_time < latest - tolerance:
+                        p.pop(0)
+                if all(pending):
+                    self._put(self._merge([p.pop(0) for p in pending]))
+
+    def _merge(self, integrations):
+        """
+        Merge one time-aligned integration from every device.
+
+        :param integrations: List of Integration, in device order.
+        :return: Integration
+        """
+        start_time = min(i.start_time for i in integrations)
+        end_time = max(i.end_time for i in integrations)
+        if self.mode == "split":
+            # rtl_power rounds each sub-band up to whole hops, so the bins past the end of a device's sub-band overlap
+            # the next device's and are dropped. The power is then the mean over the joined spectrum, so the result
+            # matches a single dongle over the whole band.
+            freqs = []
+            spectra = []
+            for integration, band in zip(integrations, self.bands):
+                f = np.asarray(integration.freqs)
+                in_band = (f >= parseFrequency(band[0])) & (f < parseFrequency(band[1]))
+                freqs.append(f[in_band])
+                spectra.append(np.asarray(integration.spectrum)[in_band])
+            spectrum = np.concatenate(spectra)
+            if np.any(~np.isnan(spectrum)):
+                power = float(np.nanmean(spectrum))
+            else:
+                power = float(np.mean([i.power for i in integrations]))
+            return Integration(start_time, end_time, power, np.concatenate(freqs), spectrum)
+
+        power = float(np.mean([i.power for i in integrations]))
+        if len(set(len(i.spectrum) for i in integrations)) == 1:
+            spectrum = np.mean([i.spectrum for i in integrations], axis=0)
+        else:
+            spectrum = integrations[0].spectrum
+        return Integration(start_time, end_time, power, integrations[0].freqs, spectrum)
+
+
+def _deviceWorker(k, device, band, integration_interval, gain, bin_size, results, stop_event):
+    """
+    Worker process for one dongle. Runs a PowerStream and forwards its integrations to the parent.
+
+    :param k: Device number in the parent's device list. (int)
+    :param device: RTL-SDR device index or serial.
+    :param band: (freq_min, freq_max) measured by this device.
+    :param integration_interval: Integration interval. Ex. 1s (string)
+    :param gain: Input gain for RTL-SDR. (string)
+    :param bin_size: rtl_power frequency bin size. (string)
+    :param results: Queue shared with the parent.
+    :param stop_event: Set by the parent to stop the worker.
+    :return: None
+    """
+    stream = PowerStream(band[0], band[1], integration_interval, gain, bin_size=bin_size, device=device).start()
+    try:
+        while not stop_event.is_set():
+            integration = stream.getIntegrationAfter(0, timeout=0.5)
+            if integration is not None:
+                results.put((k, integration))
+    finally:
+        stream.stop()
@@ -0,0 +1,357 @@
+"""
+File: observationPlan.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Observation plans compiled ahead of a session for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from collections import namedtuple
+import datetime
+import json
+import numpy as np
+
+import clock
+from motionProfile import moveDuration
+from scanPlanner import SCAN_ORDERS, planScan
+from tracking import (ALT_LIMITS, AZ_GEAR_RATIO, AZ_LIMITS, EL_GEAR_RATIO, LOWER_LIM_ALT, LOWER_LIM_AZ, STEP_SIZE,
+                      UPPER_LIM_ALT, UPPER_LIM_AZ, moveToSteps)
+from utilities import Log
+
+PLAN_VERSION = 2
+
+# One row per pointing. time is when the integration is planned to start, target_alt/target_az where it was asked to
+# point and alt/az where it will point, within the mount's limits. alt_steps/az_steps are that position on the step
+# ledger and d_alt_steps/d_az_steps the move from the previous pointing. move_time is the estimated move and dwell the
+# integration. violation holds VIOLATION_* flags.
+PLAN_DTYPE = np.dtype([("time", "f8"), ("frame", "i4"), ("row", "i4"), ("col", "i4"), ("sun_alt", "f8"),
+                       ("sun_az", "f8"), ("target_alt", "f8"), ("target_az", "f8"), ("alt", "f8"), ("az", "f8"),
+                       ("alt_steps", "i8"), ("az_steps", "i8"), ("d_alt_steps", "i8"), ("d_az_steps", "i8"),
+                       ("move_time", "f8"), ("dwell", "f8"), ("violation", "i4")])
+PLAN_FORMATS = ["%.3f", "%d", "%d", "%d", "%.4f", "%.4f", "%.4f", "%.4f", "%.4f", "%.4f", "%d", "%d", "%d", "%d",
+                "%.3f", "%.3f", "%d"]
+
+VIOLATION_ALT_LOW = 1  # Target below the altitude lower limit, clamped to it
+VIOLATION_ALT_HIGH = 2  # Target above the altitude upper limit, clamped to it
+VIOLATION_AZ_LOW = 4  # Target below the azimuth lower limit, clamped to it
+VIOLATION_AZ_HIGH = 8  # Target above the azimuth upper limit, clamped to it
+VIOLATION_LATE = 16  # The previous pointings run past this one's nominal time, so it starts late
+VIOLATION_LIMITS = VIOLATION_ALT_LOW | VIOLATION_ALT_HIGH | VIOLATION_AZ_LOW | VIOLATION_AZ_HIGH
+
+# A compiled session. header is a dict of the settings it was compiled with (JSON in the plan file), steps a
+# PLAN_DTYPE array.
+ObservationPlan = namedtuple("ObservationPlan", ["header", "steps"])
+
+
+def compileTrackingPlan(ephemeris, start_time, end_time, interval, integration_sec, settle_time, offsetAlt, offsetAz,
+                        start_steps=(0, 0), info=None):
+    """
+    Compile a session that points at the sun every interval seconds and takes one integration there, as main.py does.
+
+    :param ephemeris: Ephemeris covering the session.
+    :param start_time: Unix time of the first integration. (float)
+    :param end_time: Unix time no integration starts at or after. (float)
+    :param interval: Seconds between integrations. (float)
+    :param integration_sec: Integration time in seconds. (float)
+    :param settle_time: Seconds to wait after each move before integrating. (float)
+    :param offsetAlt: Altitude offset of the antenna in degrees. (float)
+    :param offsetAz: Azimuth offset of the antenna in degrees. (float)
+    :param start_steps: Ledger position the session starts from. Default = (0, 0) (home) (tuple)
+    :param info: Extra settings to keep in the header, like the location. Default = None (dict)
+    :return: ObservationPlan
+    """
+    times = np.arange(start_time, end_time, interval, dtype=np.float64)
+    sunAlt, sunAz = ephemeris.positions(times)
+    steps = _layout(times, np.full(len(times), -1), np.zeros(len(times)), np.zeros(len(times)), sunAlt, sunAz, sunAlt,
+                    sunAz, integration_sec, offsetAlt, offsetAz, start_steps)
+    # A pointing is late if the move and settling after the previous integration run past its time. The session
+    # starts once the first pointing is reached, so that one never is.
+    ready = np.append(start_time, times[:-1] + integration_sec) + steps["move_time"] + settle_time
+    ready[:1] = times[:1]
+    steps["violation"] |= np.where(ready > times + 1e-6, VIOLATION_LATE, 0)
+    return ObservationPlan(_header("tracking", start_time, end_time, integration_sec, settle_time, offsetAlt, offsetAz,
+                                   start_steps, info, interval=interval, max_late=interval / 2), steps)
+
+
+def compileImagingPlan(ephemeris, start_time, end_time, frame_interval, height, width, el_step, az_step,
+                       integration_sec, settle_time, offsetAlt, offsetAz, footprint, orders=SCAN_ORDERS,
+                       start_steps=(0, 0), info=None):
+    """
+    Compile a session of stop-and-stare frames, one every frame_interval seconds, as eclipseImaging.py takes them.
+    Each frame's pixels are visited in the order planScan picks from where the last frame ended, and the first pixel
+    of the next frame is moved to as soon as a frame ends, so its slew happens while waiting for it. A frame that
+    cannot start on time starts as soon as it can and is flagged late (except the first, the session starts once it is
+    reached).
+
+    :param ephemeris: Ephemeris covering the session.
+    :param start_time: Unix time of the first frame. (float)
+    :param end_time: Unix time no frame starts at or after. (float)
+    :param frame_interval: Seconds between frame starts. (float)
+    :param height: Image height in pixels. (int)
+    :param width: Image width in pixels. (int)
+    :param el_step: Altitude between pixel centres in degrees. (float)
+    :param az_step: Azimuth between pixel centres in degrees. (float)
+    :param integration_sec: Integration time of each pixel in seconds. (float)
+    :param settle_time: Seconds to wait after each move before integrating. (float)
+    :param offsetAlt: Altitude offset of the antenna in degrees. (float)
+    :param offsetAz: Azimuth offset of the antenna in degrees. (float)
+    :param footprint: Function of the frame number and its start time giving the altitude and azimuth of its first
+                      pixel, like eclipseImaging.frameStart.
+    :param orders: Scan orders planScan may choose from. Default = SCAN_ORDERS (tuple)
+    :param start_steps: Ledger position the session starts from. Default = (0, 0) (home) (tuple)
+    :param info: Extra settings to keep in the header, like the location. Default = None (dict)
+    :return: ObservationPlan
+    """
+    frames = []
+    ledger = tuple(start_steps)
+    antAlt, antAz = stepsToDeg(ledger, offsetAlt, offsetAz)
+    free_time = start_time  # When the mount is free after the last integration
+    frame = 0
+    while start_time + frame * frame_interval < end_time:
+        nominal = start_time + frame * frame_interval
+        frame_start = max(nominal, free_time)
+        startAlt, startAz = footprint(frame, frame_start)
+        sunAlt, sunAz = ephemeris.position(frame_start + height * width * (integration_sec + settle_time) / 2)
+        plan = planScan(height, width, startAlt, startAz, el_step, az_step, antAlt, antAz, sunAlt, sunAz,
+                        orders=orders)
+        alt = startAlt + plan.pixels[:, 0] * el_step
+        az = startAz + plan.pixels[:, 1] * az_step
+        steps = _layout(np.zeros(len(alt)), np.full(len(alt), frame), plan.pixels[:, 0], plan.pixels[:, 1], alt, az,
+                        np.zeros(len(alt)), np.zeros(len(alt)), integration_sec, offsetAlt, offsetAz, ledger)
+
+        # The first pixel starts at the frame time unless the move there is not done by then. Every other pixel
+        # follows straight after the one before it.
+        first = max(frame_start, free_time + steps["move_time"][0] + settle_time)
+        gaps = np.append(0, steps["move_time"][1:] + settle_time + integration_sec)
+        steps["time"] = first + np.cumsum(gaps)
+        if first > nominal + 1e-6 and frame > 0:
+            steps["violation"][0] |= VIOLATION_LATE
+        steps["sun_alt"], steps["sun_az"] = ephemeris.positions(steps["time"])
+
+        frames.append(steps)
+        free_time = float(steps["time"][-1]) + integration_sec
+        ledger = (int(steps["alt_steps"][-1]), int(steps["az_steps"][-1]))
+        antAlt, antAz = stepsToDeg(ledger, offsetAlt, offsetAz)
+        frame += 1
+
+    steps = np.concatenate(frames) if frames else np.zeros(0, dtype=PLAN_DTYPE)
+    return ObservationPlan(_header("imaging", start_time, end_time, integration_sec, settle_time, offsetAlt, offsetAz,
+                                   start_steps, info, frame_interval=frame_interval, height=height, width=width,
+                                   el_step=el_step, az_step=az_step, max_late=frame_interval / 2), steps)
+
+
+def _header(kind, start_time, end_time, integration_sec, settle_time, offsetAlt, offsetAz, start_steps, info,
+            **settings):
+    """
+    :return: Plan header with everything needed to check and replay the plan. max_late is how many seconds behind its
+             planned time a pointing may still be taken, half the time between pointings (or frames). (dict)
+    """
+    header = {"version": PLAN_VERSION, "kind": kind, "compiled": clock.unixTime(), "start_time": start_time,
+              "end_time": end_time, "integration_sec": integration_sec, "settle_time": settle_time,
+              "offset_alt": offsetAlt, "offset_az": offsetAz, "start_steps": [int(s) for s in start_steps],
+              "step_size": STEP_SIZE, "el_gear_ratio": EL_GEAR_RATIO, "az_gear_ratio": AZ_GEAR_RATIO,
+              "alt_limits": [LOWER_LIM_ALT, UPPER_LIM_ALT], "az_limits": [LOWER_LIM_AZ, UPPER_LIM_AZ]}
+    header.update(settings)
+    header.update(info or {})
+    return header
+
+
+def _layout(times, frame, row, col, alt, az, sunAlt, sunAz, integration_sec, offsetAlt, offsetAz, start_steps):
+    """
+    Clamp a run of targets to the mount's limits and lay them out on the step ledger, all at once.
+
+    :return: PLAN_DTYPE array. (np.ndarray)
+    """
+    steps = np.zeros(len(times), dtype=PLAN_DTYPE)
+    steps["time"], steps["frame"], steps["row"], steps["col"] = times, frame, row, col
+    steps["sun_alt"], steps["sun_az"] = sunAlt, sunAz
+    steps["target_alt"], steps["target_az"] = alt, az
+    lowAlt, highAlt = LOWER_LIM_ALT + offsetAlt, UPPER_LIM_ALT + offsetAlt
+    lowAz, highAz = LOWER_LIM_AZ + offsetAz, UPPER_LIM_AZ + offsetAz
+    steps["violation"] = (np.where(alt < lowAlt, VIOLATION_ALT_LOW, 0) | np.where(alt > highAlt, VIOLATION_ALT_HIGH, 0)
+                          | np.where(az < lowAz, VIOLATION_AZ_LOW, 0) | np.where(az > highAz, VIOLATION_AZ_HIGH, 0))
+    steps["alt"] = np.clip(alt, lowAlt, highAlt)
+    steps["az"] = np.clip(az, lowAz, highAz)
+    steps["alt_steps"] = np.rint((steps["alt"] - offsetAlt) / STEP_SIZE * EL_GEAR_RATIO)
+    steps["az_steps"] = np.rint((steps["az"] - offsetAz) / STEP_SIZE * AZ_GEAR_RATIO)
+    steps["d_alt_steps"] = np.diff(steps["alt_steps"], prepend=start_steps[0])
+    steps["d_az_steps"] = np.diff(steps["az_steps"], prepend=start_steps[1])
+    steps["move_time"] = np.maximum(moveDuration(np.abs(steps["d_alt_steps"]), *ALT_LIMITS),
+                                    moveDuration(np.abs(steps["d_az_steps"]), *AZ_LIMITS))
+    steps["dwell"] = integration_sec
+    return steps
+
+
+def stepsToDeg(steps, offsetAlt, offsetAz):
+    """
+    :param steps: Altitude and azimuth ledger position in steps from home. (tuple of int or np.ndarray)
+    :param offsetAlt: Altitude offset of the antenna in degrees. (float)
+    :param offsetAz: Azimuth offset of the antenna in degrees. (float)
+    :return: Altitude and azimuth in degrees the antenna points at there. (float, float)
+    """
+    return offsetAlt + steps[0] * STEP_SIZE / EL_GEAR_RATIO, offsetAz + steps[1] * STEP_SIZE / AZ_GEAR_RATIO
+
+
+def _timeString(t):
+    """
+    :return: Local time of a unix time, for logs. (string)
+    """
+    return datetime.datetime.fromtimestamp(float(t)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def validatePlan(plan, allow_clamp=False, offsetAlt=None, offsetAz=None, now=None):
+    """
+    Check a plan before it is run: every pointing within the mount's limits, times in order, and step deltas that
+    add up to the ledger positions. Late pointings are only logged as warnings.
+
+    :param plan: ObservationPlan
+    :param allow_clamp: Accept targets outside the limits, pointing at the nearest limit instead (like tracking the
+                        sun below the mount's range). Default = False
+    :param offsetAlt: Altitude offset of the antenna the plan must be compiled for. Default = None (any)
+    :param offsetAz: Azimuth offset of the antenna the plan must be compiled for. Default = None (any)
+    :param now: Unix time the plan would start running at. A plan whose pointings are all too late by then has
+                already passed, one that is partly past is logged as a warning. Default = None (not checked)
+    :return: List of problems, empty if the plan can be run. (list of string)
+    """
+    steps = plan.steps
+    problems = []
+    if plan.header.get("version") != PLAN_VERSION:
+        problems.append(f"Plan version {plan.header.get('version')} is not {PLAN_VERSION}")
+    for name, offset in (("offset_alt", offsetAlt), ("offset_az", offsetAz)):
+        if offset is not None and abs(plan.header[name] - offset) > 1e-9:
+            problems.append(f"Plan was compiled for {name}={plan.header[name]}, not {offset}")
+    for name, value in (("step_size", STEP_SIZE), ("el_gear_ratio", EL_GEAR_RATIO), ("az_gear_ratio", AZ_GEAR_RATIO)):
+        if plan.header[name] != value:
+            problems.append(f"Plan was compiled for {name}={plan.header[name]}, the mount has {value}")
+    if len(steps) == 0:
+        problems.append("Plan has no pointings")
+        return problems
+
+    for flag, name in ((VIOLATION_ALT_LOW, "below the altitude lower limit"),
+                       (VIOLATION_ALT_HIGH, "above the altitude upper limit"),
+                       (VIOLATION_AZ_LOW, "below the azimuth lower limit"),
+                       (VIOLATION_AZ_HIGH, "above the azimuth upper limit")):
+        bad = np.flatnonzero(steps["violation"] & flag)
+        if len(bad) > 0:
+            first = steps[bad[0]]
+            message = (f"{len(bad)} pointings {name}, first at {_timeString(first['time'])} (frame "
+                       f"{first['frame']}, alt={first['target_alt']:.3f}, az={first['target_az']:.3f})")
+            if allow_clamp:
+                Log.warn(message + ", clamped to the limit")
+            else:
+                problems.append(message)
+
+    if now is not None:
+        stale = np.count_nonzero(steps["time"] + plan.header["max_late"] < now)
+        if stale == len(steps):
+            problems.append(f"Plan ended at {_timeString(steps['time'][-1])}, before {_timeString(now)}")
+        elif stale > 0:
+            Log.warn(f"{stale} of {len(steps)} pointings are already past and will be skipped, the plan started at "
+                     f"{_timeString(steps['time'][0])}")
+
+    late = np.flatnonzero(steps["violation"] & VIOLATION_LATE)
+    if len(late) > 0:
+        Log.warn(f"{len(late)} pointings start late, first at {_timeString(steps['time'][late[0]])}")
+    if np.any(np.diff(steps["time"]) <= 0):
+        problems.append("Pointing times are not in order")
+    start = plan.header["start_steps"]
+    if (np.any(np.cumsum(steps["d_alt_steps"]) + start[0] != steps["alt_steps"])
+            or np.any(np.cumsum(steps["d_az_steps"]) + start[1] != steps["az_steps"])):
+        problems.append("Step deltas do not add up to the ledger positions")
+    return problems
+
+
+def planSummary(plan):
+    """
+    :return: One line description of a plan, for logs. (string)
+    """
+    steps = plan.steps
+    if len(steps) == 0:
+        return "Empty " + plan.header["kind"] + " plan"
+    frames = len(np.unique(steps["frame"][steps["frame"] >= 0]))
+    return (f"{plan.header['kind'].capitalize()} plan: {len(steps)} pointings"
+            + (f" in {frames} frames" if frames else "")
+            + f" from {_timeString(steps['time'][0])} to {_timeString(steps['time'][-1])}, "
+              f"{np.sum(steps['move_time']):.0f} s of slewing, "
+              f"{np.count_nonzero(steps['violation'] & VIOLATION_LIMITS)} limit violations, "
+              f"{np.count_nonzero(steps['violation'] & VIOLATION_LATE)} late")
+
+
+def savePlan(plan, path):
+    """
+    Write a plan as text: the header as one line of JSON, then one CSV row per pointing, so plans can be read and
+    diffed.
+
+    :param plan: ObservationPlan
+    :param path: Output file path. (string)
+    :return: None
+    """
+    header = "# " + json.dumps(plan.header, sort_keys=True) + "\n" + ",".join(PLAN_DTYPE.names)
+    np.savetxt(path, plan.steps, fmt=PLAN_FORMATS, delimiter=",", header=header, comments="")
+
+
+def loadPlan(path):
+    """
+    Read a plan written by savePlan.
+
+    :param path: Plan file path. (string)
+    :return: ObservationPlan
+    """
+    with open(path) as f:
+        header = json.loads(f.readline()[1:])
+    steps = np.genfromtxt(path, delimiter=",", skip_header=2, dtype=PLAN_DTYPE)
+    return ObservationPlan(header, np.atleast_1d(steps))
+
+
+def executePlan(plan, measure, on_step=None, steps=None, sleep=None):
+    """
+    Replay a plan. Each pointing moves straight to its ledger position as soon as the last integration is done,
+    settles, waits for its planned time and integrates. Nothing is looked up or decided while the plan runs. Pointings
+    more than the header's max_late behind their planned time are skipped, the sun has moved on from them.
+
+    :param plan: ObservationPlan, checked with validatePlan.
+    :param measure: Function taking one integration, called with the step (a PLAN_DTYPE record) once it is pointed at.
+    :param on_step: Function called with each step and what measure returned for it. Default = None
+    :param steps: Subset of plan.steps to run, like one frame. Default = None (all)
+    :param sleep: Function to wait with, like clock.pause to keep live plots responsive. Default = None (clock.sleep)
+    :return: Number of pointings taken. (int)
+    """
+    if sleep is None:
+        sleep = clock.sleep
+    settle_time = plan.header["settle_time"]
+    max_late = plan.header["max_late"]
+    skipped = []
+    for step in (plan.steps if steps is None else steps):
+        # Checked before the move and again once settled, the move itself can make a pointing too late
+        if clock.unixTime() - step["time"] > max_late:
+            skipped.append(step["time"])
+            continue
+        moveToSteps(int(step["alt_steps"]), int(step["az_steps"]))
+        clock.sleep(settle_time)
+        if clock.unixTime() - step["time"] > max_late:
+            skipped.append(step["time"])
+            continue
+        sleep(step["time"] - clock.unixTime())
+        result = measure(step)
+        if on_step is not None:
+            on_step(step, result)
+    if skipped:
+        Log.warn(f"Skipped {len(skipped)} pointings more than {max_late:g} s late, planned from "
+                 f"{_timeString(skipped[0])} to {_timeString(skipped[-1])}")
+    return len(plan.steps if steps is None else steps) - len(skipped)
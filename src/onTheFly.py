@@ -0,0 +1,183 @@
+"""
+File: onTheFly.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: On-the-fly raster scanning and gridding of time-tagged integrations for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from collections import namedtuple
+import numpy as np
+
+from powerStream import Integration
+from rfiMask import maskedSpectrum
+from tracking import antennaPosition, getDifferenceDeg, lastMove, moveStepper, waitForMove
+from utilities import Log
+
+# One on-the-fly integration. time is the middle of the integration and alt/az where the antenna pointed then,
+# interpolated on the mount's motion timeline.
+ScanSample = namedtuple("ScanSample", ["time", "alt", "az", "integration"])
+
+
+def scanFrame(measure, interval_sec, antAlt, antAz, startAlt, startAz, height, width, el_step, az_step, speed,
+              offsetAlt, offsetAz, corner=(0, 0), on_sample=None):
+    """
+    Scan a frame on the fly. Each row is slewed at a constant speed across the whole frame while integrations are
+    taken back to back, and every integration is tagged with where the antenna was in the middle of it. Rows alternate
+    direction and run from the outer edge of the first pixel to the outer edge of the last, so every pixel is crossed
+    at full speed. The scan starts from any corner, so a frame can start where the last one ended. There is no
+    settling or SDR startup per pixel, so the frame takes height * (row length / speed plus one row step).
+
+    :param measure: Function taking a unix time and returning the next Integration starting at or after it, like
+                    measSpectrum(..., stream=..., after=t).
+    :param interval_sec: Integration interval in seconds. (float)
+    :param antAlt: Current altitude of the antenna in degrees. (float)
+    :param antAz: Current azimuth of the antenna in degrees. (float)
+    :param startAlt: Altitude of the centre of the first row in degrees. (float)
+    :param startAz: Azimuth of the centre of the first column in degrees. (float)
+    :param height: Image height in pixels. (int)
+    :param width: Image width in pixels. (int)
+    :param el_step: Altitude between pixel centres in degrees. (float)
+    :param az_step: Azimuth between pixel centres in degrees. (float)
+    :param speed: Azimuth scan speed in deg/s. (float)
+    :param offsetAlt: Altitude offset of the antenna in degrees. (float)
+    :param offsetAz: Azimuth offset of the antenna in degrees. (float)
+    :param corner: (row, column) of the corner pixel to start from. Default = (0, 0) (tuple)
+    :param on_sample: Function called with every ScanSample as soon as its row is done. Default = None
+    :return: List of ScanSamples, and the altitude and azimuth of the antenna at the end. (list, float, float)
+    """
+    samples = []
+    rowEdges = (startAz - az_step / 2, startAz + (width - 0.5) * az_step)
+    if corner[1] != 0:
+        rowEdges = rowEdges[::-1]
+    for k in range(height):
+        i = height - 1 - k if corner[0] != 0 else k
+        rowAlt = startAlt + i * el_step
+        fromAz, toAz = rowEdges if k % 2 == 0 else rowEdges[::-1]
+        diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, rowAlt, fromAz, offsetAlt, offsetAz)
+        moveStepper(diffAlt, diffAz)
+
+        Log.info(f"Scanning row {i} at {speed} deg/s")
+        diffAlt, diffAz, antAlt, antAz = getDifferenceDeg(antAlt, antAz, rowAlt, toAz, offsetAlt, offsetAz)
+        moveStepper(0, diffAz, wait=False, speed=speed)
+        row = scanRow(measure, interval_sec, lastMove().start_time, lastMove().end_time)
+        waitForMove()
+
+        times = np.array([(integration.start_time + integration.end_time) / 2 for integration in row])
+        alts, azs = antennaPosition(offsetAlt, offsetAz, times)
+        for integration, t, alt, az in zip(row, times, np.atleast_1d(alts), np.atleast_1d(azs)):
+            sample = ScanSample(float(t), float(alt), float(az), integration)
+            samples.append(sample)
+            if on_sample is not None:
+                on_sample(sample)
+    return samples, antAlt, antAz
+
+
+def scanRow(measure, interval_sec, start_time, end_time):
+    """
+    Take integrations back to back from start_time until the middle of the next one would be after end_time.
+    Failed integrations (nan power) are left out.
+
+    :param measure: Function taking a unix time and returning the next Integration starting at or after it.
+    :param interval_sec: Integration interval in seconds. (float)
+    :param start_time: Unix time the row starts at. (float)
+    :param end_time: Unix time the row ends at. (float)
+    :return: List of Integrations. (list)
+    """
+    row = []
+    after = start_time
+    while after + interval_sec / 2 <= end_time:
+        integration = measure(after)
+        if (integration.start_time + integration.end_time) / 2 > end_time:
+            break
+        if not np.isnan(integration.power):
+            row.append(integration)
+        # Half an interval of slack, so the integration right after this one is accepted
+        after = max(integration.end_time - interval_sec / 2, after + interval_sec / 2)
+    return row
+
+
+def gridSamples(alt, az, values, startAlt, startAz, el_step, az_step, height, width):
+    """
+    Grid scattered samples onto the image pixels. Each sample goes to the pixel its position is nearest the centre of,
+    samples outside the image and nan values are left out.
+
+    :param alt: Altitude of every sample in degrees. (np.ndarray)
+    :param az: Azimuth of every sample in degrees. (np.ndarray)
+    :param values: Value of every sample. (np.ndarray)
+    :param startAlt: Altitude of the centre of the first row in degrees. (float)
+    :param startAz: Azimuth of the centre of the first column in degrees. (float)
+    :param el_step: Altitude between pixel centres in degrees. (float)
+    :param az_step: Azimuth between pixel centres in degrees. (float)
+    :param height: Image height in pixels. (int)
+    :param width: Image width in pixels. (int)
+    :return: Mean of the samples in every pixel (nan where there are none), their standard error (nan with fewer
+             than two) and their number, each height x width. (np.ndarray, np.ndarray, np.ndarray)
+    """
+    index = pixelIndex(alt, az, startAlt, startAz, el_step, az_step, height, width)
+    values = np.asarray(values, dtype=np.float64)
+    valid = (index >= 0) & ~np.isnan(values)
+    n = height * width
+    counts = np.bincount(index[valid], minlength=n)
+    sums = np.bincount(index[valid], weights=values[valid], minlength=n)
+    squares = np.bincount(index[valid], weights=values[valid] ** 2, minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / counts
+        variance = np.maximum(squares / counts - mean ** 2, 0) * counts / (counts - 1)
+        err = np.where(counts > 1, np.sqrt(variance / counts), np.nan)
+    return mean.reshape(height, width), err.reshape(height, width), counts.reshape(height, width)
+
+
+def pixelIndex(alt, az, startAlt, startAz, el_step, az_step, height, width):
+    """
+    :return: Flat (row * width + column) index of the pixel nearest every position, -1 outside the image.
+             (np.ndarray of int)
+    """
+    i = np.rint((np.asarray(alt, dtype=np.float64) - startAlt) / el_step).astype(int)
+    j = np.rint((np.asarray(az, dtype=np.float64) - startAz) / az_step).astype(int)
+    inside = (i >= 0) & (i < height) & (j >= 0) & (j < width)
+    return np.where(inside, i * width + j, -1)
+
+
+def gridCube(samples, cube, startAlt, startAz, el_step, az_step):
+    """
+    Fill an ImageCube from on-the-fly samples. The spectra of the samples in each pixel are averaged bin by bin
+    first, leaving out bins masked as RFI, and pixels without samples are left nan.
+
+    :param samples: List of ScanSamples. (list)
+    :param cube: ImageCube of the frame.
+    :param startAlt: Altitude of the centre of the first row in degrees. (float)
+    :param startAz: Azimuth of the centre of the first column in degrees. (float)
+    :param el_step: Altitude between pixel centres in degrees. (float)
+    :param az_step: Azimuth between pixel centres in degrees. (float)
+    :return: None
+    """
+    n_channels, height, width = cube.data.shape
+    index = pixelIndex([s.alt for s in samples], [s.az for s in samples], startAlt, startAz, el_step, az_step,
+                       height, width)
+    for pixel in np.unique(index[index >= 0]):
+        spectra = [maskedSpectrum(samples[k].integration) for k in np.flatnonzero(index == pixel)]
+        if len({len(spectrum) for spectrum in spectra}) != 1:
+            continue
+        first = samples[np.flatnonzero(index == pixel)[0]].integration
+        stack = np.vstack(spectra)
+        counts = np.sum(~np.isnan(stack), axis=0)
+        spectrum = np.where(counts > 0, np.nansum(stack, axis=0) / np.maximum(counts, 1), np.nan)
+        cube.setPixel(pixel // width, pixel % width,
+                      Integration(first.start_time, first.end_time, float("nan"), first.freqs, spectrum))
@@ -0,0 +1,236 @@
+"""
+File: powerStream.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Persistent rtl_power acquisition engine for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import subprocess as sp
+import threading
+import queue
+import time
+from collections import namedtuple
+import numpy as np
+
+from rtlPowerParser import parseLine
+from utilities import Log, parseFrequency, parseInterval
+
+# One completed integration. Times are unix timestamps taken on the Pi, power is the band mean (dB), freqs and
+# spectrum are the per-bin frequencies (Hz) and powers (dB) the mean was taken over. masked is the fraction of bins
+# excluded from the mean as RFI, 0 until an RfiMask is applied, and mask flags those bins (None if there are none).
+# The spectrum itself is never masked.
+Integration = namedtuple("Integration", ["start_time", "end_time", "power", "freqs", "spectrum", "masked", "mask"],
+                         defaults=(0.0, None))
+
+
+class QueuedStream:
+    """
+    Base class for acquisition engines that hand time-tagged Integrations to callers through a queue.
+    Subclasses start their own reader and call _put for every completed integration.
+    """
+
+    def __init__(self, interval_sec, max_queued=64):
+        """
+        :param interval_sec: Integration interval in seconds. (float)
+        :param max_queued: Number of integrations kept before the oldest is discarded. (int)
+        """
+        self.interval_sec = interval_sec
+        self._queue = queue.Queue(maxsize=max_queued)
+
+    def getIntegrationAfter(self, t, timeout=None):
+        """
+        Return the first integration that started at or after time t. Older integrations are discarded.
+
+        :param t: Unix timestamp. Integrations that started before this are skipped. (float)
+        :param timeout: Seconds to wait. Default = three integration intervals. (float)
+        :return: Integration, or None if nothing arrived in time.
+        """
+        if timeout is None:
+            timeout = 3 * self.interval_sec + 1
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            try:
+                integration = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if integration.start_time >= t:
+                return integration
+
+    def _put(self, integration):
+        """
+        Queue an integration, discarding the oldest one if nobody has been reading.
+
+        :param integration: Integration to queue.
+        :return: None
+        """
+        try:
+            self._queue.put_nowait(integration)
+        except queue.Full:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                # The reader emptied the queue in between
+                pass
+            self._queue.put_nowait(integration)
+
+    def _clearQueue(self):
+        """
+        Discard any queued integrations.
+
+        :return: None
+        """
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+
+class PowerStream(QueuedStream):
+    """
+    Long-lived rtl_power acquisition engine.
+
+    A single rtl_power process is kept running in continuous mode with its CSV output on stdout. A reader thread
+    parses the output line by line, groups the hops of each sweep into one time-tagged Integration and puts it on a
+    queue. Callers ask for the next integration that started after a given time instead of paying for process
+    startup, USB open and tuner settling on every measurement.
+    """
+
+    def __init__(self, freq_min, freq_max, integration_interval, gain, bin_size="128k", device=None, max_queued=64):
+        """
+        Configure the stream. The rtl_power process is not started until start() is called.
+
+        :param freq_min: Minimum frequency for power measurement. Ex. 980M (string)
+        :param freq_max: Maximum frequency for power measurement. Ex. 1020M (string)
+        :param integration_interval: Integration interval for SDR power measurement. Ex. 1s (string)
+        :param gain: Input gain for RTL-SDR. (string)
+        :param bin_size: rtl_power frequency bin size. Default = 128k (string)
+        :param device: RTL-SDR device index or serial. Default = None (first device)
+        :param max_queued: Number of integrations kept before the oldest is discarded. (int)
+        """
+        QueuedStream.__init__(self, parseInterval(integration_interval), max_queued)
+        self.freq_min = freq_min
+        self.freq_max = freq_max
+        self.integration_interval = integration_interval
+        self.gain = gain
+        self.bin_size = bin_size
+        self.device = device
+        self.freq_max_hz = parseFrequency(freq_max)
+        self.bin_size_hz = parseFrequency(bin_size)
+
+        self._proc = None
+        self._thread = None
+
+    def command(self):
+        """
+        Build the rtl_power command line. No output file is given so rtl_power writes CSV lines to stdout.
+
+        :return: Command as a list of arguments.
+        """
+        command = ["rtl_power", "-f", str(self.freq_min) + ":" + str(self.freq_max) + ":" + str(self.bin_size),
+                   "-i", str(self.integration_interval), "-g", str(self.gain)]
+        if self.device is not None:
+            command += ["-d", str(self.device)]
+        return command
+
+    def start(self):
+        """
+        Start the rtl_power process and the reader thread.
+
+        :return: self, so a stream can be created and started in one line.
+        """
+        command = self.command()
+        Log.info("Starting power stream: " + " ".join(command))
+        self._proc = sp.Popen(command, stdout=sp.PIPE, stderr=sp.DEVNULL)
+        self._thread = threading.Thread(target=self._readLoop, args=(self._proc,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Terminate the rtl_power process. The reader thread exits when stdout closes.
+
+        :return: None
+        """
+        if self._proc is not None and self._proc.poll() is None:
+            Log.info("Stopping power stream")
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=2)
+            except sp.TimeoutExpired:
+                self._proc.kill()
+        self._proc = None
+
+    def restart(self):
+        """
+        Stop and start the rtl_power process, discarding any queued integrations.
+
+        :return: None
+        """
+        Log.warn("Restarting power stream")
+        self.stop()
+        self._clearQueue()
+        self.start()
+
+    def isAlive(self):
+        """
+        :return: True if the rtl_power process is running. (bool)
+        """
+        return self._proc is not None and self._proc.poll() is None
+
+    def _readLoop(self, proc):
+        """
+        Reader thread. Parse rtl_power stdout and queue one Integration per completed sweep.
+
+        :param proc: rtl_power process being read.
+        :return: None
+        """
+        hop_bins = []
+        sweep_stamp = None
+        for line in proc.stdout:
+            hop = parseLine(line)
+            if hop is None:
+                continue
+            # Every hop of one sweep shares the same date/time stamp. A new stamp means the last sweep was cut short.
+            if sweep_stamp is not None and hop.stamp != sweep_stamp:
+                hop_bins = []
+            sweep_stamp = hop.stamp
+            hop_bins.append(hop)
+            # rtl_power may stop up to one bin short of the requested upper edge.
+            if hop.hz_high >= self.freq_max_hz - self.bin_size_hz:
+                end_time = time.time()
+                self._put(_sweepIntegration(hop_bins, end_time - self.interval_sec, end_time))
+                hop_bins = []
+                sweep_stamp = None
+
+
+def _sweepIntegration(hops, start_time, end_time):
+    """
+    Combine the hops of one sweep into an Integration. The last bin of each hop is dropped, as in measPower.
+
+    :param hops: List of Hop from one sweep, in frequency order.
+    :param start_time: Unix time the sweep started.
+    :param end_time: Unix time the sweep finished.
+    :return: Integration
+    """
+    bins = [hop.bins[:-1] for hop in hops]
+    freqs = [hop.hz_low + np.arange(len(hop.bins) - 1) * hop.hz_step for hop in hops]
+    power = float(np.mean([b.mean() for b in bins]))
+    return Integration(start_time, end_time, power, np.concatenate(freqs), np.concatenate(bins))
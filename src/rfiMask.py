@@ -0,0 +1,151 @@
+"""
+File: rfiMask.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: RFI excision of per-bin spectra for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+MAD_TO_SIGMA = 1.4826  # Scales the median absolute deviation to a standard deviation for Gaussian noise
+MIN_BINS = 8  # Spectra with fewer bins (e.g. iq_total) are passed through unmasked
+
+
+class RfiMask:
+    """
+    Mask narrowband interference in each integration's spectrum out of the band mean.
+
+    Every integration, bins more than threshold robust standard deviations (median/MAD across bins) from the
+    spectrum's median are masked. Across the session each bin's flag rate is tracked, and a bin flagged in more than
+    persist_fraction of integrations is masked in every integration, including ones where the interferer is
+    momentarily weak. The power is the mean of the remaining bins and the masked bins are flagged in the
+    integration's mask, while the spectrum is left raw so it can be stored and re-analysed. All the work is
+    whole-array numpy operations, with no loop over bins.
+    """
+
+    def __init__(self, threshold=5.0, persist_fraction=0.5, min_seen=10):
+        """
+        :param threshold: Outlier threshold in robust standard deviations. 0 disables masking. Default = 5 (float)
+        :param persist_fraction: Flag rate above which a bin is masked for the rest of the session. Default = 0.5
+        :param min_seen: Integrations needed before any bin is masked persistently. Default = 10 (int)
+        """
+        self.threshold = threshold
+        self.persist_fraction = persist_fraction
+        self.min_seen = min_seen
+        self._hits = None
+        self._seen = 0
+        self._masked_total = 0.0
+        self._integrations = 0
+
+    def apply(self, integration, bins=None):
+        """
+        Mask RFI in one integration.
+
+        :param integration: Integration to clean.
+        :param bins: Bins the statistics and the power are taken over, e.g. the main band of a sweep that also covers
+                     reference bands. Other bins are never masked. Default = None (every bin) (np.ndarray of bool)
+        :return: Integration with the power recomputed from the bins that are not masked, mask set to the masked bins
+                 and masked to their fraction. The spectrum is unchanged.
+        """
+        spectrum = np.asarray(integration.spectrum, dtype=np.float64)
+        if bins is None:
+            bins = np.ones(len(spectrum), dtype=bool)
+        n_bins = int(np.count_nonzero(bins))
+        if self.threshold <= 0 or n_bins < MIN_BINS:
+            return integration
+        good = ~np.isnan(spectrum) & bins
+        if not good.any():
+            return integration
+
+        values = spectrum[good]
+        median = np.median(values)
+        sigma = np.median(np.abs(values - median)) * MAD_TO_SIGMA
+        flagged = np.zeros(len(spectrum), dtype=bool)
+        if sigma > 0:
+            flagged[good] = np.abs(values - median) > self.threshold * sigma
+
+        mask = flagged | self._persistentMask(flagged)
+        self._integrations += 1
+        if not mask.any():
+            return integration._replace(masked=0.0, mask=None)
+
+        kept = good & ~mask
+        power = float(spectrum[kept].mean()) if kept.any() else float("nan")
+        masked = float(np.count_nonzero(mask)) / n_bins
+        self._masked_total += masked
+        return integration._replace(power=power, masked=masked, mask=mask)
+
+    def describe(self):
+        """
+        :return: One line description of the masking settings, for the start of a session. (string)
+        """
+        if self.threshold <= 0:
+            return "RFI masking off"
+        return ("RFI masking on: bins more than " + str(self.threshold) + " robust standard deviations from the "
+                + "median are left out of the reported power. Spectra are stored unmasked.")
+
+    def badChannels(self):
+        """
+        :return: Boolean mask of the bins currently masked in every integration. Empty before the first integration.
+                 (np.ndarray)
+        """
+        if self._hits is None:
+            return np.zeros(0, dtype=bool)
+        if self._seen < self.min_seen:
+            return np.zeros(len(self._hits), dtype=bool)
+        return self._hits > self.persist_fraction * self._seen
+
+    def summary(self):
+        """
+        :return: One line summary of the masking over the session. (string)
+        """
+        mean_masked = self._masked_total / self._integrations if self._integrations else 0.0
+        return ("RFI mask: " + str(self._integrations) + " integrations, mean " + "%.2f" % (100 * mean_masked)
+                + "% of bins masked, " + str(int(np.count_nonzero(self.badChannels()))) + " persistent bad bins")
+
+    def _persistentMask(self, flagged):
+        """
+        Add this integration's flags to the per-bin counts and return the persistent mask. The counts start over if
+        the number of bins changes.
+
+        :param flagged: Bins flagged in this integration. (np.ndarray of bool)
+        :return: np.ndarray of bool
+        """
+        if self._hits is None or len(self._hits) != len(flagged):
+            self._hits = np.zeros(len(flagged))
+            self._seen = 0
+        self._hits += flagged
+        self._seen += 1
+        return self.badChannels()
+
+
+def maskedSpectrum(integration):
+    """
+    :param integration: Integration, masked or not.
+    :return: Its spectrum with the bins masked as RFI set to nan. (np.ndarray)
+    """
+    spectrum = np.asarray(integration.spectrum, dtype=np.float64)
+    if integration.mask is None or len(integration.mask) != len(spectrum):
+        return spectrum
+    return np.where(integration.mask, np.nan, spectrum)
+
+
+# Mask used by measSpectrum unless another is given
+DEFAULT_RFI_MASK = RfiMask()
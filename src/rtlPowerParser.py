@@ -0,0 +1,179 @@
+"""
+File: rtlPowerParser.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Parser for rtl_power CSV output for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import datetime
+from collections import namedtuple
+import numpy as np
+
+# rtl_power writes one line per hop: date, time, Hz low, Hz high, Hz step, samples, dB, dB, ...
+N_META_FIELDS = 6
+
+# One hop (one line) of rtl_power output.
+Hop = namedtuple("Hop", ["stamp", "hz_low", "hz_high", "hz_step", "samples", "bins"])
+
+# Any number of hops parsed together. All fields other than bins are 1-D arrays with one entry per hop,
+# bins is a 2-D array (hop x bin). Hops shorter than the longest are padded with nan, n_bins is the real number of
+# bins in each hop.
+Hops = namedtuple("Hops", ["time", "hz_low", "hz_high", "hz_step", "samples", "bins", "n_bins"])
+
+
+def parseLine(line):
+    """
+    Parse one line of rtl_power output.
+
+    :param line: One CSV line, with or without the trailing newline. (bytes)
+    :return: Hop, or None if the line is malformed or incomplete.
+    """
+    fields = line.split(b",")
+    if len(fields) < N_META_FIELDS + 2:
+        return None
+    try:
+        meta = [float(f) for f in fields[2:N_META_FIELDS]]
+        bins = np.array(fields[N_META_FIELDS:], dtype=np.float64)
+    except ValueError:
+        return None
+    return Hop(fields[0].strip() + b" " + fields[1].strip(), meta[0], meta[1], meta[2], int(meta[3]), bins)
+
+
+def parseBuffer(buf):
+    """
+    Parse a block of rtl_power output straight from a pipe or memory buffer. No temporary file is used. A last line
+    without a newline was cut off (rtl_power killed mid-write) and is left out, as are malformed or short lines.
+
+    :param buf: rtl_power CSV output. (bytes)
+    :return: Hops. Empty arrays if the buffer holds no complete line.
+    """
+    lines = buf.splitlines()
+    if lines and not buf.endswith(b"\n"):
+        lines.pop()
+    stamps = []
+    rows = []
+    for line in lines:
+        fields = line.split(b",", 2)
+        if len(fields) < 3 or fields[2].count(b",") < N_META_FIELDS - 1:
+            continue
+        stamps.append(fields[0].strip() + b" " + fields[1].strip())
+        rows.append(fields[2])
+
+    widths = [row.count(b",") + 1 for row in rows]
+    n_cols = max(widths, default=0)
+    values = None
+    if rows and min(widths) == n_cols:
+        # Normal case, every hop has the same number of bins: convert everything in one call.
+        try:
+            values = np.array(b",".join(rows).split(b","), dtype=np.float64).reshape(len(rows), n_cols)
+        except ValueError:
+            pass
+    if values is None:
+        # Ragged or malformed output: convert hop by hop, dropping the hops that do not parse
+        parsed = []
+        for stamp, row, width in zip(stamps, rows, widths):
+            try:
+                parsed.append((stamp, width, np.array(row.split(b","), dtype=np.float64)))
+            except ValueError:
+                continue
+        if not parsed:
+            empty = np.zeros(0)
+            return Hops(empty, empty, empty, empty, empty.astype(np.int64), np.zeros((0, 0)), empty.astype(np.int64))
+        stamps = [stamp for stamp, _, _ in parsed]
+        widths = [width for _, width, _ in parsed]
+        n_cols = max(width for _, width, _ in parsed)
+        values = np.full((len(parsed), n_cols), np.nan)
+        for i, (_, width, row) in enumerate(parsed):
+            values[i, :width] = row
+
+    times = _stampsToUnix(stamps)
+    return Hops(times, values[:, 0], values[:, 1], values[:, 2], values[:, 3].astype(np.int64),
+                values[:, N_META_FIELDS - 2:], np.array(widths, dtype=np.int64) - (N_META_FIELDS - 2))
+
+
+def meanPower(hops):
+    """
+    Mean power over all frequencies and time, computed the same way measPower always has: the mean of each hop
+    with its last bin dropped, then the mean over hops.
+
+    :param hops: Hops from parseBuffer.
+    :return: Mean power (dB). nan if there are no hops.
+    """
+    if len(hops.bins) == 0:
+        return float("nan")
+    return float(np.mean(np.nanmean(_dropLastBin(hops), axis=1)))
+
+
+def sweepSpectrum(hops):
+    """
+    Per-bin spectrum of the hops, ordered by frequency. Hops at the same frequency (repeated sweeps) are averaged and
+    the last bin of each hop is dropped, so the mean of the spectrum equals meanPower for a single sweep.
+
+    :param hops: Hops from parseBuffer.
+    :return: Bin frequencies in Hz and bin power in dB. (np.ndarray, np.ndarray)
+    """
+    if len(hops.bins) == 0:
+        return np.zeros(0), np.zeros(0)
+    lows, first, inverse = np.unique(hops.hz_low, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    bins = _dropLastBin(hops)
+    n_bins = bins.shape[1]
+    sums = np.zeros((len(lows), n_bins))
+    np.add.at(sums, inverse, bins)
+    spectrum = sums / np.bincount(inverse)[:, None]
+    freqs = lows[:, None] + np.arange(n_bins) * hops.hz_step[first][:, None]
+    # Leave out the padding of hops shorter than the longest
+    lengths = np.zeros(len(lows), dtype=np.int64)
+    np.maximum.at(lengths, inverse, hops.n_bins - 1)
+    kept = np.arange(n_bins) < lengths[:, None]
+    return freqs[kept], spectrum[kept]
+
+
+def _dropLastBin(hops):
+    """
+    :param hops: Hops from parseBuffer.
+    :return: Bins of every hop with its last real bin dropped, hops shorter than the longest padded with nan.
+             (np.ndarray)
+    """
+    if np.all(hops.n_bins == hops.bins.shape[1]):
+        return hops.bins[:, :-1]
+    bins = hops.bins[:, :-1].copy()
+    bins[np.arange(bins.shape[1]) >= (hops.n_bins - 1)[:, None]] = np.nan
+    return bins
+
+
+def _stampsToUnix(stamps):
+    """
+    Convert rtl_power date/time stamps to unix time. Hops of one sweep share a stamp, so each unique stamp is only
+    parsed once.
+
+    :param stamps: List of b"YYYY-MM-DD HH:MM:SS" stamps in local time.
+    :return: Unix timestamps. (np.ndarray)
+    """
+    cache = {}
+    times = np.empty(len(stamps))
+    for i, stamp in enumerate(stamps):
+        if stamp not in cache:
+            try:
+                cache[stamp] = datetime.datetime.strptime(stamp.decode(), "%Y-%m-%d %H:%M:%S").timestamp()
+            except ValueError:
+                cache[stamp] = np.nan
+        times[i] = cache[stamp]
+    return times
@@ -0,0 +1,223 @@
+"""
+File: scanPlanner.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Pixel visit orders for imaging scans for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from collections import namedtuple
+import numpy as np
+
+from tracking import estimateMoveTime
+from utilities import Log
+
+# A pixel visit order. pixels is an (N, 2) array of (row, column) in the order they are measured, and move_time the
+# estimated time of every slew of the scan, from the antenna's position to the first pixel onwards, in seconds.
+ScanPlan = namedtuple("ScanPlan", ["name", "pixels", "move_time"])
+
+SCAN_ORDERS = ("spiral", "serpentine", "hilbert", "min_slew")  # Ties go to the first, so a frame starts on the sun
+TWO_OPT_MAX_PASSES = 20  # Improvement passes of minimumSlewOrder over the whole order
+
+
+def planScan(height, width, startAlt, startAz, el_step, az_step, antAlt, antAz, sunAlt, sunAz, orders=SCAN_ORDERS):
+    """
+    Pick the pixel order with the shortest estimated slew time for a frame. The time spent measuring is the same in
+    every order, so only the slews are compared.
+
+    :param height: Image height in pixels. (int)
+    :param width: Image width in pixels. (int)
+    :param startAlt: Altitude of the centre of the first row in degrees. (float)
+    :param startAz: Azimuth of the centre of the first column in degrees. (float)
+    :param el_step: Altitude between pixel centres in degrees. (float)
+    :param az_step: Azimuth between pixel centres in degrees. (float)
+    :param antAlt: Current altitude of the antenna in degrees. (float)
+    :param antAz: Current azimuth of the antenna in degrees. (float)
+    :param sunAlt: Predicted altitude of the sun during the frame in degrees, where spiral starts. (float)
+    :param sunAz: Predicted azimuth of the sun during the frame in degrees. (float)
+    :param orders: Names of the orders to choose from, see SCAN_ORDERS. Default = SCAN_ORDERS (tuple)
+    :return: ScanPlan
+    """
+    pixels = gridPixels(height, width)
+    alt = startAlt + pixels[:, 0] * el_step
+    az = startAz + pixels[:, 1] * az_step
+    centre = ((sunAlt - startAlt) / el_step, (sunAz - startAz) / az_step)
+
+    plans = []
+    for name in orders:
+        if name == "serpentine":
+            # Start from whichever corner is quickest to reach, so a frame starts where the last one ended
+            corner = nearestCorner(height, width, startAlt, startAz, el_step, az_step, antAlt, antAz)
+            order = serpentineOrder(height, width, corner)
+        elif name == "spiral":
+            order = spiralOrder(height, width, centre)
+        elif name == "hilbert":
+            order = hilbertOrder(height, width)
+        elif name == "min_slew":
+            order = minimumSlewOrder(alt, az, antAlt, antAz)
+        else:
+            raise ValueError("Unknown scan order: " + str(name))
+        plans.append(ScanPlan(name, pixels[order], orderMoveTime(alt[order], az[order], antAlt, antAz)))
+
+    best = min(plans, key=lambda plan: plan.move_time)
+    Log.info("Scan order slew times: " + ", ".join(f"{plan.name} {plan.move_time:.1f}s" for plan in plans)
+             + ". Using " + best.name)
+    return best
+
+
+def gridPixels(height, width):
+    """
+    :return: (row, column) of every pixel of a frame, row by row. (np.ndarray)
+    """
+    rows, cols = np.divmod(np.arange(height * width), width)
+    return np.column_stack([rows, cols])
+
+
+def orderMoveTime(alt, az, antAlt, antAz):
+    """
+    :param alt: Altitude of every pixel in visit order in degrees. (np.ndarray)
+    :param az: Azimuth of every pixel in visit order in degrees. (np.ndarray)
+    :param antAlt: Altitude of the antenna before the first pixel in degrees. (float)
+    :param antAz: Azimuth of the antenna before the first pixel in degrees. (float)
+    :return: Estimated time of all the slews in seconds. (float)
+    """
+    return float(np.sum(estimateMoveTime(np.diff(alt, prepend=antAlt), np.diff(az, prepend=antAz))))
+
+
+def serpentineOrder(height, width, corner=(0, 0)):
+    """
+    Row by row from a corner, alternating direction every row.
+
+    :param height: Image height in pixels. (int)
+    :param width: Image width in pixels. (int)
+    :param corner: (row, column) of the corner pixel to start from. Default = (0, 0) (tuple)
+    :return: Indexes into gridPixels(height, width) in visit order. (np.ndarray)
+    """
+    index = np.arange(height * width).reshape(height, width)
+    if corner[0] != 0:
+        index = index[::-1]
+    if corner[1] != 0:
+        index = index[:, ::-1]
+    index[1::2] = index[1::2, ::-1]
+    return index.ravel()
+
+
+def nearestCorner(height, width, startAlt, startAz, el_step, az_step, antAlt, antAz):
+    """
+    :return: (row, column) of the corner pixel of a frame the antenna can slew to quickest. (tuple)
+    """
+    corners = [(0, 0), (0, width - 1), (height - 1, 0), (height - 1, width - 1)]
+    times = [estimateMoveTime(startAlt + row * el_step - antAlt, startAz + col * az_step - antAz)
+             for row, col in corners]
+    return corners[int(np.argmin(times))]
+
+
+def spiralOrder(height, width, centre):
+    """
+    Outward from the pixel nearest centre, ring by ring. Each ring (pixels the same number of rows or columns away)
+    is walked around in angle, and rings cut by the edges of the frame are skipped where they leave it. A frame cut
+    short still has the pixels nearest the centre.
+
+    :param height: Image height in pixels. (int)
+    :param width: Image width in pixels. (int)
+    :param centre: (row, column) to start from, fractional and possibly outside the frame. (tuple)
+    :return: Indexes into gridPixels(height, width) in visit order. (np.ndarray)
+    """
+    pixels = gridPixels(height, width)
+    ci = min(max(int(round(centre[0])), 0), height - 1)
+    cj = min(max(int(round(centre[1])), 0), width - 1)
+    di = pixels[:, 0] - ci
+    dj = pixels[:, 1] - cj
+    ring = np.maximum(np.abs(di), np.abs(dj))
+    angle = np.mod(np.arctan2(di, dj), 2 * np.pi)
+    return np.lexsort((angle, ring))
+
+
+def hilbertOrder(height, width):
+    """
+    Along a Hilbert curve over the smallest power of two square covering the frame, skipping the part outside it.
+    Every slew inside the square is a single pixel.
+
+    :return: Indexes into gridPixels(height, width) in visit order. (np.ndarray)
+    """
+    n = 1
+    while n < max(height, width):
+        n *= 2
+    pixels = gridPixels(height, width)
+    x = pixels[:, 1].copy()
+    y = pixels[:, 0].copy()
+    d = np.zeros(len(pixels), dtype=np.int64)
+    s = n // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve inside it has the standard orientation
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s //= 2
+    return np.argsort(d, kind="stable")
+
+
+def minimumSlewOrder(alt, az, antAlt, antAz):
+    """
+    Short slew order through any set of pixels, starting from the antenna: nearest neighbour by estimated move time,
+    improved by 2-opt (reversing any stretch of the order that makes it faster) until no reversal helps.
+
+    :param alt: Altitude of every pixel in degrees. (np.ndarray)
+    :param az: Azimuth of every pixel in degrees. (np.ndarray)
+    :param antAlt: Current altitude of the antenna in degrees. (float)
+    :param antAz: Current azimuth of the antenna in degrees. (float)
+    :return: Indexes into alt/az in visit order. (np.ndarray)
+    """
+    # Node 0 is the antenna, node k the pixel k - 1
+    nodeAlt = np.concatenate(([antAlt], np.asarray(alt, dtype=np.float64)))
+    nodeAz = np.concatenate(([antAz], np.asarray(az, dtype=np.float64)))
+    n = len(nodeAlt)
+    cost = estimateMoveTime(nodeAlt[:, None] - nodeAlt[None, :], nodeAz[:, None] - nodeAz[None, :])
+
+    path = [0]
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    for _ in range(n - 1):
+        nearest = int(np.argmin(np.where(visited, np.inf, cost[path[-1]])))
+        path.append(nearest)
+        visited[nearest] = True
+    path = np.array(path)
+
+    # 2-opt on an open path with a fixed start. Reversing path[i + 1..j] swaps edges (a, b) and (c, d) for (a, c) and
+    # (b, d), where d does not exist when j is the end of the path.
+    for _ in range(TWO_OPT_MAX_PASSES):
+        improved = False
+        for i in range(n - 2):
+            a, b = path[i], path[i + 1]
+            c = path[i + 2:]
+            d = np.append(path[i + 3:], -1)
+            old = cost[a, b] + np.where(d >= 0, cost[c, d], 0)
+            new = cost[a, c] + np.where(d >= 0, cost[b, d], 0)
+            gain = old - new
+            j = int(np.argmax(gain))
+            if gain[j] > 1e-9:
+                path[i + 1:i + 3 + j] = path[i + 1:i + 3 + j][::-1]
+                improved = True
+        if not improved:
+            break
+    return path[1:] - 1
@@ -0,0 +1,145 @@
+"""
+File: sdrRecovery.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Automatic SDR fault recovery for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import subprocess as sp
+import clock
+import numpy as np
+
+from utilities import Log
+
+RESET_COMMAND = "./resetusb"  # Resets the RTL-SDR USB device
+
+
+class SdrError(Exception):
+    """
+    A failed measurement. reason is one of "timeout", "error" or "nan".
+    """
+
+    def __init__(self, reason, msg=""):
+        Exception.__init__(self, reason + ": " + msg)
+        self.reason = reason
+
+
+class SdrRecovery:
+    """
+    Retry failed SDR measurements without stopping the observation.
+
+    A measurement that hangs, errors or gives nan is retried after resetting the USB device and restarting the
+    stream (if any), waiting an exponentially growing delay between attempts. When the retries run out the pixel is
+    flagged with a nan power instead of blocking on user input or exiting. Every recovery is counted and logged.
+    """
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=8, reset_command=RESET_COMMAND, reset_timeout=5):
+        """
+        :param max_retries: Number of retries after the first failed attempt. Default = 3 (int)
+        :param base_delay: Delay before the first retry in seconds, doubled for every following retry. (float)
+        :param max_delay: Longest delay between retries in seconds. (float)
+        :param reset_command: Command that resets the SDR USB device. None to skip the reset. (string)
+        :param reset_timeout: Seconds to allow the reset command. (float)
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.reset_command = reset_command
+        self.reset_timeout = reset_timeout
+        self.counts = {"timeout": 0, "error": 0, "nan": 0, "reset": 0, "recovered": 0, "skipped": 0}
+
+    def run(self, measure, restart=None, failed=None):
+        """
+        Run a measurement, recovering from failures.
+
+        :param measure: Function taking no arguments that returns an Integration or raises SdrError.
+        :param restart: Function restarting the acquisition stream after a USB reset. Default = None
+        :param failed: Function returning the flagged result to use if every attempt fails. Default = None
+        :return: Result of measure, or of failed if all attempts failed.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                if attempt > 0 and restart is not None:
+                    self._restart(restart)
+                result = measure()
+                if np.isnan(result.power):
+                    raise SdrError("nan", "measurement returned nan power")
+                if attempt > 0:
+                    self.counts["recovered"] += 1
+                    Log.warn("SDR recovered after " + str(attempt) + " retries. Recovery counts: " + str(self.counts))
+                return result
+            except SdrError as e:
+                self.counts[e.reason] += 1
+                Log.error("SDR measurement failed (attempt " + str(attempt + 1) + "/" + str(self.max_retries + 1)
+                          + "): " + str(e))
+
+            if attempt < self.max_retries:
+                self.resetUsb()
+                delay = min(self.base_delay * 2 ** attempt, self.max_delay)
+                Log.info("Retrying SDR measurement in " + str(delay) + " s")
+                clock.sleep(delay)
+
+        self.counts["skipped"] += 1
+        Log.error("SDR measurement failed " + str(self.max_retries + 1) + " times. Flagging pixel and continuing. "
+                  + "Recovery counts: " + str(self.counts))
+        return failed() if failed is not None else None
+
+    @staticmethod
+    def _restart(restart):
+        """
+        Restart the acquisition stream.
+
+        :param restart: Function restarting the stream.
+        :return: None
+        :raises SdrError: if the stream process cannot be started.
+        """
+        try:
+            restart()
+        except OSError as e:
+            raise SdrError("error", "could not restart the stream: " + str(e))
+
+    def resetUsb(self):
+        """
+        Reset the SDR USB device with the reset command. Failures are logged but never raised.
+
+        :return: None
+        """
+        if self.reset_command is None:
+            return
+        self.counts["reset"] += 1
+        if not os.path.exists(self.reset_command.split()[0]):
+            Log.warn("USB reset command " + self.reset_command + " not found, skipping reset")
+            return
+        Log.warn("Resetting SDR USB device")
+        try:
+            sp.run(self.reset_command.split(), capture_output=True, timeout=self.reset_timeout)
+        except (sp.TimeoutExpired, OSError) as e:
+            Log.error("USB reset failed: " + str(e))
+
+    def summary(self):
+        """
+        :return: One line summary of the recovery counts. (string)
+        """
+        return "SDR recovery counts: " + ", ".join(k + "=" + str(v) for k, v in self.counts.items())
+
+
+# Recovery used by measSpectrum unless another is given
+DEFAULT_RECOVERY = SdrRecovery()
@@ -0,0 +1,128 @@
+"""
+File: simulatedSdr.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Simulated SDR power measurements of the sun for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import numpy as np
+
+import clock
+from powerStream import Integration
+from solarPosition import sunPosition
+from utilities import Log, parseAngle, parseFrequency, parseInterval
+
+BEAM_SAMPLES = 5  # Antenna positions the beam is averaged over in each integration
+
+
+class SimulatedPowerStream:
+    """
+    Stand-in for PowerStream without an SDR. Each integration takes its interval on the session clock and measures a
+    sky of sky_db with the sun sun_db above it, seen through a Gaussian beam centred on the antenna, plus noise in
+    every bin. The beam is averaged over where the antenna was during the integration, so scans smear like they would
+    on the mount. Run on the virtual clock (see clock.useVirtualClock) a session replays as fast as the code runs.
+    """
+
+    def __init__(self, freq_min, freq_max, integration_interval, lat, lon, pointing, source="noaa", n_bins=64,
+                 sky_db=0.0, sun_db=10.0, beam_fwhm=5.0, bin_noise_db=0.5, seed=0):
+        """
+        :param freq_min: Minimum frequency. Ex. 1400M (string)
+        :param freq_max: Maximum frequency. Ex. 1420M (string)
+        :param integration_interval: Integration interval. Ex. 1s (string)
+        :param lat: Latitude. Ex. +44d13m29s (string)
+        :param lon: Longitude. Ex. -76d29m52s (string)
+        :param pointing: Function of session clock times (np.ndarray) returning the antenna altitude and azimuth in
+                         degrees at each of them, like tracking.antennaPosition(offsetAlt, offsetAz, t).
+        :param source: Sun position source, "noaa" or "astropy". Default = noaa (string)
+        :param n_bins: Spectrum bins. (int)
+        :param sky_db: Power off the sun (dB). (float)
+        :param sun_db: Power of the sun above the sky at the beam centre (dB). (float)
+        :param beam_fwhm: Beam full width at half maximum in degrees. (float)
+        :param bin_noise_db: Standard deviation of the noise in each bin (dB). (float)
+        :param seed: Random seed, so simulated sessions repeat exactly. (int)
+        """
+        self.interval_sec = parseInterval(integration_interval)
+        self.freqs = np.linspace(parseFrequency(freq_min), parseFrequency(freq_max), n_bins, endpoint=False)
+        self.lat = parseAngle(lat)
+        self.lon = parseAngle(lon)
+        self.pointing = pointing
+        self.source = source
+        self.sky_db = sky_db
+        self.sun_db = sun_db
+        self.beam_fwhm = beam_fwhm
+        self.bin_noise_db = bin_noise_db
+        self._rng = np.random.default_rng(seed)
+
+    def start(self):
+        Log.info("Simulated SDR started")
+        return self
+
+    def stop(self):
+        pass
+
+    def restart(self):
+        pass
+
+    def isAlive(self):
+        return True
+
+    def getIntegrationAfter(self, t, timeout=None):
+        """
+        Integrate from t (or now, if later) for one interval, waiting on the session clock until it is done.
+
+        :param t: Unix time the integration must start at or after. (float)
+        :param timeout: Unused, simulated integrations always arrive.
+        :return: Integration
+        """
+        start_time = max(t, clock.unixTime())
+        end_time = start_time + self.interval_sec
+        clock.sleep(end_time - clock.unixTime())
+
+        # Sample times at the middle of BEAM_SAMPLES equal slices of the integration
+        times = start_time + (np.arange(BEAM_SAMPLES) + 0.5) * self.interval_sec / BEAM_SAMPLES
+        antAlt, antAz = self.pointing(times)
+        sunAlt, sunAz = sunPosition((start_time + end_time) / 2, self.lat, self.lon, source=self.source)
+        gain = float(np.mean(self.beam(separation(antAlt, antAz, float(sunAlt), float(sunAz)))))
+        power_db = self.sky_db + 10 * np.log10(1 + (10 ** (self.sun_db / 10) - 1) * gain)
+        spectrum = power_db + self._rng.normal(0, self.bin_noise_db, len(self.freqs))
+        return Integration(start_time, end_time, float(np.mean(spectrum)), self.freqs.copy(), spectrum)
+
+    def beam(self, offset):
+        """
+        :param offset: Angle from the beam centre in degrees. (float or np.ndarray)
+        :return: Gain relative to the beam centre. (float or np.ndarray)
+        """
+        return np.exp(-4 * np.log(2) * (np.asarray(offset) / self.beam_fwhm) ** 2)[()]
+
+
+def separation(alt1, az1, alt2, az2):
+    """
+    Angle between two directions.
+
+    :param alt1: Altitude of the first direction in degrees. (float or np.ndarray)
+    :param az1: Azimuth of the first direction in degrees. (float or np.ndarray)
+    :param alt2: Altitude of the second direction in degrees. (float or np.ndarray)
+    :param az2: Azimuth of the second direction in degrees. (float or np.ndarray)
+    :return: Angle in degrees. (float or np.ndarray)
+    """
+    alt1, az1, alt2, az2 = (np.radians(np.asarray(a, dtype=float)) for a in (alt1, az1, alt2, az2))
+    cos_sep = np.sin(alt1) * np.sin(alt2) + np.cos(alt1) * np.cos(alt2) * np.cos(az1 - az2)
+    return np.degrees(np.arccos(np.clip(cos_sep, -1, 1)))[()]
@@ -0,0 +1,123 @@
+"""
+File: solarPosition.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Analytic sun position for the Solar Eclipse Viewer project for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+SOURCES = ("noaa", "astropy")  # Sun position sources, noaa is the default
+
+
+def sunPositionNoaa(times, lat, lon, refraction=False):
+    """
+    Sun altitude and azimuth from the NOAA solar position algorithm (Meeus), vectorized over time. Accurate to about
+    0.01 degrees between 1800 and 2100, far inside the antenna beam, and needs nothing but numpy.
+
+    :param times: Unix times. (float or np.ndarray)
+    :param lat: Latitude in degrees, north positive. (float)
+    :param lon: Longitude in degrees, east positive. (float)
+    :param refraction: Add NOAA's atmospheric refraction estimate to the altitude. Default = False, matching astropy
+                       AltAz without pressure. (bool)
+    :return: Sun altitude and azimuth (from north through east) in degrees. (np.ndarray, np.ndarray)
+    """
+    times = np.asarray(times, dtype=np.float64)
+    jc = (times / 86400 + 2440587.5 - 2451545) / 36525  # Julian centuries since J2000
+
+    geom_mean_long = np.mod(280.46646 + jc * (36000.76983 + jc * 0.0003032), 360)
+    geom_mean_anom = np.radians(357.52911 + jc * (35999.05029 - 0.0001537 * jc))
+    eccent = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+    eq_of_ctr = (np.sin(geom_mean_anom) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+                 + np.sin(2 * geom_mean_anom) * (0.019993 - 0.000101 * jc)
+                 + np.sin(3 * geom_mean_anom) * 0.000289)
+    omega = np.radians(125.04 - 1934.136 * jc)
+    app_long = np.radians(geom_mean_long + eq_of_ctr - 0.00569 - 0.00478 * np.sin(omega))
+    obliq = np.radians(23 + (26 + (21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))) / 60) / 60
+                       + 0.00256 * np.cos(omega))
+    decl = np.arcsin(np.sin(obliq) * np.sin(app_long))
+
+    # Equation of time in minutes
+    l0 = np.radians(geom_mean_long)
+    y = np.tan(obliq / 2) ** 2
+    eq_of_time = 4 * np.degrees(y * np.sin(2 * l0) - 2 * eccent * np.sin(geom_mean_anom)
+                                + 4 * eccent * y * np.sin(geom_mean_anom) * np.cos(2 * l0)
+                                - 0.5 * y * y * np.sin(4 * l0) - 1.25 * eccent * eccent * np.sin(2 * geom_mean_anom))
+
+    true_solar_time = np.mod(np.mod(times, 86400) / 60 + eq_of_time + 4 * lon, 1440)
+    hour_angle = np.radians(true_solar_time / 4 - 180)
+
+    lat_rad = np.radians(lat)
+    cos_zenith = np.sin(lat_rad) * np.sin(decl) + np.cos(lat_rad) * np.cos(decl) * np.cos(hour_angle)
+    alt = 90 - np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+    az = np.mod(np.degrees(np.arctan2(np.sin(hour_angle),
+                                      np.cos(hour_angle) * np.sin(lat_rad) - np.tan(decl) * np.cos(lat_rad))) + 180,
+                360)
+
+    if refraction:
+        alt = alt + _refraction(alt)
+    return alt, az
+
+
+def sunPositionAstropy(times, lat, lon):
+    """
+    Sun altitude and azimuth from astropy, the high precision source. astropy is only imported when this is called.
+
+    :param times: Unix times. (float or np.ndarray)
+    :param lat: Latitude in degrees, north positive. (float)
+    :param lon: Longitude in degrees, east positive. (float)
+    :return: Sun altitude and azimuth in degrees. (np.ndarray, np.ndarray)
+    """
+    from astropy.time import Time
+    from astropy.coordinates import get_sun, AltAz, EarthLocation
+    import astropy.units as u
+
+    obstime = Time(np.asarray(times, dtype=np.float64), format="unix")
+    location = EarthLocation(lat=lat * u.deg, lon=lon * u.deg)
+    relSunPos = get_sun(obstime).transform_to(AltAz(obstime=obstime, location=location))
+    return np.asarray(relSunPos.alt.deg), np.asarray(relSunPos.az.deg)
+
+
+def sunPosition(times, lat, lon, source="noaa"):
+    """
+    Sun altitude and azimuth from the chosen source.
+
+    :param times: Unix times. (float or np.ndarray)
+    :param lat: Latitude in degrees. (float)
+    :param lon: Longitude in degrees. (float)
+    :param source: "noaa" or "astropy". Default = noaa (string)
+    :return: Sun altitude and azimuth in degrees. (np.ndarray, np.ndarray)
+    """
+    if source == "noaa":
+        return sunPositionNoaa(times, lat, lon)
+    if source == "astropy":
+        return sunPositionAstropy(times, lat, lon)
+    raise ValueError("Unknown sun position source: " + str(source))
+
+
+def _refraction(alt):
+    """
+    NOAA's approximate atmospheric refraction in degrees for an apparent altitude in degrees.
+    """
+    tan_alt = np.tan(np.radians(alt))
+    arcsec = np.where(alt > 5, 58.1 / tan_alt - 0.07 / tan_alt ** 3 + 0.000086 / tan_alt ** 5,
+                      np.where(alt > -0.575,
+                               1735 + alt * (-518.2 + alt * (103.4 + alt * (-12.79 + alt * 0.711))),
+                               -20.772 / tan_alt))
+    return np.where(alt > 85, 0, arcsec / 3600)
@@ -0,0 +1,155 @@
+"""
+File: spectrumStore.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Append-only on-disk store of per-bin spectra for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import numpy as np
+
+from utilities import Log
+
+# A store is three files in one directory (normally the Log/<timestamp> run directory):
+#   spectra_freqs.npy  frequency axis (Hz), written once
+#   spectra.f32        waterfall, one row of little-endian float32 dB values per integration, as measured (RFI is
+#                      not masked out)
+#   spectra_index.bin  one INDEX_DTYPE record per row. power is the reported power, which leaves out the bins masked
+#                      as RFI, and masked is the fraction of bins that were masked
+SPECTRA_FILE = "spectra.f32"
+INDEX_FILE = "spectra_index.bin"
+FREQ_FILE = "spectra_freqs.npy"
+
+SPECTRUM_DTYPE = np.dtype("<f4")
+INDEX_DTYPE = np.dtype([("time", "<f8"), ("az", "<f4"), ("alt", "<f4"), ("power", "<f4"), ("masked", "<f4")])
+
+
+class SpectrumStore:
+    """
+    Append-only waterfall of every integration's per-bin spectrum.
+
+    Rows are collected in a fixed size chunk and written to the end of the files when the chunk fills, so RAM use is
+    bounded by chunk_rows no matter how long the session is, and existing data is never rewritten. Read it back with
+    loadSpectra.
+    """
+
+    def __init__(self, dirPath, chunk_rows=64):
+        """
+        Open (or continue) the store in a directory.
+
+        :param dirPath: Directory to write the store files to. (string)
+        :param chunk_rows: Number of rows buffered in RAM between writes. Default = 64 (int)
+        """
+        self.dirPath = dirPath
+        self.chunk_rows = chunk_rows
+        self.freqs = None
+        self._spectra = None
+        self._index = np.zeros(chunk_rows, dtype=INDEX_DTYPE)
+        self._n = 0
+
+        freq_path = os.path.join(dirPath, FREQ_FILE)
+        if os.path.exists(freq_path):
+            self._setFreqs(np.load(freq_path))
+
+    def append(self, integration, az, alt):
+        """
+        Add one integration to the store.
+
+        :param integration: Integration from measSpectrum or a power stream.
+        :param az: Antenna azimuth during the integration in degrees. (float)
+        :param alt: Antenna altitude during the integration in degrees. (float)
+        :return: None
+        """
+        if self.freqs is None:
+            if len(integration.freqs) == 0:
+                return
+            np.save(os.path.join(self.dirPath, FREQ_FILE), np.asarray(integration.freqs, dtype=np.float64))
+            self._setFreqs(np.asarray(integration.freqs, dtype=np.float64))
+            Log.info("Created spectrum store in " + self.dirPath + " with " + str(len(self.freqs)) + " bins")
+
+        if len(integration.spectrum) == len(self.freqs):
+            self._spectra[self._n] = integration.spectrum
+        else:
+            if len(integration.spectrum) != 0:
+                Log.warn("Spectrum has " + str(len(integration.spectrum)) + " bins, store has " + str(len(self.freqs))
+                         + ". Storing nan.")
+            self._spectra[self._n] = np.nan
+        self._index[self._n] = (integration.start_time, az, alt, integration.power, integration.masked)
+        self._n += 1
+
+        if self._n == self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """
+        Append the buffered rows to the files. The waterfall and index are always written together so their row
+        counts match.
+
+        :return: None
+        """
+        if self._n == 0:
+            return
+        with open(os.path.join(self.dirPath, SPECTRA_FILE), "ab") as f:
+            f.write(self._spectra[:self._n].tobytes())
+        with open(os.path.join(self.dirPath, INDEX_FILE), "ab") as f:
+            f.write(self._index[:self._n].tobytes())
+        self._n = 0
+
+    def close(self):
+        """
+        Flush any buffered rows.
+
+        :return: None
+        """
+        self.flush()
+
+    def _setFreqs(self, freqs):
+        self.freqs = freqs
+        self._spectra = np.zeros((self.chunk_rows, len(freqs)), dtype=SPECTRUM_DTYPE)
+
+
+def loadSpectra(dirPath):
+    """
+    Open a spectrum store for reading without copying it into RAM.
+
+    :param dirPath: Directory holding the store files. (string)
+    :return: index (np.memmap of INDEX_DTYPE records), spectra (np.memmap, rows x bins, dB) and freqs (np.ndarray, Hz).
+             Empty arrays if nothing has been stored.
+    """
+    freq_path = os.path.join(dirPath, FREQ_FILE)
+    if not os.path.exists(freq_path):
+        return np.zeros(0, dtype=INDEX_DTYPE), np.zeros((0, 0), dtype=SPECTRUM_DTYPE), np.zeros(0)
+    freqs = np.load(freq_path)
+
+    spectra_path = os.path.join(dirPath, SPECTRA_FILE)
+    index_path = os.path.join(dirPath, INDEX_FILE)
+    # A run that was cut off mid-write can leave the files with different row counts, only use complete rows.
+    n_rows = min(_fileSize(spectra_path) // (len(freqs) * SPECTRUM_DTYPE.itemsize),
+                 _fileSize(index_path) // INDEX_DTYPE.itemsize)
+    if n_rows == 0:
+        return np.zeros(0, dtype=INDEX_DTYPE), np.zeros((0, len(freqs)), dtype=SPECTRUM_DTYPE), freqs
+
+    index = np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", shape=(n_rows,))
+    spectra = np.memmap(spectra_path, dtype=SPECTRUM_DTYPE, mode="r", shape=(n_rows, len(freqs)))
+    return index, spectra, freqs
+
+
+def _fileSize(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
@@ -0,0 +1,467 @@
+"""
+File: stepperBackend.py
+Author: Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+Date: 2026-10-18
+Description: Step pulse waveforms and the backends that play them out for the Solar Eclipse Viewer project
+for ENPH454 @ Queen's University, Kingston ON.
+
+
+Copyright (C) 2023  Will Conway, Devynn Garrow, Ben Graham, Jessica Guetre, Nathan Ingram
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+
+import clock
+from utilities import Log
+
+# A whole move as step pulses. pulses maps each step pin (BOARD numbering) to the rising edge times of its pulses in
+# seconds from the start of the move, every pulse is high for high_time, and the move ends at duration.
+Waveform = namedtuple("Waveform", ["pulses", "high_time", "duration"])
+
+BACKENDS = ("gpio", "pigpio", "sim")
+
+# pigpio uses Broadcom numbering, tracking uses physical BOARD pin numbers
+BOARD_TO_BCM = {3: 2, 5: 3, 7: 4, 8: 14, 10: 15, 11: 17, 12: 18, 13: 27, 15: 22, 16: 23, 18: 24, 19: 10, 21: 9, 22: 25,
+                23: 11, 24: 8, 26: 7, 29: 5, 31: 6, 32: 12, 33: 13, 35: 19, 36: 16, 37: 26, 38: 20, 40: 21}
+PIGPIO_MAX_PULSES = 4000  # Edges sent to the pigpio daemon per waveform, well under its limit
+
+
+def compileWaveform(profile, pin_alt, pin_az, high_time):
+    """
+    Turn a planned move into step pulse times per pin.
+
+    :param profile: MoveProfile from motionProfile.planMove.
+    :param pin_alt: Altitude step pin. (int)
+    :param pin_az: Azimuth step pin. (int)
+    :param high_time: Seconds each pulse is held high. (float)
+    :return: Waveform
+    """
+    pulses = {}
+    for pin, steps in ((pin_alt, profile.pulse_alt), (pin_az, profile.pulse_az)):
+        if np.any(steps):
+            pulses[pin] = profile.tick_times[steps == 1]
+    return Waveform(pulses, high_time, profile.duration)
+
+
+def waveformEdges(waveform):
+    """
+    Every level change of a waveform in time order, with pins that change at the same time grouped together.
+
+    :param waveform: Waveform
+    :return: List of (time in seconds from the start of the move, level 0/1, list of pins).
+    """
+    if not waveform.pulses:
+        return []
+    times = []
+    pins = []
+    levels = []
+    for pin, rising in waveform.pulses.items():
+        times += [rising, rising + waveform.high_time]
+        pins += [np.full(2 * len(rising), pin)]
+        levels += [np.ones(len(rising), dtype=int), np.zeros(len(rising), dtype=int)]
+    times = np.concatenate(times)
+    pins = np.concatenate(pins)
+    levels = np.concatenate(levels)
+    order = np.lexsort((levels, times))
+    times, pins, levels = times[order], pins[order], levels[order]
+
+    # A new group starts wherever the time or level changes
+    starts = np.flatnonzero(np.r_[True, (np.diff(times) != 0) | (np.diff(levels) != 0)])
+    ends = np.r_[starts[1:], len(times)]
+    return [(float(times[s]), int(levels[s]), pins[s:e].tolist()) for s, e in zip(starts, ends)]
+
+
+class StepperBackend:
+    """
+    Output backend for the mount. Direction pins and limit switches are set and read directly, while step pulses
+    are handed over a whole move at a time with play(), which returns straight away. wait() blocks until the move
+    has been played out, so the calling thread is free in between.
+    """
+
+    def setup(self, outputs, inputs):
+        """
+        :param outputs: Output pins (BOARD numbering). (list of int)
+        :param inputs: Input pins (BOARD numbering). (list of int)
+        :return: None
+        """
+        raise NotImplementedError
+
+    def output(self, pin, level):
+        raise NotImplementedError
+
+    def input(self, pin):
+        raise NotImplementedError
+
+    def play(self, waveform):
+        """
+        Start playing a waveform. Waits for any move still playing first.
+
+        :param waveform: Waveform
+        :return: None
+        """
+        raise NotImplementedError
+
+    def wait(self):
+        """
+        Block until the current move has finished.
+
+        :return: None
+        """
+        raise NotImplementedError
+
+    def watch(self, pin, callback):
+        """
+        Call callback(pin) from a background thread whenever an input pin goes high.
+
+        :param pin: Input pin. (int)
+        :param callback: function
+        :return: None
+        """
+        raise NotImplementedError
+
+    def unwatch(self, pin):
+        raise NotImplementedError
+
+    def mute(self, pin):
+        """
+        Stop pulsing a step pin for the rest of the current move, so one axis can stop on a limit switch while the
+        other carries on. The move ends early once all its step pins are muted. Safe to call from a watch callback.
+
+        :param pin: Step pin. (int)
+        :return: None
+        """
+        raise NotImplementedError
+
+    def stepsPlayed(self, pin):
+        """
+        :param pin: Step pin. (int)
+        :return: Pulses sent on a step pin by the last move, up to where it was muted. (int)
+        """
+        return self._played.get(pin, 0)
+
+    def cleanup(self):
+        pass
+
+
+class GpioBackend(StepperBackend):
+    """
+    RPi.GPIO backend. Moves are played by a thread that sets the pins against deadlines from the start of the move,
+    so timing jitter does not accumulate.
+    """
+
+    def __init__(self):
+        import RPi.GPIO
+        self.GPIO = RPi.GPIO
+        self._thread = None
+        self._muted = set()
+        self._played = {}
+
+    def setup(self, outputs, inputs):
+        self.GPIO.setmode(self.GPIO.BOARD)
+        for pin in outputs:
+            self.GPIO.setup(pin, self.GPIO.OUT)
+        for pin in inputs:
+            self.GPIO.setup(pin, self.GPIO.IN)
+
+    def output(self, pin, level):
+        self.GPIO.output(pin, level)
+
+    def input(self, pin):
+        return self.GPIO.input(pin)
+
+    def play(self, waveform):
+        self.wait()
+        self._muted = set()
+        self._played = dict.fromkeys(waveform.pulses, 0)
+        self._thread = threading.Thread(target=self._playLoop, args=(waveformEdges(waveform), waveform.duration),
+                                        daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def watch(self, pin, callback):
+        self.GPIO.add_event_detect(pin, self.GPIO.RISING, callback=callback)
+
+    def unwatch(self, pin):
+        self.GPIO.remove_event_detect(pin)
+
+    def mute(self, pin):
+        self._muted.add(pin)
+
+    def cleanup(self):
+        self.wait()
+        self.GPIO.cleanup()
+
+    def _playLoop(self, edges, duration):
+        start = time.perf_counter()
+        for t, level, pins in edges:
+            if self._muted.issuperset(self._played):
+                # Every axis has stopped, leave the step pins low and end the move here
+                self.GPIO.output(list(self._played), 0)
+                return
+            if level == 1:
+                pins = [pin for pin in pins if pin not in self._muted]
+            _sleepUntil(start + t)
+            self.GPIO.output(pins, level)
+            if level == 1:
+                for pin in pins:
+                    self._played[pin] += 1
+        _sleepUntil(start + duration)
+
+
+class PigpioBackend(StepperBackend):
+    """
+    pigpio backend. Each move is sent to the pigpio daemon as DMA timed waveforms, so pulse timing is exact and does
+    not depend on the Python process at all. Needs the pigpiod daemon running.
+    """
+
+    def __init__(self):
+        import pigpio
+        self.pigpio = pigpio
+        self.pi = pigpio.pi()
+        if not self.pi.connected:
+            raise RuntimeError("could not connect to the pigpio daemon")
+        self._thread = None
+        self._callbacks = {}
+        self._muted = set()
+        self._played = {}
+        self._interrupted = False
+
+    def setup(self, outputs, inputs):
+        for pin in outputs:
+            self.pi.set_mode(BOARD_TO_BCM[pin], self.pigpio.OUTPUT)
+        for pin in inputs:
+            self.pi.set_mode(BOARD_TO_BCM[pin], self.pigpio.INPUT)
+
+    def output(self, pin, level):
+        self.pi.write(BOARD_TO_BCM[pin], level)
+
+    def input(self, pin):
+        return self.pi.read(BOARD_TO_BCM[pin])
+
+    def play(self, waveform):
+        self.wait()
+        self._muted = set()
+        self._played = dict.fromkeys(waveform.pulses, 0)
+        self._thread = threading.Thread(target=self._sendLoop, args=(waveformEdges(waveform), waveform.duration),
+                                        daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def watch(self, pin, callback):
+        self._callbacks[pin] = self.pi.callback(BOARD_TO_BCM[pin], self.pigpio.RISING_EDGE,
+                                                lambda gpio, level, tick: callback(pin))
+
+    def unwatch(self, pin):
+        self._callbacks.pop(pin).cancel()
+
+    def mute(self, pin):
+        # The waveform on the daemon cannot be edited, so it is stopped and the rest resent without the pin
+        self._muted.add(pin)
+        self._interrupted = True
+        self.pi.wave_tx_stop()
+
+    def cleanup(self):
+        self.wait()
+        for pin in list(self._callbacks):
+            self.unwatch(pin)
+        self.pi.stop()
+
+    def _pulses(self, edges, duration):
+        """
+        :param edges: Edges from waveformEdges, timed from the first one.
+        :param duration: Time from the first edge to the end of the waveform. (float)
+        :return: List of pigpio pulses, each setting some pins and then delaying until the next edge.
+        """
+        pulses = []
+        for k, (t, level, pins) in enumerate(edges):
+            mask = 0
+            for pin in pins:
+                mask |= 1 << BOARD_TO_BCM[pin]
+            t_next = edges[k + 1][0] if k + 1 < len(edges) else duration
+            delay = max(int(round(1e6 * (t_next - t))), 1)
+            pulses.append(self.pigpio.pulse(mask if level else 0, 0 if level else mask, delay))
+        return pulses
+
+    def _sendLoop(self, edges, duration):
+        # Long moves are split into several waveforms, sent one after another. A waveform stopped by mute is resumed
+        # from the first edge it had not reached.
+        k = 0
+        while k < len(edges) and not self._muted.issuperset(self._played):
+            chunk = edges[k:k + PIGPIO_MAX_PULSES]
+            t0 = chunk[0][0]
+            end = edges[k + len(chunk)][0] if k + len(chunk) < len(edges) else duration
+            chunk = [(t - t0, level, [pin for pin in pins if level == 0 or pin not in self._muted])
+                     for t, level, pins in chunk]
+            self._interrupted = False
+            self.pi.wave_clear()
+            self.pi.wave_add_generic(self._pulses(chunk, end - t0))
+            wave_id = self.pi.wave_create()
+            start = time.perf_counter()
+            self.pi.wave_send_once(wave_id)
+            while self.pi.wave_tx_busy():
+                time.sleep(0.002)
+            self.pi.wave_delete(wave_id)
+            if self._interrupted:
+                elapsed = time.perf_counter() - start
+                chunk = [edge for edge in chunk if edge[0] < elapsed]
+            for t, level, pins in chunk:
+                if level == 1:
+                    for pin in pins:
+                        self._played[pin] += 1
+            k += max(len(chunk), 1)
+        for pin in self._played:
+            self.pi.write(BOARD_TO_BCM[pin], 0)
+
+
+class SimulatedBackend(StepperBackend):
+    """
+    Backend without hardware. Moves are recorded on a simulated timeline instead of being played, and inputs read
+    whatever was set with setInput, or the state of a simulated limit switch (see addSwitch). Every move finishes
+    instantly in real time. Like a real move it plays in the background of the session clock: wait() moves a virtual
+    session clock on to the end of the move, so code running during a move (like on-the-fly integrations) sees the
+    time it would have on the mount.
+    """
+
+    def __init__(self):
+        self.levels = {}
+        self.timeline = []  # (simulated time, pin, level) of every pin change, in order
+        self.now = 0.0  # Simulated time at the end of the last move
+        self.switches = {}  # Input pin: [step pin, direction pin, direction level towards the switch, steps away]
+        self._callbacks = {}
+        self._muted = set()
+        self._played = {}
+        self._busy_until = 0.0  # Session clock time the last move finishes at
+
+    def setup(self, outputs, inputs):
+        for pin in list(outputs) + list(inputs):
+            self.levels.setdefault(pin, 0)
+
+    def output(self, pin, level):
+        self.levels[pin] = level
+        self.timeline.append((self.now, pin, level))
+
+    def input(self, pin):
+        return self.levels.get(pin, 0)
+
+    def setInput(self, pin, level):
+        rising = level == 1 and self.levels.get(pin, 0) == 0
+        self.levels[pin] = level
+        if rising and pin in self._callbacks:
+            self._callbacks[pin](pin)
+
+    def addSwitch(self, pin, step_pin, dir_pin, toward, steps_away):
+        """
+        Put a simulated limit switch on an input pin. It is pressed while the axis driven by step_pin is at or past
+        the switch, and every step with dir_pin at toward moves the axis one step closer.
+
+        :param pin: Limit switch input pin. (int)
+        :param step_pin: Step pin of the axis. (int)
+        :param dir_pin: Direction pin of the axis. (int)
+        :param toward: Direction level that moves the axis towards the switch. (int)
+        :param steps_away: Steps between the axis and the switch. (int)
+        :return: None
+        """
+        self.switches[pin] = [step_pin, dir_pin, toward, steps_away]
+        self.levels[pin] = int(steps_away <= 0)
+
+    def play(self, waveform):
+        self.wait()
+        self._muted = set()
+        self._played = dict.fromkeys(waveform.pulses, 0)
+        start = clock.unixTime()
+        for t, level, pins in waveformEdges(waveform):
+            if self._muted.issuperset(self._played):
+                # Every axis has stopped, the move ends here
+                self.now += t
+                self._busy_until = start + t
+                return
+            for pin in pins:
+                if level == 1 and pin in self._muted:
+                    continue
+                self.levels[pin] = level
+                self.timeline.append((self.now + t, pin, level))
+                if level == 1:
+                    self._played[pin] += 1
+                    self._step(pin)
+        self.now += waveform.duration
+        self._busy_until = start + waveform.duration
+
+    def wait(self):
+        clock.elapse(self._busy_until - clock.unixTime())
+
+    def watch(self, pin, callback):
+        self._callbacks[pin] = callback
+
+    def unwatch(self, pin):
+        self._callbacks.pop(pin, None)
+
+    def mute(self, pin):
+        self._muted.add(pin)
+
+    def stepCount(self, pin):
+        """
+        :return: Number of rising edges recorded on a pin. (int)
+        """
+        return sum(1 for t, p, level in self.timeline if p == pin and level == 1)
+
+    def _step(self, step_pin):
+        """
+        Move the simulated switches of an axis by one step.
+        """
+        for pin, switch in self.switches.items():
+            if switch[0] == step_pin:
+                switch[3] += -1 if self.levels.get(switch[1], 0) == switch[2] else 1
+                self.setInput(pin, int(switch[3] <= 0))
+
+
+def makeBackend(name):
+    """
+    Create a backend by name. pigpio falls back to RPi.GPIO if the pigpio module or daemon is not available.
+
+    :param name: "gpio", "pigpio" or "sim". (string)
+    :return: StepperBackend
+    """
+    if name == "pigpio":
+        try:
+            return PigpioBackend()
+        except (ImportError, RuntimeError) as e:
+            Log.warn("pigpio backend not available (" + str(e) + "), using RPi.GPIO")
+            return GpioBackend()
+    if name == "gpio":
+        return GpioBackend()
+    if name == "sim":
+        return SimulatedBackend()
+    raise ValueError("Unknown stepper backend: " + str(name))
+
+
+def _sleepUntil(deadline):
+    """
+    Sleep until a time.perf_counter() deadline.
+    """
+    remaining = deadline - time.perf_counter()
+    if remaining > 0:
+        time.sleep(remaining)
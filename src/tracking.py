@@ -21,15 +21,16 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-import time
-import RPi.GPIO as GPIO
-from astropy.time import Time
-from astropy.coordinates import get_sun, AltAz, EarthLocation
-from utilities import Log
-import pickle
-import datetime
+from collections import deque, namedtuple
 import numpy as np
 
+import clock
+from motionProfile import AxisLimits, moveDuration, planIndependentMove, planMove
+from mountState import MOUNT_STATE_PATH, SIM_MOUNT_STATE_PATH, MountState
+from solarPosition import sunPosition
+from stepperBackend import SimulatedBackend, compileWaveform, makeBackend
+from utilities import Log, parseAngle
+
 DIR_AZ = 10  # Azimuth stepper motor direction pin from controller
 STEP_AZ = 8  # Azimuth stepper motor pin from controller
 DIR_ALT = 13  # Altitude stepper motor direction pin from controller
@@ -49,84 +50,239 @@ UPPER_LIM_AZ = 145
 EL_GEAR_RATIO = 10
 AZ_GEAR_RATIO = 4.4
 
-# Set GPIO pin modes
-GPIO.setmode(GPIO.BOARD)
-GPIO.setup(DIR_AZ, GPIO.OUT)
-GPIO.setup(STEP_AZ, GPIO.OUT)
-GPIO.setup(DIR_ALT, GPIO.OUT)
-GPIO.setup(STEP_ALT, GPIO.OUT)
-GPIO.setup(LIM_ALT, GPIO.IN)
-GPIO.setup(LIM_AZ, GPIO.IN)
-GPIO.output(DIR_AZ, CCW)  # Direction of calibration spin for azimuth stepper motor
-GPIO.output(DIR_ALT, CCW)  # Direction of calibration spin for altitude stepper motor
+STEP_HIGH_TIME = 0.001  # Seconds the step pins are held high for each pulse. TODO: Adjust sleep time.
+# Speed limits in motor steps/s and steps/s^2. Moves start and stop at 20 steps/s (the old fixed 50 ms step period)
+# and ramp up to max_speed on long slews. TODO: Tune max_speed and accel on the mount.
+ALT_LIMITS = AxisLimits(max_speed=200, accel=400, start_speed=20)
+AZ_LIMITS = AxisLimits(max_speed=200, accel=400, start_speed=20)
+
+# Homing seeks the limit switches at ALT_LIMITS/AZ_LIMITS, backs off HOME_BACKOFF_DEG and approaches again at
+# HOME_APPROACH_LIMITS, so the switches always trip at the same slow speed. TODO: Tune on the mount.
+HOME_APPROACH_LIMITS = AxisLimits(max_speed=10, accel=400, start_speed=10)
+HOME_BACKOFF_DEG = 1
+HOME_SEEK_MARGIN_DEG = 10  # Travel past the full range of an axis before a missing switch is given up on
+
+# A move on the session clock. times are session clock times (unix seconds) and alt_steps/az_steps the ledger
+# position at each of them: the position before every step pulse at its pulse time, and the final position at the end
+# of the move. In between the antenna is taken to move linearly.
+MoveRecord = namedtuple("MoveRecord", ["start_time", "end_time", "times", "alt_steps", "az_steps"])
+TIMELINE_LENGTH = 256  # Number of recent moves kept for antennaPosition(..., t)
+
+MOTOR = None  # StepperBackend driving the pins, created by initGpio
+STATE = None  # MountState step ledger, loaded by initGpio
+TIMELINE = deque(maxlen=TIMELINE_LENGTH)  # MoveRecords of the latest moves, oldest first
+
+
+def initGpio(backend="gpio", state_path=None):
+    """
+    Create the stepper backend, set the pin modes and load the saved mount state. Must be called before calibrate or
+    moveStepper. Importing tracking alone does not touch the hardware.
+
+    :param backend: "gpio" (RPi.GPIO), "pigpio" (DMA timed waveforms from the pigpio daemon) or "sim" (no hardware).
+                    Default = gpio (string)
+    :param state_path: Mount state file. Default = None (bin/mountState.json, or bin/mountStateSim.json for sim)
+    :return: None
+    """
+    global MOTOR, STATE
+    if state_path is None:
+        state_path = SIM_MOUNT_STATE_PATH if backend == "sim" else MOUNT_STATE_PATH
+    STATE = MountState(state_path).load()
+    if MOTOR is not None:
+        return
+    MOTOR = makeBackend(backend)
+
+    # Set GPIO pin modes
+    MOTOR.setup([DIR_AZ, STEP_AZ, DIR_ALT, STEP_ALT], [LIM_ALT, LIM_AZ])
+    MOTOR.output(DIR_AZ, CCW)  # Direction of calibration spin for azimuth stepper motor
+    MOTOR.output(DIR_ALT, CCW)  # Direction of calibration spin for altitude stepper motor
+    if isinstance(MOTOR, SimulatedBackend):
+        _simulateMount()
+    Log.info("GPIO initialized with the " + type(MOTOR).__name__)
+
+
+def _simulateMount():
+    """
+    Put simulated limit switches at LOWER_LIM_ALT and LOWER_LIM_AZ on the simulated backend. The simulated mount
+    starts where the saved mount state left it, or in the middle of its range if it was never homed.
+
+    :return: None
+    """
+    if STATE.homed:
+        startAlt, startAz = STATE.alt_steps, STATE.az_steps
+    else:
+        startAlt = _degToSteps((LOWER_LIM_ALT + UPPER_LIM_ALT) / 2, EL_GEAR_RATIO)
+        startAz = _degToSteps((LOWER_LIM_AZ + UPPER_LIM_AZ) / 2, AZ_GEAR_RATIO)
+    MOTOR.addSwitch(LIM_ALT, STEP_ALT, DIR_ALT, CCW, startAlt - _degToSteps(LOWER_LIM_ALT, EL_GEAR_RATIO))
+    MOTOR.addSwitch(LIM_AZ, STEP_AZ, DIR_AZ, CW, startAz - _degToSteps(LOWER_LIM_AZ, AZ_GEAR_RATIO))
 
 
 def calibrate(offsetAlt, offsetAz):
     """
-    Calibrate the stepper motor to the limit switch and return the starting altitude and azimuth.
+    Home both axes on their limit switches at the same time and return the starting altitude and azimuth.
+
+    Both axes first seek their switch at full speed, each stopping on the rising edge of its own switch, then back off
+    and approach again slowly so the final position does not depend on the seek speed.
 
     :param offsetAlt: Altitude offset in degrees.
     :param offsetAz: Azimuth offset in degrees.
     :return: Starting altitude and azimuth of the antenna in degrees. (0,0)
     """
     Log.info("Starting Calibration...")
+    start = clock.unixTime()
+    # Until homing finishes the saved position means nothing
+    STATE.homed = False
+    STATE.save()
+
+    # Homing is towards negative altitude and azimuth
+    seekAlt = -_degToSteps(UPPER_LIM_ALT - LOWER_LIM_ALT + HOME_SEEK_MARGIN_DEG, EL_GEAR_RATIO)
+    seekAz = -_degToSteps(UPPER_LIM_AZ - LOWER_LIM_AZ + HOME_SEEK_MARGIN_DEG, AZ_GEAR_RATIO)
+    backoffAlt = _degToSteps(HOME_BACKOFF_DEG, EL_GEAR_RATIO)
+    backoffAz = _degToSteps(HOME_BACKOFF_DEG, AZ_GEAR_RATIO)
+
+    movedAlt, movedAz = _homingMove(seekAlt, seekAz, ALT_LIMITS, AZ_LIMITS)
+    _moveSteps(backoffAlt, backoffAz, ALT_LIMITS, AZ_LIMITS)
+    if MOTOR.input(LIM_ALT) == 1 or MOTOR.input(LIM_AZ) == 1:
+        Log.error("Limit switch still pressed after backing off " + str(HOME_BACKOFF_DEG) + " deg")
+        raise RuntimeError("Limit switch still pressed after backing off")
+    _homingMove(-2 * backoffAlt, -2 * backoffAz, HOME_APPROACH_LIMITS, HOME_APPROACH_LIMITS)
+    STATE.home()
+    # Moves recorded before homing are on the old ledger
+    TIMELINE.clear()
+
+    total_alt = -movedAlt * STEP_SIZE / EL_GEAR_RATIO
+    total_az = -movedAz * STEP_SIZE / AZ_GEAR_RATIO
+    Log.info(f"Done Calibration in {clock.unixTime() - start:.1f} s. Moved {total_alt:.2f} deg in altitude, "
+             f"{total_az:.2f} deg in azimuth.")
+    return offsetAlt, offsetAz
+
 
-    alt_step = -0.05
-    az_step = -0.12
+def resumeOrCalibrate(offsetAlt, offsetAz, force=False):
+    """
+    Resume from the saved mount position if the last session shut down cleanly, otherwise calibrate.
 
-    total_alt = 0
-    total_az = 0
+    :param offsetAlt: Altitude offset in degrees.
+    :param offsetAz: Azimuth offset in degrees.
+    :param force: Always calibrate. Default = False
+    :return: Current altitude and azimuth of the antenna in degrees. (float, float)
+    """
+    if force or not STATE.canResume():
+        return calibrate(offsetAlt, offsetAz)
+    # From here on the saved state is only trusted again after the next clean shutdown
+    STATE.save()
+    antAlt, antAz = antennaPosition(offsetAlt, offsetAz)
+    Log.info(f"Resumed from saved mount position alt={antAlt:.3f} deg, az={antAz:.3f} deg "
+             f"({STATE.alt_steps}, {STATE.az_steps} steps), skipping calibration.")
+    return antAlt, antAz
 
-    # Altitude calibration
-    while GPIO.input(LIM_ALT) != GPIO.HIGH:
-        moveStepper(alt_step, 0, cal_flag=True)
-        time.sleep(0.001)
-        total_alt += alt_step
-    # Azimuth calibration
-    while GPIO.input(LIM_AZ) != GPIO.HIGH:
-        moveStepper(0, az_step, cal_flag=True)
-        time.sleep(0.001)
-        total_az += az_step
 
-    Log.info(f"Done Calibration. Moved {total_alt} deg in altitude, {total_az} deg in azimuth.")
-    return offsetAlt, offsetAz
+def antennaPosition(offsetAlt, offsetAz, t=None):
+    """
+    Antenna position from the step ledger, or where the antenna was at a session clock time during the recent moves.
 
+    :param offsetAlt: Altitude offset in degrees.
+    :param offsetAz: Azimuth offset in degrees.
+    :param t: Session clock time(s) in unix seconds, interpolated on the motion timeline of the last TIMELINE_LENGTH
+              moves. Default = None (the ledger, where the antenna is once the current move has finished)
+    :return: Altitude and azimuth of the antenna in degrees. (float, float), or arrays shaped like t.
+    """
+    if t is None or len(TIMELINE) == 0:
+        altSteps, azSteps = STATE.alt_steps, STATE.az_steps
+        if t is not None:
+            altSteps, azSteps = np.full(np.shape(t), altSteps)[()], np.full(np.shape(t), azSteps)[()]
+    else:
+        times = np.concatenate([move.times for move in TIMELINE])
+        altSteps = np.interp(t, times, np.concatenate([move.alt_steps for move in TIMELINE]))
+        azSteps = np.interp(t, times, np.concatenate([move.az_steps for move in TIMELINE]))
+    return (offsetAlt + altSteps * STEP_SIZE / EL_GEAR_RATIO,
+            offsetAz + azSteps * STEP_SIZE / AZ_GEAR_RATIO)
+
+
+def ledgerPosition():
+    """
+    :return: Altitude and azimuth steps from home the antenna is at once the current move has finished. (int, int)
+    """
+    return STATE.alt_steps, STATE.az_steps
+
+
+def lastMove():
+    """
+    :return: MoveRecord of the latest move, or None before the first move since homing.
+    """
+    return TIMELINE[-1] if TIMELINE else None
 
-def getSunPosition(lat, lon):
+
+def shutdown():
+    """
+    Wait for the last move, save the mount state as cleanly shut down and release the pins. The next start can then
+    skip calibration.
+
+    :return: None
+    """
+    MOTOR.wait()
+    STATE.save(clean=True)
+    MOTOR.cleanup()
+    Log.info("Mount state saved, next start can resume without calibration")
+
+
+def _homingMove(stepsAlt, stepsAz, alt_limits, az_limits):
+    """
+    Move both axes towards their limit switches, each axis stopping on its own switch's rising edge. An axis whose
+    switch is already pressed does not move.
+
+    :param stepsAlt: Most altitude steps to take, signed. (int)
+    :param stepsAz: Most azimuth steps to take, signed. (int)
+    :param alt_limits: AxisLimits of the altitude axis.
+    :param az_limits: AxisLimits of the azimuth axis.
+    :return: Altitude and azimuth steps taken. (int, int)
+    """
+    stepPins = {LIM_ALT: STEP_ALT, LIM_AZ: STEP_AZ}
+    for pin in stepPins:
+        MOTOR.watch(pin, lambda pin: MOTOR.mute(stepPins[pin]))
+    try:
+        # Checked after the callbacks are registered, so a switch cannot trip unnoticed in between
+        if MOTOR.input(LIM_ALT) == 1:
+            stepsAlt = 0
+        if MOTOR.input(LIM_AZ) == 1:
+            stepsAz = 0
+        _moveSteps(stepsAlt, stepsAz, alt_limits, az_limits, independent=True)
+    finally:
+        for pin in stepPins:
+            MOTOR.unwatch(pin)
+
+    for pin, name in ((LIM_ALT, "Altitude"), (LIM_AZ, "Azimuth")):
+        if MOTOR.input(pin) != 1:
+            Log.error(name + " limit switch not found")
+            raise RuntimeError(name + " limit switch not found")
+    movedAlt = MOTOR.stepsPlayed(STEP_ALT)
+    movedAz = MOTOR.stepsPlayed(STEP_AZ)
+    return (-movedAlt if stepsAlt < 0 else movedAlt), (-movedAz if stepsAz < 0 else movedAz)
+
+
+def _degToSteps(deg, gearRatio):
+    """
+    :return: Whole motor steps in a number of degrees of an axis. (int)
+    """
+    return int(deg / STEP_SIZE * gearRatio)
+
+
+def getSunPosition(lat, lon, source="noaa"):
     """
     Get the altitude and azimuth of the sun relative to the measurement location.
 
     :param lat: Latitude of the measurement location. (string)
     :param lon: Longitude of the measurement location. (string)
+    :param source: "noaa" for the built-in analytic algorithm or "astropy" for astropy's high precision transform.
+                   Default = noaa (string)
     :return: Relative sun altitude and azimuth in degrees. (float)
     """
     Log.info("Starting getSunPosition...")
-    current_time = Time(time.time(), format='unix')
-    current_time.format = "iso"
-    sunPos = get_sun(current_time)  # coordinates of the sun in GCRS frame
-    measurementLoc = EarthLocation(lat=lat, lon=lon)  # location of measurement
-    relSunPos = sunPos.transform_to(
-        AltAz(obstime=current_time, location=measurementLoc))  # sun position relative to measurement location
-
-    Log.info("Time: " + str(current_time) + " Sun Alt: " + str(relSunPos.alt.deg) + " Sun Az: " + str(relSunPos.az.deg))
-    Log.info("Done getSunPosition.")
-
-    return relSunPos.alt.deg, relSunPos.az.deg
+    current_time = clock.unixTime()
+    alt, az = sunPosition(current_time, parseAngle(lat), parseAngle(lon), source=source)
 
-def getSunPositionFromPickle():
-    """
-    Get the altitude and azimuth from a pickled file containing a list of datetime objects, a list of azimuth,
-    and a list of elevation. Method selects the entry closest in time to the current time. The list should have
-    a maximum step size of 10 seconds.
-    :return: Sun position in degrees. Alt, Az (float)
-    """
-    Log.info("Loading sun position data from pickled file")
-    with open("./../bin/April8Eclipse.pickle", 'rb') as handle:
-        sunPos = pickle.load(handle)
-    target_date = datetime.datetime.utcnow()
-    idex = np.argmin(np.abs(sunPos[0] - target_date))
-    return sunPos[2][idex], sunPos[1][idex]
+    Log.info("Time: " + str(current_time) + " Sun Alt: " + str(float(alt)) + " Sun Az: " + str(float(az)))
+    Log.info("Done getSunPosition.")
 
+    return float(alt), float(az)
 
 def getDifferenceDeg(antAlt, antAz, sunAlt, sunAz, offsetAlt, offsetAz):
     """
@@ -174,7 +330,7 @@ def getDifferenceDeg(antAlt, antAz, sunAlt, sunAz, offsetAlt, offsetAz):
     return diffAlt, diffAz, updatedAntAlt, updatedAntAz
 
 
-def moveStepper(diffAlt, diffAz, cal_flag=False):
+def moveStepper(diffAlt, diffAz, cal_flag=False, wait=True, speed=None):
     """"""
     """
     Move the stepper motor based on the difference in altitude and azimuth.
@@ -182,41 +338,31 @@ def moveStepper(diffAlt, diffAz, cal_flag=False):
     :param diffAlt: Difference in altitude between antenna and sun in degrees.
     :param diffAz: Difference in azimuth between antenna and sun in degrees.
     :param cal_flag: Flag to indicate if moveStepper is being called from calibration. Does not log if True
-    :return: None
+    :param wait: Block until the move has finished. If False the move plays out in the background, see waitForMove.
+    :param speed: Move each axis at this constant speed in deg/s, for on-the-fly scanning. Speeds above an axis'
+                  start_speed ramp up to it at the axis' accel. Default = None (as fast as ALT_LIMITS and AZ_LIMITS
+                  allow)
+    :return: Altitude and azimuth error of the antenna from the commanded position in degrees, under half a step.
     """
     #Log.info("Starting moveStepper")
 
-    if diffAz < 0:
-        GPIO.output(DIR_AZ, CW)
-    else:
-        GPIO.output(DIR_AZ, CCW)
-
-    if diffAlt < 0:
-        GPIO.output(DIR_ALT, CCW)
-    else:
-        GPIO.output(DIR_ALT, CW)
-
-    # Number of steps required for difference in angles.
-    stepsAlt = (diffAlt / STEP_SIZE) * EL_GEAR_RATIO
-    stepsAz = (diffAz / STEP_SIZE) * AZ_GEAR_RATIO
-
-    stepsAltInt = abs(int(stepsAlt))
-    stepsAzInt = abs(int(stepsAz))
+    # Steps are counted on the ledger from home. The commanded target is kept unrounded and each move goes to the
+    # nearest whole step of it, so rounding never adds up over many small moves.
+    STATE.target_alt += (diffAlt / STEP_SIZE) * EL_GEAR_RATIO
+    STATE.target_az += (diffAz / STEP_SIZE) * AZ_GEAR_RATIO
+    stepsAlt = round(STATE.target_alt) - STATE.alt_steps
+    stepsAz = round(STATE.target_az) - STATE.az_steps
 
-    # Function to rotate stepper motor.
-    def rotateMotor(pin, steps):
-        for _ in range(steps):
-            GPIO.output(pin, GPIO.HIGH)
-            time.sleep(0.001)  # TODO: Adjust sleep time.
-            GPIO.output(pin, GPIO.LOW)
-            time.sleep(0.05)  # TODO: Adjust sleep time.
+    altLimits, azLimits = ALT_LIMITS, AZ_LIMITS
+    if speed is not None:
+        altLimits = _scanLimits(speed, EL_GEAR_RATIO, ALT_LIMITS)
+        azLimits = _scanLimits(speed, AZ_GEAR_RATIO, AZ_LIMITS)
+    _moveSteps(stepsAlt, stepsAz, altLimits, azLimits, wait)
+    STATE.book(stepsAlt, stepsAz)
 
-    # Rotate the stepper motor for altitude and azimuth.
-    rotateMotor(STEP_ALT, stepsAltInt)
-    rotateMotor(STEP_AZ, stepsAzInt)
-
-    degErrorAlt = stepsAltInt - stepsAlt
-    degErrorAz = stepsAzInt - stepsAz
+    # Difference between where the antenna is and where it was commanded to be
+    degErrorAlt = (STATE.alt_steps - STATE.target_alt) * STEP_SIZE / EL_GEAR_RATIO
+    degErrorAz = (STATE.az_steps - STATE.target_az) * STEP_SIZE / AZ_GEAR_RATIO
 
     if not cal_flag:
         Log.info("Stepper motor moved, Altitude change: " + str(diffAlt) + " degrees, Azimuth change: " + str(
@@ -225,13 +371,102 @@ def moveStepper(diffAlt, diffAz, cal_flag=False):
 
     return degErrorAlt, degErrorAz
 
-def positionErrorCorrection(antAlt, antAz, degErrorAlt, degErrorAz):
-    Log.info("Starting positionErrorCorrection")
 
-    Log.info("Correcting elevation by: " + str(degErrorAlt) + " deg")
-    Log.info("Correcting azimuth by: " + str(degErrorAz) + " deg")
-    correctedAntAlt = antAlt + degErrorAlt
-    correctedAntAz = antAz + degErrorAz
+def estimateMoveTime(diffAlt, diffAz):
+    """
+    Estimate how long moveStepper(diffAlt, diffAz) takes, from the gear ratios and ALT_LIMITS/AZ_LIMITS. Both axes
+    finish together, so a move takes as long as its slower axis would alone. Vectorized, for scoring scan orders.
+
+    :param diffAlt: Altitude change in degrees. (float or np.ndarray)
+    :param diffAz: Azimuth change in degrees. (float or np.ndarray)
+    :return: Move time in seconds. (float or np.ndarray)
+    """
+    stepsAlt = np.rint(np.abs(diffAlt) / STEP_SIZE * EL_GEAR_RATIO)
+    stepsAz = np.rint(np.abs(diffAz) / STEP_SIZE * AZ_GEAR_RATIO)
+    return np.maximum(moveDuration(stepsAlt, *ALT_LIMITS), moveDuration(stepsAz, *AZ_LIMITS))[()]
+
+
+def moveToSteps(altSteps, azSteps, wait=True):
+    """
+    Move to a ledger position in whole steps from home, like the pointings of a compiled observation plan. Skips the
+    degree conversion, clamping and logging of moveStepper.
+
+    :param altSteps: Altitude ledger position. (int)
+    :param azSteps: Azimuth ledger position. (int)
+    :param wait: Block until the move has finished. If False the move plays out in the background, see waitForMove.
+    :return: None
+    """
+    stepsAlt = altSteps - STATE.alt_steps
+    stepsAz = azSteps - STATE.az_steps
+    STATE.target_alt, STATE.target_az = float(altSteps), float(azSteps)
+    _moveSteps(stepsAlt, stepsAz, ALT_LIMITS, AZ_LIMITS, wait)
+    STATE.book(stepsAlt, stepsAz)
+
 
-    Log.info("Done positionErrorCorrection")
-    return correctedAntAlt, correctedAntAz
+def _scanLimits(speed, gearRatio, limits):
+    """
+    :return: AxisLimits cruising at a constant axis speed in deg/s, capped at the axis' max_speed. (AxisLimits)
+    """
+    rate = min(speed / STEP_SIZE * gearRatio, limits.max_speed)
+    return AxisLimits(max_speed=rate, accel=limits.accel, start_speed=min(rate, limits.start_speed))
+
+
+def _moveSteps(stepsAlt, stepsAz, alt_limits, az_limits, wait=True, independent=False):
+    """
+    Move both axes by whole steps. Both motors rotate together, following an acceleration limited profile. The whole
+    move is compiled to a pulse waveform up front and handed to the backend in one go, and recorded on TIMELINE
+    against the ledger as it was before the move.
+
+    :param stepsAlt: Altitude steps, signed. (int)
+    :param stepsAz: Azimuth steps, signed. (int)
+    :param alt_limits: AxisLimits of the altitude axis.
+    :param az_limits: AxisLimits of the azimuth axis.
+    :param wait: Block until the move has finished. (bool)
+    :param independent: Run each axis at its own speed instead of finishing together. (bool)
+    :return: None
+    """
+    # The direction pins must not change under a move that is still playing
+    MOTOR.wait()
+
+    if stepsAz < 0:
+        MOTOR.output(DIR_AZ, CW)
+    else:
+        MOTOR.output(DIR_AZ, CCW)
+
+    if stepsAlt < 0:
+        MOTOR.output(DIR_ALT, CCW)
+    else:
+        MOTOR.output(DIR_ALT, CW)
+
+    plan = planIndependentMove if independent else planMove
+    profile = plan(abs(stepsAlt), abs(stepsAz), alt_limits, az_limits)
+    start = clock.unixTime()
+    MOTOR.play(compileWaveform(profile, STEP_ALT, STEP_AZ, STEP_HIGH_TIME))
+    _recordMove(start, profile, np.sign(stepsAlt), np.sign(stepsAz))
+    if wait:
+        MOTOR.wait()
+
+
+def _recordMove(start, profile, signAlt, signAz):
+    """
+    Add a move to TIMELINE.
+
+    :param start: Session clock time the move started at. (float)
+    :param profile: MoveProfile of the move.
+    :param signAlt: Direction of the altitude axis, -1, 0 or 1. (int)
+    :param signAz: Direction of the azimuth axis, -1, 0 or 1. (int)
+    :return: None
+    """
+    times = start + np.append(profile.tick_times, profile.duration)
+    altSteps = STATE.alt_steps + signAlt * np.concatenate(([0], np.cumsum(profile.pulse_alt)))
+    azSteps = STATE.az_steps + signAz * np.concatenate(([0], np.cumsum(profile.pulse_az)))
+    TIMELINE.append(MoveRecord(start, float(times[-1]), times, altSteps, azSteps))
+
+
+def waitForMove():
+    """
+    Block until a move started with moveStepper(..., wait=False) has finished.
+
+    :return: None
+    """
+    MOTOR.wait()
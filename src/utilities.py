@@ -23,6 +23,7 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import datetime
 import os
+import clock
 
 class Log:
     """
@@ -61,7 +62,7 @@ class Log:
     @staticmethod
     def info(msg):
         Log.logFile = open(Log.logFilePath, "a")
-        Log.logFile.write(str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")) + " INFO: " + msg + "\n")
+        Log.logFile.write(str(clock.now().strftime("%Y-%m-%d %H:%M:%S")) + " INFO: " + msg + "\n")
         Log.logFile.close()
         if Log.VERBOSE == "HIGH":
             print("INFO: " + msg)
@@ -71,7 +72,7 @@ class Log:
     @staticmethod
     def warn(msg):
         Log.logFile = open(Log.logFilePath, "a")
-        Log.logFile.write(str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")) + " WARN: " + msg + "\n")
+        Log.logFile.write(str(clock.now().strftime("%Y-%m-%d %H:%M:%S")) + " WARN: " + msg + "\n")
         Log.logFile.close()
         if Log.VERBOSE == "HIGH" or Log.VERBOSE == "MED":
             print("WARN: " + msg)
@@ -81,6 +82,54 @@ class Log:
     @staticmethod
     def error(msg):
         Log.logFile = open(Log.logFilePath, "a")
-        Log.logFile.write(str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")) + " ERROR: " + msg + "\n")
+        Log.logFile.write(str(clock.now().strftime("%Y-%m-%d %H:%M:%S")) + " ERROR: " + msg + "\n")
         Log.logFile.close()
         print("ERROR: " + msg)
+
+
+def parseFrequency(freq):
+    """
+    Convert an rtl_power style frequency string to Hz.
+
+    :param freq: Frequency string with optional k, M or G suffix. Ex. 980M, 1.02G, 128k. (string)
+    :return: Frequency in Hz. (float)
+    """
+    multipliers = {"k": 1e3, "K": 1e3, "M": 1e6, "G": 1e9}
+    freq = str(freq).strip()
+    if freq[-1] in multipliers:
+        return float(freq[:-1]) * multipliers[freq[-1]]
+    return float(freq)
+
+
+def parseInterval(interval):
+    """
+    Convert an rtl_power style integration interval string to seconds.
+
+    :param interval: Interval string with optional s, m or h suffix. Ex. 1s, 0.5s, 1m. (string)
+    :return: Interval in seconds. (float)
+    """
+    multipliers = {"s": 1, "m": 60, "h": 3600}
+    interval = str(interval).strip()
+    if interval[-1] in multipliers:
+        return float(interval[:-1]) * multipliers[interval[-1]]
+    return float(interval)
+
+
+def parseAngle(angle):
+    """
+    Convert an astropy style angle string to degrees.
+
+    :param angle: Decimal degrees or degrees/minutes/seconds. Ex. 44.2247, +44d13m29s, -76d29m52s. (string)
+    :return: Angle in degrees. (float)
+    """
+    angle = str(angle).strip()
+    if "d" not in angle:
+        return float(angle)
+    sign = -1 if angle.startswith("-") else 1
+    degrees, rest = angle.lstrip("+-").split("d", 1)
+    minutes, seconds = 0.0, 0.0
+    if "m" in rest:
+        minutes, rest = rest.split("m", 1)
+    if rest.endswith("s"):
+        seconds = rest[:-1]
+    return sign * (float(degrees) + float(minutes) / 60 + float(seconds) / 3600)